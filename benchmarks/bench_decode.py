@@ -0,0 +1,79 @@
+"""
+Compare decoding a list response to dicts and converting it afterwards with
+building the StripeObjects while the JSON is parsed.
+
+Run from the repository root:
+
+    python benchmarks/bench_decode.py
+"""
+
+import timeit
+
+from stripe import util
+from stripe.resource import convert_to_stripe_object, stripe_object_hook
+
+
+def make_customer(i):
+    return {
+        'object': 'customer',
+        'id': 'cus_%d' % i,
+        'created': 1441869100,
+        'email': 'customer%d@example.com' % i,
+        'metadata': {'order': str(i)},
+        'shipping': None,
+        'sources': {
+            'object': 'list',
+            'url': '/v1/customers/cus_%d/sources' % i,
+            'has_more': False,
+            'total_count': 1,
+            'data': [{
+                'object': 'card',
+                'id': 'card_%d' % i,
+                'brand': 'Visa',
+                'exp_month': 8,
+                'exp_year': 2020,
+                'last4': '4242',
+                'metadata': {},
+            }],
+        },
+    }
+
+
+def make_body(count):
+    return util.json.dumps({
+        'object': 'list',
+        'url': '/v1/customers',
+        'has_more': False,
+        'data': [make_customer(i) for i in range(count)],
+    })
+
+
+def two_pass(body):
+    return convert_to_stripe_object(
+        util.json.loads(body), 'sk_test_123', 'acct_123')
+
+
+def one_pass(body):
+    return util.json.loads(
+        body, object_hook=stripe_object_hook('sk_test_123', 'acct_123'))
+
+
+def bench(func, body, number=50):
+    return min(timeit.repeat(
+        lambda: func(body), number=number, repeat=3)) / number * 1e3
+
+
+def main():
+    print '%-10s %12s %12s %8s' % (
+        'objects', 'old (ms)', 'new (ms)', 'speedup')
+    for count in (1, 10, 100):
+        body = make_body(count)
+        assert two_pass(body) == one_pass(body)
+        before = bench(two_pass, body)
+        after = bench(one_pass, body)
+        print '%-10d %12.3f %12.3f %7.1fx' % (
+            count, before, after, before / after)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Compare the form encoders in stripe.api_requestor.
+
+Run from the repository root:
+
+    python benchmarks/bench_encode.py
+"""
+
+import timeit
+import urllib
+
+from stripe.api_requestor import _api_encode, _api_urlencode
+
+
+PAYLOADS = {
+    'small': {
+        'amount': 2000, 'currency': 'usd', 'source': 'tok_visa',
+        'description': 'Charge for jenny.rosen@example.com',
+    },
+    'metadata': {
+        'email': 'jenny.rosen@example.com',
+        'metadata': dict(('key_%d' % i, 'value %d' % i) for i in range(50)),
+    },
+    'items': {
+        'customer': 'cus_123',
+        'items': [{'plan': 'plan_%d' % i, 'quantity': i,
+                   'metadata': {'line': str(i)}} for i in range(30)],
+    },
+    'additional_owners': {
+        'legal_entity': {
+            'type': 'company',
+            'address': {'line1': '1 Main St', 'city': 'SF', 'country': 'US'},
+            'additional_owners': [
+                {'first_name': 'Owner', 'last_name': str(i),
+                 'dob': {'day': 1, 'month': 1, 'year': 1980},
+                 'address': {'city': 'SF', 'postal_code': '94103'}}
+                for i in range(4)],
+        },
+    },
+}
+
+
+def old(payload):
+    return urllib.urlencode(list(_api_encode(payload)))
+
+
+def main(number=2000):
+    print '%-20s %12s %12s %8s' % (
+        'payload', 'old (us)', 'new (us)', 'speedup')
+    for name, payload in sorted(PAYLOADS.items()):
+        assert old(payload) == _api_urlencode(payload)
+        before = min(timeit.repeat(
+            lambda: old(payload), number=number, repeat=3)) / number
+        after = min(timeit.repeat(
+            lambda: _api_urlencode(payload), number=number, repeat=3)) / number
+        print '%-20s %12.1f %12.1f %7.2fx' % (
+            name, before * 1e6, after * 1e6, before / after)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Compare building request headers for every call with the cached templates.
+
+Run from the repository root:
+
+    python benchmarks/bench_headers.py
+"""
+
+import platform
+import timeit
+
+import stripe
+from stripe import util, version
+from stripe.api_requestor import APIRequestor
+
+import txstripe
+from txstripe.resource import _header_template
+
+
+class _HTTPClient(object):
+    name = 'requests'
+    _verify_ssl_certs = True
+
+
+def old_stripe_headers(api_key, account, api_version, method):
+    ua = {
+        'bindings_version': version.VERSION,
+        'lang': 'python',
+        'publisher': 'stripe',
+        'httplib': 'requests',
+    }
+    for attr, func in [['lang_version', platform.python_version],
+                       ['platform', platform.platform],
+                       ['uname', lambda: ' '.join(platform.uname())]]:
+        try:
+            val = func()
+        except Exception as e:
+            val = "!! %s" % (e,)
+        ua[attr] = val
+
+    headers = {
+        'X-Stripe-Client-User-Agent': util.json.dumps(ua),
+        'User-Agent': 'Stripe/v1 PythonBindings/%s' % (version.VERSION,),
+        'Authorization': 'Bearer %s' % (api_key,)
+    }
+    if account:
+        headers['Stripe-Account'] = account
+    if method == 'post':
+        headers['Content-Type'] = 'application/x-www-form-urlencoded'
+    if api_version is not None:
+        headers['Stripe-Version'] = api_version
+    return headers
+
+
+def old_txstripe_headers(api_key, account, api_version, headers):
+    ua = {
+        'lang': 'python',
+        'publisher': 'lextoumbourou',
+        'httplib': 'Twisted',
+    }
+    headers = headers or {}
+    headers.update({
+        'X-Stripe-Client-User-Agent': util.json.dumps(ua),
+        'User-Agent': 'txstripe',
+        'Authorization': 'Bearer %s' % (api_key,)
+    })
+    if account:
+        headers['Stripe-Account'] = account
+    if api_version is not None:
+        headers['Stripe-Version'] = api_version
+    return headers
+
+
+def new_txstripe_headers(client, api_key, account, api_version, headers):
+    request_headers = dict(headers or ())
+    request_headers.update(
+        _header_template(client, api_key, account, api_version))
+    return request_headers
+
+
+def bench(func, number=20000):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1e6
+
+
+def main():
+    stripe.api_version = '2016-07-06'
+    requestor = APIRequestor(
+        'sk_test_123', client=_HTTPClient(), account='acct_123')
+    client = txstripe.Client()
+
+    rows = [
+        ('stripe', bench(lambda: old_stripe_headers(
+            'sk_test_123', 'acct_123', '2016-07-06', 'post')),
+         bench(lambda: requestor.request_headers('sk_test_123', 'post'))),
+        ('txstripe', bench(lambda: old_txstripe_headers(
+            'sk_test_123', 'acct_123', '2016-07-06',
+            {'Idempotency-Key': 'key'})),
+         bench(lambda: new_txstripe_headers(
+             client, 'sk_test_123', 'acct_123', '2016-07-06',
+             {'Idempotency-Key': 'key'}))),
+    ]
+
+    print '%-10s %12s %12s %8s' % (
+        'library', 'old (us)', 'new (us)', 'speedup')
+    for name, before, after in rows:
+        print '%-10s %12.2f %12.2f %7.1fx' % (
+            name, before, after, before / after)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Measure the memory held by StripeObjects built from the test fixtures.
+
+Builds N objects from each ``txstripe/test/mocks`` response, both by
+converting decoded dicts and by decoding straight into objects, and
+reports the bytes reachable from each object (strings shared between
+objects are counted once).
+
+Run from the repository root:
+
+    python benchmarks/bench_memory.py [N]
+"""
+
+import sys
+
+from stripe import util
+
+from txstripe.resource import convert_to_stripe_object, stripe_object_hook
+from txstripe.test import mocks
+
+FIXTURES = [
+    ('customer', mocks.Customer.retrieve_success),
+    ('charge', mocks.Charge.retrieve_success),
+    ('plan', mocks.Plan.retrieve_success),
+    ('account', mocks.Account.retrieve_success),
+]
+
+
+def deep_size(obj, seen):
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for k, v in dict.iteritems(obj):
+            size += deep_size(k, seen) + deep_size(v, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for v in obj:
+            size += deep_size(v, seen)
+    if hasattr(obj, '__dict__') and isinstance(obj.__dict__, dict):
+        size += deep_size(obj.__dict__, seen)
+    return size
+
+
+def converted(body):
+    return convert_to_stripe_object(
+        util.json.loads(body), 'sk_test_123', 'acct_123')
+
+
+def decoded(body):
+    return util.json.loads(
+        body, object_hook=stripe_object_hook('sk_test_123', 'acct_123'))
+
+
+def per_object(build, body, count):
+    objects = [build(body) for _ in range(count)]
+    seen = set()
+    return sum(deep_size(obj, seen) for obj in objects) / count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+    print '%-10s %14s %14s' % ('fixture', 'converted (B)', 'decoded (B)')
+    for name, fixture in FIXTURES:
+        body = util.json.dumps(fixture)
+        print '%-10s %14d %14d' % (
+            name, per_object(converted, body, count),
+            per_object(decoded, body, count))
+
+
+if __name__ == '__main__':
+    main()
@@ -16,6 +16,13 @@ api_version = None
 verify_ssl_certs = True
 proxy = None
 default_http_client = None
+max_network_retries = 0
+
+# Convert nested objects in responses only when they are first accessed
+lazy_conversion = False
+
+# Optional stripe.identity.IdentityMap sharing one object per type and id
+identity_map = None
 
 # Set to either 'debug' or 'info', controls console logging
 log = None
@@ -4,11 +4,13 @@ import platform
 import time
 import urllib
 import urlparse
+import uuid
 import warnings
 
 import stripe
-from stripe import error, http_client, version, util
+from stripe import error, http_client, record, version, util
 from stripe.multipart_data_generator import MultipartDataGenerator
+from stripe.retry import RetryPolicy
 
 
 def _encode_datetime(dttime):
@@ -52,6 +54,106 @@ def _api_encode(data):
             yield (key, util.utf8(value))
 
 
+# Quoted keys such as "metadata[order_id]" recur across requests
+_quoted_keys = {}
+_QUOTED_KEYS_MAX = 1024
+
+
+def _quote_key(key):
+    try:
+        return _quoted_keys[key]
+    except KeyError:
+        if len(_quoted_keys) >= _QUOTED_KEYS_MAX:
+            _quoted_keys.clear()
+        quoted = _quoted_keys[key] = urllib.quote_plus(str(key)) + '='
+        return quoted
+
+
+def _api_urlencode(data):
+    """
+    Return the same string as `urllib.urlencode(list(_api_encode(data)))`.
+
+    The nested structure is walked with an explicit stack instead of
+    recursive generators, each pair is quoted straight into one list of
+    output chunks, and quoted keys are cached between calls.  Nested dicts
+    still go through `_encode_nested_dict` so that pairs come out in
+    exactly the same order.
+    """
+    chunks = []
+    append = chunks.append
+    quote = urllib.quote_plus
+    utf8 = util.utf8
+
+    # Each entry is (list key or None, iterator over list items or pairs)
+    stack = [(None, data.iteritems())]
+    while stack:
+        list_key, items = stack[-1]
+        if list_key is not None:
+            for sv in items:
+                if isinstance(sv, dict):
+                    stack.append((None, _encode_nested_dict(
+                        list_key, sv, fmt='%s[][%s]').iteritems()))
+                    break
+                append(_quote_key(list_key + '[]') + quote(str(utf8(sv))))
+            else:
+                stack.pop()
+            continue
+
+        for key, value in items:
+            key = utf8(key)
+            if value is None:
+                continue
+            elif hasattr(value, 'stripe_id'):
+                append(_quote_key(key) + quote(str(value.stripe_id)))
+            elif isinstance(value, list) or isinstance(value, tuple):
+                stack.append((key, iter(value)))
+                break
+            elif isinstance(value, dict):
+                stack.append(
+                    (None, _encode_nested_dict(key, value).iteritems()))
+                break
+            elif isinstance(value, datetime.datetime):
+                append(_quote_key(key) + str(_encode_datetime(value)))
+            else:
+                append(_quote_key(key) + quote(str(utf8(value))))
+        else:
+            stack.pop()
+
+    return '&'.join(chunks)
+
+
+_client_user_agents = {}
+
+
+def _client_user_agent(httplib):
+    """
+    Return the X-Stripe-Client-User-Agent value, worked out once per
+    process since the platform calls behind it are slow.
+    """
+    try:
+        return _client_user_agents[httplib]
+    except KeyError:
+        pass
+
+    ua = {
+        'bindings_version': version.VERSION,
+        'lang': 'python',
+        'publisher': 'stripe',
+        'httplib': httplib,
+    }
+    for attr, func in [['lang_version', platform.python_version],
+                       ['platform', platform.platform],
+                       ['uname', lambda: ' '.join(platform.uname())]]:
+        try:
+            val = func()
+        except Exception as e:
+            val = "!! %s" % (e,)
+        ua[attr] = val
+
+    encoded = _client_user_agents[httplib] = util.json.dumps(ua)
+    return encoded
+
+
 def _build_api_url(url, query):
     scheme, netloc, path, base_query, fragment = urlparse.urlsplit(url)
 
@@ -63,10 +165,16 @@ def _build_api_url(url, query):
 
 class APIRequestor(object):
 
-    def __init__(self, key=None, client=None, api_base=None, account=None):
+    def __init__(self, key=None, client=None, api_base=None, account=None,
+                 retry_policy=None, object_hook=None):
         self.api_base = api_base or stripe.api_base
         self.api_key = key
         self.stripe_account = account
+        self._retry_policy = retry_policy
+        # Called with the API key and account of a request, returns the
+        # JSON object_hook successful responses are decoded with, if any
+        self._object_hook = object_hook
+        self._headers_cache = None
 
         from stripe import verify_ssl_certs as verify
         from stripe import proxy
@@ -134,10 +242,25 @@ class APIRequestor(object):
             DeprecationWarning)
         return _build_api_url(url, cls.encode(params))
 
-    def request(self, method, url, params=None, headers=None):
+    def request(self, method, url, params=None, headers=None, raw=False):
+        """
+        Make an API call and return its decoded response and API key.
+
+        With `raw` set the response is returned as plain dicts, or as
+        records for `raw='records'` (see `stripe.record`), rather than
+        whatever the requestor's `object_hook` would build.
+        """
         rbody, rcode, rheaders, my_api_key = self.request_raw(
             method.lower(), url, params, headers)
-        resp = self.interpret_response(rbody, rcode, rheaders)
+        object_hook = None
+        if 200 <= rcode < 300:
+            if raw:
+                object_hook = record.raw_object_hook(raw)
+            elif self._object_hook is not None:
+                object_hook = self._object_hook(
+                    my_api_key, self.stripe_account)
+        resp = self.interpret_response(
+            rbody, rcode, rheaders, object_hook=object_hook)
         return resp, my_api_key
 
     def handle_api_error(self, rbody, rcode, resp, rheaders):
@@ -173,6 +296,41 @@ class APIRequestor(object):
             raise error.APIError(err.get('message'), rbody, rcode, resp,
                                  rheaders)
 
+    def request_headers(self, api_key, method):
+        """
+        Return a new dict of the headers every request to Stripe needs.
+
+        The parts that only change with the key, account, API version or
+        HTTP library are kept as a template and copied for each request.
+        """
+        api_version = stripe.api_version
+        key = (api_key, self.stripe_account, api_version, self._client.name)
+
+        cached = self._headers_cache
+        if cached is None or cached[0] != key:
+            template = {
+                'X-Stripe-Client-User-Agent':
+                    _client_user_agent(self._client.name),
+                'User-Agent':
+                    'Stripe/v1 PythonBindings/%s' % (version.VERSION,),
+                'Authorization': 'Bearer %s' % (api_key,)
+            }
+
+            if self.stripe_account:
+                template['Stripe-Account'] = self.stripe_account
+
+            if api_version is not None:
+                template['Stripe-Version'] = api_version
+
+            # One attribute, so threads sharing a requestor see a
+            # consistent pair
+            cached = self._headers_cache = (key, template)
+
+        headers = dict(cached[1])
+        if method == 'post':
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        return headers
+
     def request_raw(self, method, url, params=None, supplied_headers=None):
         """
         Mechanism for issuing an API call
@@ -195,7 +353,7 @@ class APIRequestor(object):
 
         abs_url = '%s%s' % (self.api_base, url)
 
-        encoded_params = urllib.urlencode(list(_api_encode(params or {})))
+        encoded_params = _api_urlencode(params or {})
 
         if method == 'get' or method == 'delete':
             if params:
@@ -218,46 +376,45 @@ class APIRequestor(object):
                 'Stripe bindings.  Please contact support@stripe.com for '
                 'assistance.' % (method,))
 
-        ua = {
-            'bindings_version': version.VERSION,
-            'lang': 'python',
-            'publisher': 'stripe',
-            'httplib': self._client.name,
-        }
-        for attr, func in [['lang_version', platform.python_version],
-                           ['platform', platform.platform],
-                           ['uname', lambda: ' '.join(platform.uname())]]:
-            try:
-                val = func()
-            except Exception as e:
-                val = "!! %s" % (e,)
-            ua[attr] = val
-
-        headers = {
-            'X-Stripe-Client-User-Agent': util.json.dumps(ua),
-            'User-Agent': 'Stripe/v1 PythonBindings/%s' % (version.VERSION,),
-            'Authorization': 'Bearer %s' % (my_api_key,)
-        }
-
-        if self.stripe_account:
-            headers['Stripe-Account'] = self.stripe_account
-
-        if method == 'post':
-            headers['Content-Type'] = 'application/x-www-form-urlencoded'
-
-        if api_version is not None:
-            headers['Stripe-Version'] = api_version
+        headers = self.request_headers(my_api_key, method)
 
         if supplied_headers is not None:
             for key, value in supplied_headers.items():
                 headers[key] = value
 
+        retry_policy = self._retry_policy or \
+            RetryPolicy(max_retries=stripe.max_network_retries)
+
+        # Retried POSTs must not be applied twice
+        if method == 'post' and retry_policy.max_retries > 0 and \
+                'Idempotency-Key' not in headers:
+            from stripe.resource import populate_headers
+            headers.update(populate_headers(str(uuid.uuid4())))
+
         util.log_info('Request to Stripe api', method=method, path=abs_url)
         util.log_debug(
             'Post details', post_data=post_data, api_version=api_version)
 
-        rbody, rcode, rheaders = self._client.request(
-            method, abs_url, headers, post_data)
+        num_retries = 0
+        while True:
+            try:
+                rbody, rcode, rheaders = self._client.request(
+                    method, abs_url, headers, post_data)
+            except error.CircuitOpenError:
+                raise
+            except error.APIConnectionError:
+                if not retry_policy.should_retry(
+                        num_retries, connection_error=True):
+                    raise
+            else:
+                if not retry_policy.should_retry(num_retries, rcode):
+                    break
+
+            sleep_time = retry_policy.sleep_time(num_retries)
+            num_retries += 1
+            util.log_info('Retrying Stripe api request', path=abs_url,
+                          num_retries=num_retries, sleep_time=sleep_time)
+            time.sleep(sleep_time)
 
         util.log_info(
             'Stripe API response', path=abs_url, response_code=rcode)
@@ -267,11 +424,11 @@ class APIRequestor(object):
                            link=util.dashboard_link(rheaders['Request-Id']))
         return rbody, rcode, rheaders, my_api_key
 
-    def interpret_response(self, rbody, rcode, rheaders):
+    def interpret_response(self, rbody, rcode, rheaders, object_hook=None):
         try:
             if hasattr(rbody, 'decode'):
                 rbody = rbody.decode('utf-8')
-            resp = util.json.loads(rbody)
+            resp = util.json.loads(rbody, object_hook=object_hook)
         except Exception:
             raise error.APIError(
                 "Invalid response body from API: %s "
@@ -374,11 +531,11 @@ class OAuthRequestor(APIRequestor):
         raise error.OAuthError(
             err_type, description, rbody, rcode, resp, rheaders)
 
-    def interpret_response(self, rbody, rcode, rheaders):
+    def interpret_response(self, rbody, rcode, rheaders, object_hook=None):
         try:
             if hasattr(rbody, 'decode'):
                 rbody = rbody.decode('utf-8')
-            resp = util.json.loads(rbody)
+            resp = util.json.loads(rbody, object_hook=object_hook)
         except Exception:
             raise error.APIError(
                 "Invalid response body from API: %s "
@@ -0,0 +1,171 @@
+import threading
+import time
+from collections import deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker(object):
+    """
+    Stops sending requests to an API base that keeps failing.
+
+    The outcome of the last `window` calls is tracked; connection errors,
+    5xx responses and calls slower than `slow_call_duration` seconds count
+    as failures.  Once at least `minimum_calls` have been seen and the
+    failure rate reaches `failure_threshold` the circuit opens and `allow`
+    refuses every call for `reset_timeout` seconds.  After that it is half
+    open: up to `half_open_probes` calls are let through, and the circuit
+    closes again once that many have succeeded, or reopens on a failure.
+
+    Breakers shared between threads need a `lock`, such as a
+    `threading.Lock`, held while their state changes.
+    """
+
+    def __init__(self, failure_threshold=0.5, minimum_calls=20, window=100,
+                 slow_call_duration=None, reset_timeout=30.0,
+                 half_open_probes=1, clock=time.time, lock=None):
+        self.failure_threshold = failure_threshold
+        self.minimum_calls = minimum_calls
+        self.slow_call_duration = slow_call_duration
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.clock = clock
+        self._lock = lock or _NoLock()
+
+        self.state = CLOSED
+        self.rejected = 0
+        self.times_opened = 0
+
+        self._outcomes = deque(maxlen=window)
+        self._failures = 0
+        self._opened_at = None
+        self._probes = 0
+        self._probe_successes = 0
+
+    @property
+    def failure_rate(self):
+        if not self._outcomes:
+            return 0.0
+        return float(self._failures) / len(self._outcomes)
+
+    def allow(self):
+        """Return whether a call may be made now, reserving a probe."""
+        with self._lock:
+            if self.state == OPEN:
+                if self.clock() - self._opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self.state = HALF_OPEN
+                self._probes = 0
+                self._probe_successes = 0
+
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    self.rejected += 1
+                    return False
+                self._probes += 1
+
+            return True
+
+    def record(self, failed, duration=None):
+        """Record the outcome of a call that `allow` let through."""
+        if not failed and duration is not None and \
+                self.slow_call_duration is not None and \
+                duration > self.slow_call_duration:
+            failed = True
+
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if failed:
+                    self._open()
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_probes:
+                        self._close()
+                return
+
+            if self.state == OPEN:
+                # A late answer to a call made before the circuit opened
+                return
+
+            if len(self._outcomes) == self._outcomes.maxlen:
+                self._failures -= self._outcomes[0]
+            self._outcomes.append(failed)
+            self._failures += failed
+
+            if len(self._outcomes) >= self.minimum_calls and \
+                    self.failure_rate >= self.failure_threshold:
+                self._open()
+
+    def release(self):
+        """Give back a probe whose call was abandoned without an outcome."""
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'failure_rate': self.failure_rate,
+                'calls': len(self._outcomes),
+                'rejected': self.rejected,
+                'times_opened': self.times_opened,
+            }
+
+    def _open(self):
+        self.state = OPEN
+        self.times_opened += 1
+        self._opened_at = self.clock()
+
+    def _close(self):
+        self.state = CLOSED
+        self._outcomes.clear()
+        self._failures = 0
+
+
+class CircuitBreakers(object):
+    """
+    One `CircuitBreaker` per API base, created with the given arguments.
+
+    With `threadsafe` each breaker gets a lock of its own, for clients
+    that share them between threads.
+    """
+
+    def __init__(self, threadsafe=False, **breaker_kwargs):
+        self.threadsafe = threadsafe
+        self.breaker_kwargs = breaker_kwargs
+        self._breakers = {}
+        self._lock = threading.Lock() if threadsafe else _NoLock()
+
+    def get(self, api_base):
+        try:
+            return self._breakers[api_base]
+        except KeyError:
+            pass
+
+        with self._lock:
+            breaker = self._breakers.get(api_base)
+            if breaker is None:
+                kwargs = dict(self.breaker_kwargs)
+                if self.threadsafe:
+                    kwargs['lock'] = threading.Lock()
+                breaker = CircuitBreaker(**kwargs)
+                self._breakers[api_base] = breaker
+            return breaker
+
+    def stats(self):
+        return dict((api_base, breaker.stats())
+                    for api_base, breaker in list(self._breakers.items()))
+
+
+class _NoLock(object):
+    """Stands in for a lock where breakers are only used by one thread."""
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
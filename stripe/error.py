@@ -45,6 +45,10 @@ class APIConnectionError(StripeError):
     pass
 
 
+class CircuitOpenError(APIConnectionError):
+    pass
+
+
 class CardError(StripeError):
 
     def __init__(self, message, param, code, http_body=None,
@@ -1,10 +1,12 @@
 import os
 import sys
 import textwrap
+import threading
 import warnings
 import email
 
 from stripe import error, util
+from stripe.circuit import CircuitBreakers
 
 # - Requests is the preferred HTTP library
 # - Google App Engine has urlfetch
@@ -98,7 +100,19 @@ class RequestsClient(HTTPClient):
     def __init__(self, timeout=80, session=None, **kwargs):
         super(RequestsClient, self).__init__(**kwargs)
         self._timeout = timeout
-        self._session = session or requests.Session()
+        self._session = session
+        # Sessions aren't thread-safe, so without one given every thread
+        # gets its own, kept alive between requests
+        self._local = threading.local()
+
+    def _get_session(self):
+        if self._session is not None:
+            return self._session
+
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
 
     def request(self, method, url, headers, post_data=None):
         kwargs = {}
@@ -112,13 +126,14 @@ class RequestsClient(HTTPClient):
             kwargs['proxies'] = self._proxy
 
         try:
+            session = self._get_session()
             try:
-                result = self._session.request(method,
-                                               url,
-                                               headers=headers,
-                                               data=post_data,
-                                               timeout=self._timeout,
-                                               **kwargs)
+                result = session.request(method,
+                                         url,
+                                         headers=headers,
+                                         data=post_data,
+                                         timeout=self._timeout,
+                                         **kwargs)
             except TypeError as e:
                 raise TypeError(
                     'Warning: It looks like your installed version of the '
@@ -369,3 +384,44 @@ class Urllib2Client(HTTPClient):
                "If this problem persists, let us know at support@stripe.com.")
         msg = textwrap.fill(msg) + "\n\n(Network error: " + str(e) + ")"
         raise error.APIConnectionError(msg)
+
+
+class CircuitBreakerClient(HTTPClient):
+    """
+    Wraps another client, failing fast while its API base is unhealthy.
+
+    `breakers` is a `stripe.circuit.CircuitBreakers`, which should be
+    `threadsafe` when the client is shared between threads; while the
+    circuit for a URL's scheme and host is open, requests raise
+    `CircuitOpenError` without touching the network.
+    """
+
+    def __init__(self, client, breakers=None):
+        self._client = client
+        self._breakers = breakers or CircuitBreakers(threadsafe=True)
+        self._verify_ssl_certs = client._verify_ssl_certs
+        self._proxy = client._proxy
+        self.name = client.name
+
+    def request(self, method, url, headers, post_data=None):
+        parsed = urlparse(url)
+        api_base = '%s://%s' % (parsed.scheme, parsed.netloc)
+        breaker = self._breakers.get(api_base)
+        if not breaker.allow():
+            raise error.CircuitOpenError(
+                'Requests to %s are failing, not sending more until it '
+                'recovers.' % (api_base,))
+
+        start = breaker.clock()
+        try:
+            rbody, rcode, rheaders = self._client.request(
+                method, url, headers, post_data)
+        except error.APIConnectionError:
+            breaker.record(True)
+            raise
+        except Exception:
+            breaker.release()
+            raise
+
+        breaker.record(rcode >= 500, breaker.clock() - start)
+        return rbody, rcode, rheaders
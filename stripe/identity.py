@@ -0,0 +1,70 @@
+import weakref
+
+
+def identity_key(values):
+    """
+    Return the `(object type, id)` identifying a Stripe object's values, or
+    None for values such as lists and hashes that have no identity.
+    """
+    object_type = values.get('object')
+    id = values.get('id')
+    if isinstance(object_type, basestring) and isinstance(id, basestring):
+        return (object_type, id)
+    return None
+
+
+class IdentityMap(object):
+    """
+    One StripeObject per `(object type, id)` and scope while it is in use.
+
+    Responses converted with an identity map reuse the object already
+    built for an id instead of building another, so e.g. a page of
+    charges with `expand[]=customer` holds one `Customer` per customer
+    however many charges share it.  The scope, the API key and account
+    the values were fetched with, is part of the identity, so objects are
+    never shared between keys or connected accounts.
+
+    When a later response carries different values for an id the object
+    is refreshed with them in place, as `refresh()` would.  Frozen objects
+    and objects with unsaved changes are left alone instead, and a new
+    object takes their place in the map.
+
+    Objects are held weakly and dropped once nothing else refers to them.
+    Use one map per client or unit of work, e.g. `stripe.identity_map =
+    IdentityMap()` for the sync bindings.
+    """
+
+    def __init__(self):
+        self._objects = weakref.WeakValueDictionary()
+
+    def __len__(self):
+        return len(self._objects)
+
+    def get(self, object_type, id, scope=()):
+        """Return the object loaded for `object_type`, `id` and `scope`."""
+        return self._objects.get((object_type, id) + tuple(scope))
+
+    def load(self, values, construct, scope=()):
+        """
+        Return the object already loaded for `values`' identity in
+        `scope`, or the one `construct(values)` builds, which is
+        remembered for the next.
+        """
+        key = identity_key(values)
+        if key is None:
+            return construct(values)
+        key += tuple(scope)
+
+        obj = self._objects.get(key)
+        if obj is None:
+            obj = self._objects[key] = construct(values)
+        elif obj != values:
+            if obj._frozen or obj._has_unsaved_values():
+                obj = self._objects[key] = construct(values)
+            else:
+                obj.refresh_from(values, obj.api_key,
+                                 stripe_account=obj.stripe_account)
+        return obj
+
+    def clear(self):
+        self._objects.clear()
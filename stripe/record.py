@@ -0,0 +1,63 @@
+from collections import namedtuple
+
+RECORDS = 'records'
+
+# Record classes by field names, None for names that can't be fields
+_record_classes = {}
+
+MAX_RECORD_CLASSES = 512
+
+
+def record_hook(values):
+    """
+    JSON `object_hook` turning every Stripe object (a JSON object with an
+    `object` field) into a compact read-only record.
+
+    Records are namedtuples, one class per set of fields, so they take a
+    fraction of the memory of a dict and much less than a StripeObject.
+    Fields are read as attributes and `_asdict()` returns a dict.  Free
+    form hashes such as `metadata`, and objects whose keys can't be field
+    names, stay dicts.
+    """
+    if 'object' not in values:
+        return values
+
+    fields = tuple(values)
+    try:
+        klass = _record_classes[fields]
+    except KeyError:
+        klass = _record_class(fields)
+
+    if klass is None:
+        return values
+    return klass._make(values.itervalues())
+
+
+def _record_class(fields):
+    if len(_record_classes) >= MAX_RECORD_CLASSES:
+        return None
+
+    try:
+        klass = namedtuple('Record', fields)
+    except (ValueError, UnicodeError):
+        klass = None
+
+    _record_classes[fields] = klass
+    return klass
+
+
+def raw_object_hook(raw):
+    """
+    Return the JSON `object_hook` for a `raw` response mode: None for plain
+    dicts (`raw=True`) or `record_hook` for `raw='records'`.
+    """
+    if raw == RECORDS:
+        return record_hook
+    return None
+
+
+def field(obj, name, default=None):
+    """Read `name` from a raw response, be it a dict or a record."""
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
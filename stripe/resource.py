@@ -1,62 +1,104 @@
+import threading
 import urllib
 import warnings
 import sys
 from copy import deepcopy
 
-from stripe import api_requestor, error, oauth, util, upload_api_base
+import stripe
+from stripe import (
+    api_requestor, error, http_client, oauth, record, util, upload_api_base)
+
+
+_object_classes = None
+
+
+def _object_class(klass_name):
+    global _object_classes
+
+    if _object_classes is None:
+        _object_classes = {
+            'account': Account,
+            'alipay_account': AlipayAccount,
+            'apple_pay_domain': ApplePayDomain,
+            'application_fee': ApplicationFee,
+            'bank_account': BankAccount,
+            'bitcoin_receiver': BitcoinReceiver,
+            'bitcoin_transaction': BitcoinTransaction,
+            'card': Card,
+            'charge': Charge,
+            'country_spec': CountrySpec,
+            'coupon': Coupon,
+            'customer': Customer,
+            'dispute': Dispute,
+            'event': Event,
+            'fee_refund': ApplicationFeeRefund,
+            'file_upload': FileUpload,
+            'invoice': Invoice,
+            'invoiceitem': InvoiceItem,
+            'list': ListObject,
+            'plan': Plan,
+            'recipient': Recipient,
+            'refund': Refund,
+            'source': Source,
+            'subscription': Subscription,
+            'subscription_item': SubscriptionItem,
+            'three_d_secure': ThreeDSecure,
+            'token': Token,
+            'transfer': Transfer,
+            'transfer_reversal': Reversal,
+            'product': Product,
+            'sku': SKU,
+            'order': Order,
+            'order_return': OrderReturn
+        }
 
+    if isinstance(klass_name, basestring):
+        return _object_classes.get(klass_name, StripeObject)
+    return StripeObject
 
-def convert_to_stripe_object(resp, api_key, account):
-    types = {
-        'account': Account,
-        'alipay_account': AlipayAccount,
-        'apple_pay_domain': ApplePayDomain,
-        'application_fee': ApplicationFee,
-        'bank_account': BankAccount,
-        'bitcoin_receiver': BitcoinReceiver,
-        'bitcoin_transaction': BitcoinTransaction,
-        'card': Card,
-        'charge': Charge,
-        'country_spec': CountrySpec,
-        'coupon': Coupon,
-        'customer': Customer,
-        'dispute': Dispute,
-        'event': Event,
-        'fee_refund': ApplicationFeeRefund,
-        'file_upload': FileUpload,
-        'invoice': Invoice,
-        'invoiceitem': InvoiceItem,
-        'list': ListObject,
-        'plan': Plan,
-        'recipient': Recipient,
-        'refund': Refund,
-        'source': Source,
-        'subscription': Subscription,
-        'subscription_item': SubscriptionItem,
-        'three_d_secure': ThreeDSecure,
-        'token': Token,
-        'transfer': Transfer,
-        'transfer_reversal': Reversal,
-        'product': Product,
-        'sku': SKU,
-        'order': Order,
-        'order_return': OrderReturn
-    }
 
+def convert_to_stripe_object(resp, api_key, account):
     if isinstance(resp, list):
         return [convert_to_stripe_object(i, api_key, account) for i in resp]
     elif isinstance(resp, dict) and not isinstance(resp, StripeObject):
-        resp = resp.copy()
-        klass_name = resp.get('object')
-        if isinstance(klass_name, basestring):
-            klass = types.get(klass_name, StripeObject)
-        else:
-            klass = StripeObject
-        return klass.construct_from(resp, api_key, stripe_account=account)
+        def construct(values):
+            klass = _object_class(values.get('object'))
+            return klass.construct_from(
+                values.copy(), api_key, stripe_account=account)
+
+        if stripe.identity_map is not None:
+            return stripe.identity_map.load(
+                resp, construct, (api_key, account))
+        return construct(resp)
     else:
         return resp
 
 
+def stripe_object_hook(api_key, account):
+    """
+    Return a JSON `object_hook` building the StripeObject for each object
+    while a response is parsed, instead of decoding it to dicts and
+    converting those with `convert_to_stripe_object` afterwards.
+
+    Returns None while `stripe.lazy_conversion` is on, as that keeps the
+    plain dicts until they are read.  Objects already in
+    `stripe.identity_map` are reused.
+    """
+    if stripe.lazy_conversion:
+        return None
+
+    def object_hook(values):
+        klass = _object_class(values.get('object'))
+        return klass._construct_decoded(
+            values, api_key, stripe_account=account)
+
+    identity_map = stripe.identity_map
+    if identity_map is not None:
+        scope = (api_key, account)
+        return lambda values: identity_map.load(values, object_hook, scope)
+    return object_hook
+
+
 def convert_array_to_dict(arr):
     if isinstance(arr, list):
         d = {}
@@ -73,6 +115,69 @@ def populate_headers(idempotency_key):
     return None
 
 
+class RequestorRegistry(object):
+    """
+    Hands out long-lived `APIRequestor`s keyed by API key, base and account.
+
+    They all share one HTTP client, `stripe.default_http_client` if it is
+    set, so sync workers keep their connections alive between calls
+    instead of starting a new session for every request.
+    """
+
+    MAX_REQUESTORS = 1024
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._requestors = {}
+        self._http_client = None
+
+    def get(self, api_key=None, api_base=None, account=None):
+        import stripe
+
+        client = self.http_client()
+        key = (api_key, api_base or stripe.api_base, account, client)
+        try:
+            return self._requestors[key]
+        except KeyError:
+            pass
+
+        with self._lock:
+            requestor = self._requestors.get(key)
+            if requestor is None:
+                if len(self._requestors) >= self.MAX_REQUESTORS:
+                    self._requestors.clear()
+                requestor = api_requestor.APIRequestor(
+                    api_key, client=client, api_base=key[1],
+                    account=account, object_hook=stripe_object_hook)
+                self._requestors[key] = requestor
+            return requestor
+
+    def http_client(self):
+        import stripe
+
+        if stripe.default_http_client is not None:
+            return stripe.default_http_client
+
+        settings = (stripe.verify_ssl_certs, stripe.proxy)
+        shared = self._http_client
+        if shared is None or shared[0] != settings:
+            with self._lock:
+                shared = self._http_client
+                if shared is None or shared[0] != settings:
+                    shared = self._http_client = (
+                        settings, http_client.new_default_http_client(
+                            verify_ssl_certs=settings[0], proxy=settings[1]))
+        return shared[1]
+
+    def clear(self):
+        with self._lock:
+            self._requestors.clear()
+            self._http_client = None
+
+
+requestors = RequestorRegistry()
+
+
 def _compute_diff(current, previous):
     if isinstance(current, dict):
         previous = previous or {}
@@ -98,30 +203,74 @@ def _serialize_list(array, previous):
     return params
 
 
+def _freeze(value):
+    if isinstance(value, StripeObject):
+        return value.freeze()
+    elif isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    # Tuples only come from freezing lists
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, StripeObject) and value._frozen:
+        return value.thaw()
+    elif isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    return value
+
+
 class StripeObject(dict):
+    # Most objects are only ever read, so the bookkeeping below is left at
+    # these class defaults until an object is changed, keeping instances
+    # small: the keys set since the last refresh and their values before
+    # that (see _track), keys wiped by the last refresh, and keys whose
+    # values are still raw response data (see refresh_from).
+    _unsaved_values = None
+    _previous = None
+    _transient_values = None
+    _lazy_keys = None
+
+    # Set by freeze
+    _frozen = False
+
     def __init__(self, id=None, api_key=None, stripe_account=None, **params):
         super(StripeObject, self).__init__()
 
-        self._unsaved_values = set()
-        self._transient_values = set()
-
         self._retrieve_params = params
-        self._previous = None
 
         object.__setattr__(self, 'api_key', api_key)
         object.__setattr__(self, 'stripe_account', stripe_account)
 
         if id:
-            self['id'] = id
+            super(StripeObject, self).__setitem__('id', id)
 
     def update(self, update_dict):
+        self._check_mutable()
         for k in update_dict:
-            self._unsaved_values.add(k)
+            self._track(k)
+            self._converted(k)
 
         return super(StripeObject, self).update(update_dict)
 
+    def _track(self, k):
+        unsaved = self._unsaved_values
+        if unsaved is None:
+            unsaved = self._unsaved_values = set()
+        unsaved.add(k)
+
+        # Remember what Stripe last sent for `k`, for serialize to diff
+        # against, before it is first overwritten
+        previous = self._previous
+        if previous is None:
+            previous = self._previous = {}
+        if k not in previous:
+            previous[k] = dict.get(self, k)
+
     def __setattr__(self, k, v):
         if k[0] == '_' or k in self.__dict__:
+            if k[0] != '_':
+                self._check_mutable()
             return super(StripeObject, self).__setattr__(k, v)
 
         self[k] = v
@@ -140,6 +289,8 @@ class StripeObject(dict):
 
     def __delattr__(self, k):
         if k[0] == '_' or k in self.__dict__:
+            if k[0] != '_':
+                self._check_mutable()
             return super(StripeObject, self).__delattr__(k)
         else:
             del self[k]
@@ -151,20 +302,22 @@ class StripeObject(dict):
                 "We interpret empty strings as None in requests."
                 "You may set %s.%s = None to delete the property" % (
                     k, str(self), k))
+        self._check_mutable()
 
+        # Unpickling sets items before restoring the instance's state
+        if '_retrieve_params' in self.__dict__:
+            self._track(k)
         super(StripeObject, self).__setitem__(k, v)
-
-        # Allows for unpickling in Python 3.x
-        if not hasattr(self, '_unsaved_values'):
-            self._unsaved_values = set()
-
-        self._unsaved_values.add(k)
+        self._converted(k)
 
     def __getitem__(self, k):
+        if self._lazy_keys:
+            self._convert_key(k)
+
         try:
             return super(StripeObject, self).__getitem__(k)
         except KeyError as err:
-            if k in self._transient_values:
+            if self._transient_values and k in self._transient_values:
                 raise KeyError(
                     "%r.  HINT: The %r attribute was set in the past."
                     "It was then wiped when refreshing the object with "
@@ -176,11 +329,13 @@ class StripeObject(dict):
                 raise err
 
     def __delitem__(self, k):
+        self._check_mutable()
         super(StripeObject, self).__delitem__(k)
+        self._converted(k)
 
-        # Allows for unpickling in Python 3.x
-        if hasattr(self, '_unsaved_values'):
-            self._unsaved_values.remove(k)
+        if self._unsaved_values is None:
+            raise KeyError(k)
+        self._unsaved_values.remove(k)
 
     @classmethod
     def construct_from(cls, values, key, stripe_account=None):
@@ -190,8 +345,20 @@ class StripeObject(dict):
                               stripe_account=stripe_account)
         return instance
 
+    @classmethod
+    def _construct_decoded(cls, values, key, stripe_account=None):
+        """
+        Like `construct_from`, for values from `stripe_object_hook` whose
+        nested objects have already been built, so none are converted.
+        """
+        instance = cls(values.get('id'), api_key=key,
+                       stripe_account=stripe_account)
+        dict.update(instance, values)
+        return instance
+
     def refresh_from(self, values, api_key=None, partial=False,
                      stripe_account=None):
+        self._check_mutable()
         self.api_key = api_key or getattr(values, 'api_key', None)
         self.stripe_account = \
             stripe_account or getattr(values, 'stripe_account', None)
@@ -200,31 +367,195 @@ class StripeObject(dict):
         # updating a customer, where there is no persistent card
         # parameter.  Mark those values which don't persist as transient
         if partial:
-            self._unsaved_values = (self._unsaved_values - set(values))
+            if self._unsaved_values:
+                self._unsaved_values = (self._unsaved_values - set(values))
+            if self._previous:
+                for k in values:
+                    self._previous.pop(k, None)
         else:
-            removed = set(self.keys()) - set(values)
-            self._transient_values = self._transient_values | removed
-            self._unsaved_values = set()
+            removed = [k for k in dict.iterkeys(self) if k not in values]
+            if removed:
+                self._transient_values = \
+                    (self._transient_values or set()).union(removed)
+            if self._unsaved_values is not None:
+                self._unsaved_values = None
+                self._previous = None
+            if self._lazy_keys is not None:
+                self._lazy_keys = None
             self.clear()
 
-        self._transient_values = self._transient_values - set(values)
+        if self._transient_values:
+            self._transient_values = self._transient_values - set(values)
+
+        if self._convert_lazily():
+            # Keep nested dicts and lists as they are, _convert_key turns
+            # them into StripeObjects when they are first read.  Reading
+            # through dict leaves those of a lazy `values` unconverted too.
+            lazy = self._lazy_keys or set()
+            for k, v in dict.iteritems(values):
+                if isinstance(v, (dict, list)) and \
+                        not isinstance(v, StripeObject):
+                    lazy.add(k)
+                else:
+                    lazy.discard(k)
+                super(StripeObject, self).__setitem__(k, v)
+            if lazy or self._lazy_keys is not None:
+                self._lazy_keys = lazy or None
+        else:
+            for k, v in values.iteritems():
+                self._converted(k)
+                super(StripeObject, self).__setitem__(
+                    k, self._convert_value(v, api_key, stripe_account))
+
+    def _convert_value(self, value, api_key, stripe_account):
+        return convert_to_stripe_object(value, api_key, stripe_account)
 
-        for k, v in values.iteritems():
+    @classmethod
+    def _convert_lazily(cls):
+        return stripe.lazy_conversion
+
+    def _convert_key(self, k):
+        lazy = self._lazy_keys
+        if k in lazy:
+            lazy.discard(k)
+            if not lazy:
+                self._lazy_keys = None
+            value = _thaw(super(StripeObject, self).__getitem__(k))
             super(StripeObject, self).__setitem__(
-                k, convert_to_stripe_object(v, api_key, stripe_account))
+                k, self._convert_value(
+                    value, self.api_key, self.stripe_account))
+
+    def _convert_all(self):
+        for k in list(self._lazy_keys):
+            self._convert_key(k)
 
-        self._previous = values
+    def _converted(self, k):
+        # Allows for unpickling in Python 3.x
+        lazy = getattr(self, '_lazy_keys', None)
+        if lazy:
+            lazy.discard(k)
+            if not lazy:
+                self._lazy_keys = None
+
+    # Every way of reading values converts lazily kept ones first
+
+    def get(self, k, default=None):
+        if self._lazy_keys:
+            self._convert_key(k)
+        return super(StripeObject, self).get(k, default)
+
+    def setdefault(self, k, default=None):
+        self._check_mutable()
+        if self._lazy_keys:
+            self._convert_key(k)
+        return super(StripeObject, self).setdefault(k, default)
+
+    def pop(self, k, *default):
+        self._check_mutable()
+        if self._lazy_keys:
+            self._convert_key(k)
+        return super(StripeObject, self).pop(k, *default)
+
+    def popitem(self):
+        self._check_mutable()
+        return super(StripeObject, self).popitem()
+
+    def clear(self):
+        self._check_mutable()
+        return super(StripeObject, self).clear()
+
+    def items(self):
+        if self._lazy_keys:
+            self._convert_all()
+        return super(StripeObject, self).items()
+
+    def iteritems(self):
+        if self._lazy_keys:
+            self._convert_all()
+        return super(StripeObject, self).iteritems()
+
+    def values(self):
+        if self._lazy_keys:
+            self._convert_all()
+        return super(StripeObject, self).values()
+
+    def itervalues(self):
+        if self._lazy_keys:
+            self._convert_all()
+        return super(StripeObject, self).itervalues()
+
+    def freeze(self):
+        """
+        Make this object and everything in it read-only, in place, and
+        return it.
+
+        Frozen objects can be shared by any number of callers without
+        copying.  Changing one raises `TypeError`, and nested lists become
+        tuples.  Use `thaw` for a copy to change and save.
+        """
+        if not self._frozen:
+            if self._lazy_keys:
+                self._convert_all()
+            for k, v in dict.items(self):
+                super(StripeObject, self).__setitem__(k, _freeze(v))
+            self._frozen = True
+        return self
+
+    def thaw(self):
+        """
+        Return a mutable copy of a frozen object.
+
+        The copy starts out sharing the frozen values, nested objects and
+        lists are copied the first time they are read.
+        """
+        thawed = self._empty_copy()
+
+        lazy = set()
+        for k, v in dict.iteritems(self):
+            if isinstance(v, (dict, list, tuple)):
+                lazy.add(k)
+            super(StripeObject, thawed).__setitem__(k, v)
+        if lazy:
+            thawed._lazy_keys = lazy
+        return thawed
+
+    def _has_unsaved_values(self):
+        """Return whether this or a nested object has unsaved changes."""
+        if self._unsaved_values:
+            return True
+        for v in dict.itervalues(self):
+            for item in (v if isinstance(v, list) else (v,)):
+                if isinstance(item, StripeObject) and \
+                        item._has_unsaved_values():
+                    return True
+        return False
+
+    def _empty_copy(self):
+        copy = type(self)(self.get('id'), self.api_key,
+                          stripe_account=self.stripe_account)
+        copy._retrieve_params = self._retrieve_params
+        return copy
+
+    def _check_mutable(self):
+        if self._frozen:
+            raise TypeError(
+                "%s %s is frozen and cannot be changed, call thaw() for a "
+                "mutable copy" % (type(self).__name__, self.get('id')))
 
     @classmethod
     def api_base(cls):
         return None
 
-    def request(self, method, url, params=None, headers=None):
+    def request(self, method, url, params=None, headers=None, raw=False):
         if params is None:
             params = self._retrieve_params
-        requestor = api_requestor.APIRequestor(
-            key=self.api_key, api_base=self.api_base(),
+        requestor = requestors.get(
+            self.api_key, api_base=self.api_base(),
             account=self.stripe_account)
+        if raw:
+            response, _ = requestor.request(
+                method, url, params, headers, raw=raw)
+            return response
         response, api_key = requestor.request(method, url, params, headers)
 
         return convert_to_stripe_object(response, api_key, self.stripe_account)
@@ -331,12 +662,20 @@ class StripeObjectEncoder(util.json.JSONEncoder):
 class APIResource(StripeObject):
 
     @classmethod
-    def retrieve(cls, id, api_key=None, **params):
+    def retrieve(cls, id, api_key=None, raw=False, **params):
         instance = cls(id, api_key, **params)
+        if raw:
+            return instance.request('get', instance.instance_url(), raw=raw)
         instance.refresh()
         return instance
 
     def refresh(self):
+        """
+        Update this object from the API and return it, or for a frozen
+        object return a new frozen one, leaving this one as it is.
+        """
+        if self._frozen:
+            return self._empty_copy().refresh().freeze()
         self.refresh_from(self.request('get', self.instance_url()))
         return self
 
@@ -439,15 +778,34 @@ class ListableAPIResource(APIResource):
 
     @classmethod
     def auto_paging_iter(cls, *args, **params):
+        if params.get('raw'):
+            return cls._raw_paging_iter(*args, **params)
         return cls.list(*args, **params).auto_paging_iter()
 
+    @classmethod
+    def _raw_paging_iter(cls, *args, **params):
+        while True:
+            page = cls.list(*args, **params)
+            item_id = None
+            for item in record.field(page, 'data', ()):
+                item_id = record.field(item, 'id')
+                yield item
+
+            if not record.field(page, 'has_more') or item_id is None:
+                return
+
+            params['starting_after'] = item_id
+
     @classmethod
     def list(cls, api_key=None, idempotency_key=None,
-             stripe_account=None, **params):
-        requestor = api_requestor.APIRequestor(api_key,
-                                               api_base=cls.api_base(),
-                                               account=stripe_account)
+             stripe_account=None, raw=False, **params):
+        requestor = requestors.get(api_key,
+                                   api_base=cls.api_base(),
+                                   account=stripe_account)
         url = cls.class_url()
+        if raw:
+            response, _ = requestor.request('get', url, params, raw=raw)
+            return response
         response, api_key = requestor.request('get', url, params)
         stripe_object = convert_to_stripe_object(response, api_key,
                                                  stripe_account)
@@ -460,7 +818,7 @@ class CreateableAPIResource(APIResource):
     @classmethod
     def create(cls, api_key=None, idempotency_key=None,
                stripe_account=None, **params):
-        requestor = api_requestor.APIRequestor(api_key, account=stripe_account)
+        requestor = requestors.get(api_key, account=stripe_account)
         url = cls.class_url()
         headers = populate_headers(idempotency_key)
         response, api_key = requestor.request('post', url, params, headers)
@@ -472,7 +830,7 @@ class UpdateableAPIResource(APIResource):
     @classmethod
     def _modify(cls, url, api_key=None, idempotency_key=None,
                 stripe_account=None, **params):
-        requestor = api_requestor.APIRequestor(api_key, account=stripe_account)
+        requestor = requestors.get(api_key, account=stripe_account)
         headers = populate_headers(idempotency_key)
         response, api_key = requestor.request('post', url, params, headers)
         return convert_to_stripe_object(response, api_key, stripe_account)
@@ -505,8 +863,10 @@ class DeletableAPIResource(APIResource):
 class Account(CreateableAPIResource, ListableAPIResource,
               UpdateableAPIResource, DeletableAPIResource):
     @classmethod
-    def retrieve(cls, id=None, api_key=None, **params):
+    def retrieve(cls, id=None, api_key=None, raw=False, **params):
         instance = cls(id, api_key, **params)
+        if raw:
+            return instance.request('get', instance.instance_url(), raw=raw)
         instance.refresh()
         return instance
 
@@ -706,8 +1066,8 @@ class Charge(CreateableAPIResource, ListableAPIResource,
         return self
 
     def update_dispute(self, idempotency_key=None, **params):
-        requestor = api_requestor.APIRequestor(self.api_key,
-                                               account=self.stripe_account)
+        requestor = requestors.get(self.api_key,
+                                   account=self.stripe_account)
         url = self.instance_url() + '/dispute'
         headers = populate_headers(idempotency_key)
         response, api_key = requestor.request('post', url, params, headers)
@@ -715,8 +1075,8 @@ class Charge(CreateableAPIResource, ListableAPIResource,
         return self.dispute
 
     def close_dispute(self, idempotency_key=None):
-        requestor = api_requestor.APIRequestor(self.api_key,
-                                               account=self.stripe_account)
+        requestor = requestors.get(self.api_key,
+                                   account=self.stripe_account)
         url = self.instance_url() + '/dispute/close'
         headers = populate_headers(idempotency_key)
         response, api_key = requestor.request('post', url, {}, headers)
@@ -782,8 +1142,8 @@ class Customer(CreateableAPIResource, UpdateableAPIResource,
             '`subscriptions` resource on the customer object to update a '
             'subscription',
             DeprecationWarning)
-        requestor = api_requestor.APIRequestor(self.api_key,
-                                               account=self.stripe_account)
+        requestor = requestors.get(self.api_key,
+                                   account=self.stripe_account)
         url = self.instance_url() + '/subscription'
         headers = populate_headers(idempotency_key)
         response, api_key = requestor.request('post', url, params, headers)
@@ -796,8 +1156,8 @@ class Customer(CreateableAPIResource, UpdateableAPIResource,
             '`subscriptions` resource on the customer object to cancel a '
             'subscription',
             DeprecationWarning)
-        requestor = api_requestor.APIRequestor(self.api_key,
-                                               account=self.stripe_account)
+        requestor = requestors.get(self.api_key,
+                                   account=self.stripe_account)
         url = self.instance_url() + '/subscription'
         headers = populate_headers(idempotency_key)
         response, api_key = requestor.request('delete', url, params, headers)
@@ -805,8 +1165,8 @@ class Customer(CreateableAPIResource, UpdateableAPIResource,
         return self.subscription
 
     def delete_discount(self, **params):
-        requestor = api_requestor.APIRequestor(self.api_key,
-                                               account=self.stripe_account)
+        requestor = requestors.get(self.api_key,
+                                   account=self.stripe_account)
         url = self.instance_url() + '/discount'
         _, api_key = requestor.request('delete', url)
         self.refresh_from({'discount': None}, api_key, True)
@@ -831,8 +1191,8 @@ class Invoice(CreateableAPIResource, ListableAPIResource,
         if "subscription_items" in params:
             items = convert_array_to_dict(params["subscription_items"])
             params["subscription_items"] = items
-        requestor = api_requestor.APIRequestor(api_key,
-                                               account=stripe_account)
+        requestor = requestors.get(api_key,
+                                   account=stripe_account)
         url = cls.class_url() + '/upcoming'
         response, api_key = requestor.request('get', url, params)
         return convert_to_stripe_object(response, api_key, stripe_account)
@@ -852,8 +1212,8 @@ class Subscription(CreateableAPIResource, DeletableAPIResource,
                    UpdateableAPIResource, ListableAPIResource):
 
     def delete_discount(self, **params):
-        requestor = api_requestor.APIRequestor(self.api_key,
-                                               account=self.stripe_account)
+        requestor = requestors.get(self.api_key,
+                                   account=self.stripe_account)
         url = self.instance_url() + '/discount'
         _, api_key = requestor.request('delete', url)
         self.refresh_from({'discount': None}, api_key, True)
@@ -947,7 +1307,7 @@ class FileUpload(ListableAPIResource):
 
     @classmethod
     def create(cls, api_key=None, stripe_account=None, **params):
-        requestor = api_requestor.APIRequestor(
+        requestor = requestors.get(
             api_key, api_base=cls.api_base(), account=stripe_account)
         url = cls.class_url()
         supplied_headers = {
@@ -0,0 +1,35 @@
+import random
+
+
+class RetryPolicy(object):
+    """
+    Decides whether a failed request should be retried and how long to wait.
+
+    Connection errors, conflicts (409), rate limits (429) and server errors
+    (5xx) are retried up to `max_retries` times.  The wait grows
+    exponentially from `initial_delay` by `backoff_factor`, is capped at
+    `max_delay` and then reduced by a random fraction of up to `jitter`.
+    """
+
+    RETRY_STATUSES = frozenset([409, 429])
+
+    def __init__(self, max_retries=2, initial_delay=0.5, max_delay=8.0,
+                 backoff_factor=2.0, jitter=0.5, random=random.random):
+        self.max_retries = max_retries
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.backoff_factor = backoff_factor
+        self.jitter = jitter
+        self._random = random
+
+    def should_retry(self, num_retries, rcode=None, connection_error=False):
+        if num_retries >= self.max_retries:
+            return False
+        if connection_error:
+            return True
+        return rcode in self.RETRY_STATUSES or rcode >= 500
+
+    def sleep_time(self, num_retries):
+        delay = min(self.initial_delay * self.backoff_factor ** num_retries,
+                    self.max_delay)
+        return delay * (1 - self.jitter * self._random())
@@ -130,6 +130,8 @@ class StripeTestCase(unittest2.TestCase):
         for attr in self.RESTORE_ATTRIBUTES:
             self._stripe_original_attributes[attr] = getattr(stripe, attr)
 
+        stripe.resource.requestors.clear()
+
         api_base = os.environ.get('STRIPE_API_BASE')
         if api_base:
             stripe.api_base = api_base
@@ -37,6 +37,23 @@ class APIResourceTests(StripeApiTestCase):
         self.assertEqual(5, res.frobble)
         self.assertRaises(KeyError, res.__getitem__, 'bobble')
 
+    def test_refresh_frozen(self):
+        res = MyResource.construct_from({
+            'id': 'foo2',
+            'bobble': 'scrobble',
+        }, 'mykey').freeze()
+        self.mock_response({
+            'id': 'foo2',
+            'frobble': 5,
+        })
+
+        fresh = res.refresh()
+
+        self.assertIsNot(res, fresh)
+        self.assertEqual(5, fresh.frobble)
+        self.assertRaises(TypeError, setattr, fresh, 'frobble', 6)
+        self.assertEqual('scrobble', res.bobble)
+
     def test_convert_to_stripe_object(self):
         sample = {
             'foo': 'bar',
@@ -2,6 +2,8 @@ import pickle
 import sys
 from copy import copy, deepcopy
 
+from mock import patch
+
 import stripe
 from stripe import util
 from stripe.test.helper import StripeUnitTestCase, SAMPLE_INVOICE
@@ -207,3 +209,156 @@ class StripeObjectTests(StripeUnitTestCase):
 
         # Verify that we're actually deep copying nested values.
         self.assertNotEqual(id(nested), id(copied.nested))
+
+    @patch.object(stripe, 'lazy_conversion', True)
+    def test_lazy_conversion(self):
+        obj = stripe.resource.StripeObject.construct_from({
+            'id': 'obj_1',
+            'nested': {'object': 'customer', 'id': 'cus_1'},
+            'items': [{'value': 'foo'}],
+            'other': {'value': 'bar'},
+        }, 'mykey')
+
+        self.assertEqual(set(['nested', 'items', 'other']), obj._lazy_keys)
+        self.assertTrue(type(dict.__getitem__(obj, 'nested')) is dict)
+
+        self.assertTrue(isinstance(obj.nested, stripe.Customer))
+        self.assertEqual('mykey', obj.nested.api_key)
+        self.assertEqual('foo', obj.get('items')[0].value)
+        self.assertEqual(set(['other']), obj._lazy_keys)
+
+        obj.other = 'baz'
+        self.assertEqual(None, obj._lazy_keys)
+
+    def test_lazy_conversion_serializes_unchanged(self):
+        values = {
+            'id': 'obj_1',
+            'nested': {'value': 'foo', 'deeper': {'value': 'bar'}},
+            'list': [1, {'value': 'baz'}],
+        }
+        eager = stripe.resource.StripeObject.construct_from(values, 'mykey')
+        with patch.object(stripe, 'lazy_conversion', True):
+            lazy = stripe.resource.StripeObject.construct_from(
+                values, 'mykey')
+
+        self.assertEqual(str(eager), str(lazy))
+        self.assertEqual(eager, lazy)
+        self.assertEqual(
+            util.json.dumps(eager, sort_keys=True),
+            util.json.dumps(lazy, sort_keys=True))
+
+        lazy.values()
+        self.assertTrue(isinstance(
+            dict.__getitem__(lazy, 'nested'), stripe.resource.StripeObject))
+        self.assertTrue(isinstance(
+            dict.__getitem__(lazy, 'list')[1], stripe.resource.StripeObject))
+        self.assertEqual(None, lazy._lazy_keys)
+
+    def test_object_hook(self):
+        body = util.json.dumps({
+            'object': 'customer',
+            'id': 'cus_1',
+            'metadata': {'foo': 'bar'},
+            'sources': {'object': 'list', 'data': [{'object': 'card'}]},
+        })
+        decoded = util.json.loads(body, object_hook=(
+            stripe.resource.stripe_object_hook('mykey', 'myaccount')))
+        converted = stripe.resource.convert_to_stripe_object(
+            util.json.loads(body), 'mykey', 'myaccount')
+
+        self.assertEqual(converted, decoded)
+        self.assertTrue(isinstance(decoded, stripe.Customer))
+        self.assertTrue(isinstance(decoded.sources.data[0], stripe.Card))
+        self.assertEqual('myaccount', decoded.sources.stripe_account)
+        self.assertFalse(decoded._unsaved_values)
+        self.assertEqual(converted.serialize(None), decoded.serialize(None))
+
+        converted.metadata['foo'] = 'baz'
+        decoded.metadata['foo'] = 'baz'
+        self.assertEqual(converted.serialize(None), decoded.serialize(None))
+
+    @patch.object(stripe, 'lazy_conversion', True)
+    def test_object_hook_lazy(self):
+        self.assertEqual(
+            None, stripe.resource.stripe_object_hook('mykey', None))
+
+    def test_tracking_is_allocated_on_change(self):
+        obj = stripe.resource.StripeObject.construct_from({
+            'id': 'obj_1',
+            'metadata': {'foo': 'bar', 'baz': 'qux'},
+            'name': 'old',
+        }, 'mykey')
+
+        for attr in ('_unsaved_values', '_transient_values', '_previous'):
+            self.assertFalse(attr in obj.__dict__)
+        self.assertEqual({}, obj.serialize(None)['metadata'])
+
+        obj.name = 'new'
+        obj.metadata = {'foo': 'baz'}
+
+        self.assertEqual(set(['name', 'metadata']), obj._unsaved_values)
+        self.assertEqual({
+            'name': 'new',
+            'metadata': {'foo': 'baz', 'baz': ''},
+        }, obj.serialize(None))
+
+        obj.refresh_from({'id': 'obj_1', 'name': 'new'}, 'mykey')
+        self.assertEqual(None, obj._unsaved_values)
+        self.assertEqual(None, obj._previous)
+        self.assertEqual(set(['metadata']), obj._transient_values)
+
+    def test_pickling_keeps_object_clean(self):
+        obj = stripe.resource.StripeObject.construct_from({
+            'id': 'obj_1',
+            'name': 'old',
+        }, 'mykey')
+
+        newobj = pickle.loads(pickle.dumps(obj))
+
+        self.assertEqual('old', newobj.name)
+        self.assertFalse(newobj._unsaved_values)
+        self.assertEqual({}, newobj.serialize(None))
+
+    def test_freeze(self):
+        obj = stripe.resource.StripeObject.construct_from({
+            'id': 'obj_1',
+            'metadata': {'foo': 'bar'},
+            'items': [{'object': 'item', 'id': 'it_1'}],
+        }, 'mykey')
+
+        self.assertIs(obj, obj.freeze())
+        self.assertEqual(('it_1',), tuple(i.id for i in obj['items']))
+
+        for mutate in (lambda: setattr(obj, 'name', 'new'),
+                       lambda: obj.metadata.update({'foo': 'baz'}),
+                       lambda: obj['items'][0].__setitem__('id', 'it_2'),
+                       lambda: obj.pop('id'),
+                       lambda: obj.clear(),
+                       lambda: obj.refresh_from({}, 'mykey')):
+            self.assertRaises(TypeError, mutate)
+
+        newobj = pickle.loads(pickle.dumps(obj))
+        self.assertEqual(obj, newobj)
+        self.assertRaises(TypeError, setattr, newobj, 'name', 'new')
+
+    def test_thaw(self):
+        obj = stripe.resource.StripeObject.construct_from({
+            'id': 'obj_1',
+            'metadata': {'foo': 'bar'},
+            'items': [{'object': 'item', 'id': 'it_1'}],
+        }, 'mykey').freeze()
+
+        thawed = obj.thaw()
+        self.assertIs(obj.metadata, dict.get(thawed, 'metadata'))
+        self.assertEqual({}, thawed.serialize(None)['metadata'])
+
+        thawed.metadata['foo'] = 'baz'
+        thawed['items'][0].name = 'new'
+        thawed.name = 'new'
+
+        self.assertEqual('bar', obj.metadata.foo)
+        self.assertNotIn('name', obj['items'][0])
+        self.assertEqual({
+            'name': 'new',
+            'metadata': {'foo': 'baz'},
+        }, thawed.serialize(None))
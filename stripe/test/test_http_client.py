@@ -1,5 +1,9 @@
+import datetime
 import sys
+import threading
+import time
 import unittest2
+import urllib
 
 from mock import MagicMock, Mock, patch
 
@@ -126,6 +130,27 @@ class RequestsClientTests(StripeUnitTestCase, ClientTestBase):
         self.check_call(None, 'POST', self.valid_url,
                         data, headers, timeout=5)
 
+    def test_session_per_thread(self):
+        import threading
+
+        mock = self.request_mock
+        mock.Session = Mock(side_effect=lambda: Mock())
+        client = self.request_client()
+        sessions = []
+
+        def get():
+            sessions.append(client._get_session())
+            sessions.append(client._get_session())
+
+        thread = threading.Thread(target=get)
+        thread.start()
+        thread.join()
+        get()
+
+        self.assertIs(sessions[0], sessions[1])
+        self.assertIs(sessions[2], sessions[3])
+        self.assertIsNot(sessions[0], sessions[2])
+
     def make_request(self, method, url, headers, post_data, timeout=80):
         client = self.request_client(verify_ssl_certs=True,
                                      timeout=timeout,
@@ -389,6 +414,130 @@ class APIEncodeTest(StripeUnitTestCase):
         self.assertTrue(('foo[][dob][month]', 1) in values)
         self.assertTrue(('foo[][name]', 'bat') in values)
 
+    def test_urlencode_matches_api_encode(self):
+        class Obj(object):
+            stripe_id = 'cus_123'
+
+        bodies = [
+            {},
+            {'amount': 100, 'currency': 'usd', 'description': None},
+            {u'd\xe9scription': u'caf\xe9 & cr\xe8me', 'customer': Obj()},
+            {'metadata': dict(('key_%d' % i, 'value %d' % i)
+                              for i in range(50))},
+            {'expand': ['customer', 'invoice'], 'ids': (1, 2, 3)},
+            {'items': [{'plan': 'gold', 'quantity': 2}, 'loose',
+                       {'plan': 'silver', 'metadata': {'a': 'b'}}]},
+            {'legal_entity': {
+                'dob': {'day': 1, 'month': 2, 'year': 1980},
+                'additional_owners': [
+                    {'first_name': 'Jane', 'dob': {'day': 3}},
+                    {'first_name': 'John', 'address': {'city': 'SF'}}]}},
+            {'created': datetime.datetime(2016, 1, 1),
+             'nested': {'when': datetime.datetime(2016, 1, 2)}},
+        ]
+
+        for body in bodies:
+            self.assertEqual(
+                urllib.urlencode(list(stripe.api_requestor._api_encode(body))),
+                stripe.api_requestor._api_urlencode(body))
+
+
+class CircuitBreakerClientTests(StripeUnitTestCase):
+
+    def setUp(self):
+        super(CircuitBreakerClientTests, self).setUp()
+
+        self.now = 0
+        self.breakers = stripe.circuit.CircuitBreakers(
+            threadsafe=True, minimum_calls=2, window=4, reset_timeout=10,
+            clock=lambda: self.now)
+        self.inner = Mock(name='inner', _verify_ssl_certs=True, _proxy=None)
+        self.inner.name = 'inner'
+        self.client = stripe.http_client.CircuitBreakerClient(
+            self.inner, self.breakers)
+
+    def request(self):
+        return self.client.request(
+            'get', 'https://api.stripe.com/v1/charges', {})
+
+    def fail_twice(self):
+        self.inner.request.side_effect = stripe.error.APIConnectionError()
+        for _ in range(2):
+            self.assertRaises(stripe.error.APIConnectionError, self.request)
+
+    def breaker(self):
+        return self.breakers.get('https://api.stripe.com')
+
+    def test_opens_after_failures(self):
+        self.fail_twice()
+
+        self.assertEqual('open', self.breaker().state)
+        self.assertRaises(stripe.error.CircuitOpenError, self.request)
+        self.assertEqual(2, self.inner.request.call_count)
+        self.assertEqual(1, self.breakers.stats()[
+            'https://api.stripe.com']['rejected'])
+
+    def test_server_errors_count(self):
+        self.inner.request.return_value = ('{}', 503, {})
+        self.request()
+        self.request()
+
+        self.assertEqual('open', self.breaker().state)
+
+    def test_half_open_probe(self):
+        self.fail_twice()
+        self.now = 10
+        self.inner.request.side_effect = None
+        self.inner.request.return_value = ('{}', 200, {})
+
+        self.assertEqual(('{}', 200, {}), self.request())
+        self.assertEqual('closed', self.breaker().state)
+
+    def test_failed_probe_reopens(self):
+        self.fail_twice()
+        self.now = 10
+
+        self.assertRaises(stripe.error.APIConnectionError, self.request)
+        self.assertEqual('open', self.breaker().state)
+        self.assertEqual(2, self.breaker().times_opened)
+
+    def test_one_probe_at_a_time(self):
+        self.fail_twice()
+        self.now = 10
+        breaker = self.breaker()
+
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.release()
+        self.assertTrue(breaker.allow())
+
+    def test_one_probe_across_threads(self):
+        self.fail_twice()
+
+        def slow_clock():
+            # Let every thread in before the circuit is half open
+            time.sleep(0.05)
+            return 10
+        breaker = self.breaker()
+        breaker.clock = slow_clock
+
+        allowed = []
+        threads = [threading.Thread(target=lambda: allowed.append(
+            breaker.allow())) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([False, False, False, True], sorted(allowed))
+
+    def test_slow_calls_count(self):
+        breaker = stripe.circuit.CircuitBreaker(
+            minimum_calls=1, slow_call_duration=5)
+        breaker.record(False, duration=6)
+
+        self.assertEqual('open', breaker.state)
+
 
 if __name__ == '__main__':
     unittest2.main()
@@ -0,0 +1,120 @@
+import gc
+
+import unittest2
+
+from mock import Mock, patch
+
+import stripe
+from stripe import util
+from stripe.identity import IdentityMap, identity_key
+from stripe.resource import convert_to_stripe_object, stripe_object_hook
+
+
+CHARGES = util.json.dumps({
+    'object': 'list',
+    'data': [
+        {'object': 'charge', 'id': 'ch_%d' % i, 'customer': {
+            'object': 'customer', 'id': 'cus_1', 'metadata': {}}}
+        for i in range(3)
+    ],
+})
+
+
+class IdentityMapTests(unittest2.TestCase):
+
+    def setUp(self):
+        self.identity_map = IdentityMap()
+
+    def construct(self, values):
+        return stripe.resource.StripeObject.construct_from(values, 'sk_test')
+
+    def test_identity_key(self):
+        self.assertEqual(('customer', 'cus_1'),
+                         identity_key({'object': 'customer', 'id': 'cus_1'}))
+        self.assertEqual(None, identity_key({'object': 'list'}))
+        self.assertEqual(None, identity_key({'id': 'cus_1'}))
+
+    def test_load_shares_objects(self):
+        construct = Mock(side_effect=self.construct)
+        values = {'object': 'customer', 'id': 'cus_1'}
+
+        first = self.identity_map.load(values, construct)
+        second = self.identity_map.load(dict(values), construct)
+
+        self.assertIs(first, second)
+        self.assertIs(first, self.identity_map.get('customer', 'cus_1'))
+        self.assertEqual(1, construct.call_count)
+
+    def test_changed_values_refresh(self):
+        first = self.identity_map.load(
+            {'object': 'customer', 'id': 'cus_1', 'email': 'a@b.com'},
+            self.construct)
+        second = self.identity_map.load(
+            {'object': 'customer', 'id': 'cus_1', 'email': 'c@d.com'},
+            self.construct)
+
+        self.assertIs(first, second)
+        self.assertEqual('c@d.com', first.email)
+
+    def test_frozen_objects_are_replaced(self):
+        first = self.identity_map.load(
+            {'object': 'customer', 'id': 'cus_1', 'email': 'a@b.com'},
+            self.construct).freeze()
+        second = self.identity_map.load(
+            {'object': 'customer', 'id': 'cus_1', 'email': 'c@d.com'},
+            self.construct)
+
+        self.assertIsNot(first, second)
+        self.assertEqual('a@b.com', first.email)
+        self.assertEqual('c@d.com', second.email)
+
+    def test_unsaved_objects_are_replaced(self):
+        first = self.identity_map.load(
+            {'object': 'customer', 'id': 'cus_1', 'email': 'a@b.com',
+             'metadata': {}}, self.construct)
+        first.metadata['tier'] = 'gold'
+        second = self.identity_map.load(
+            {'object': 'customer', 'id': 'cus_1', 'email': 'c@d.com',
+             'metadata': {}}, self.construct)
+
+        self.assertIsNot(first, second)
+        self.assertEqual({'metadata': {'tier': 'gold'}},
+                         first.serialize(None))
+        self.assertEqual('c@d.com', second.email)
+        self.assertIs(second, self.identity_map.get('customer', 'cus_1'))
+
+    def test_scopes_are_kept_apart(self):
+        values = {'object': 'customer', 'id': 'cus_1'}
+
+        first = self.identity_map.load(
+            values, self.construct, ('sk_a', 'acct_a'))
+        second = self.identity_map.load(
+            dict(values), self.construct, ('sk_b', 'acct_b'))
+
+        self.assertIsNot(first, second)
+        self.assertIs(second, self.identity_map.get(
+            'customer', 'cus_1', ('sk_b', 'acct_b')))
+
+    def test_objects_are_held_weakly(self):
+        self.identity_map.load(
+            {'object': 'customer', 'id': 'cus_1'}, self.construct)
+        gc.collect()
+
+        self.assertEqual(0, len(self.identity_map))
+
+    def test_expanded_objects_are_shared(self):
+        with patch.object(stripe, 'identity_map', self.identity_map):
+            decoded = util.json.loads(
+                CHARGES, object_hook=stripe_object_hook('sk_test', None))
+            converted = convert_to_stripe_object(
+                util.json.loads(CHARGES), 'sk_test', None)
+
+        for charges in (decoded, converted):
+            customers = set(id(c.customer) for c in charges.data)
+            self.assertEqual(1, len(customers))
+            self.assertIsInstance(charges.data[0].customer, stripe.Customer)
+        self.assertIs(decoded.data[0].customer, converted.data[0].customer)
+
+
+if __name__ == '__main__':
+    unittest2.main()
@@ -0,0 +1,99 @@
+import unittest2
+
+from mock import Mock
+
+import stripe
+from stripe import record, util
+
+
+CUSTOMER = ('{"object": "customer", "id": "cus_1", "email": null, '
+            '"metadata": {"order-id": "6735"}}')
+
+
+class RecordTests(unittest2.TestCase):
+
+    def decode(self, body):
+        return util.json.loads(body, object_hook=record.record_hook)
+
+    def test_stripe_objects_become_records(self):
+        customer = self.decode(CUSTOMER)
+
+        self.assertEqual('cus_1', customer.id)
+        self.assertEqual(None, customer.email)
+        self.assertEqual({'order-id': '6735'}, customer.metadata)
+        self.assertEqual(
+            util.json.loads(CUSTOMER), customer._asdict())
+        self.assertEqual((), type(customer).__slots__)
+
+    def test_classes_are_shared(self):
+        first = self.decode(CUSTOMER)
+        second = self.decode(CUSTOMER.replace('cus_1', 'cus_2'))
+
+        self.assertIs(type(first), type(second))
+
+    def test_invalid_field_names(self):
+        values = self.decode('{"object": "thing", "class": 1, "_x": 2}')
+
+        self.assertEqual({'object': 'thing', 'class': 1, '_x': 2}, values)
+
+    def test_field(self):
+        customer = self.decode(CUSTOMER)
+
+        self.assertEqual('cus_1', record.field(customer, 'id'))
+        self.assertEqual(None, record.field(customer, 'missing'))
+        self.assertEqual('6735', record.field(customer.metadata, 'order-id'))
+
+    def test_raw_object_hook(self):
+        self.assertEqual(None, record.raw_object_hook(True))
+        self.assertIs(record.record_hook, record.raw_object_hook('records'))
+
+
+class RawResourceTests(unittest2.TestCase):
+
+    def setUp(self):
+        self.http_client = Mock(stripe.http_client.HTTPClient)
+        self.http_client._verify_ssl_certs = True
+        self.http_client.name = 'mockclient'
+        stripe.default_http_client = self.http_client
+        stripe.resource.requestors.clear()
+
+    def tearDown(self):
+        stripe.default_http_client = None
+        stripe.resource.requestors.clear()
+
+    def mock_response(self, *bodies):
+        self.http_client.request = Mock(
+            side_effect=[(body, 200, {}) for body in bodies])
+
+    def test_retrieve(self):
+        self.mock_response(CUSTOMER, CUSTOMER)
+
+        customer = stripe.Customer.retrieve(
+            'cus_1', api_key='sk_test', raw=True)
+        self.assertTrue(type(customer) is dict)
+        self.assertEqual('cus_1', customer['id'])
+
+        customer = stripe.Customer.retrieve(
+            'cus_1', api_key='sk_test', raw='records')
+        self.assertEqual('cus_1', customer.id)
+
+        url = self.http_client.request.call_args[0][1]
+        self.assertEqual('https://api.stripe.com/v1/customers/cus_1', url)
+
+    def test_auto_paging_iter(self):
+        self.mock_response(
+            '{"object": "list", "has_more": true, "data": [%s]}' % CUSTOMER,
+            '{"object": "list", "has_more": false, "data": [%s]}' %
+            CUSTOMER.replace('cus_1', 'cus_2'))
+
+        customers = list(stripe.Customer.auto_paging_iter(
+            api_key='sk_test', raw='records', limit=1))
+
+        self.assertEqual(['cus_1', 'cus_2'], [c.id for c in customers])
+        url = self.http_client.request.call_args[0][1]
+        self.assertIn('starting_after=cus_1', url)
+        self.assertNotIn('raw', url)
+
+
+if __name__ == '__main__':
+    unittest2.main()
@@ -2,9 +2,10 @@ import datetime
 import unittest2
 import urlparse
 
-from mock import Mock, ANY
+from mock import Mock, ANY, patch
 
 import stripe
+import stripe.retry
 
 from stripe.test.helper import (
     StripeAPIRequestorTestCase,
@@ -268,6 +269,28 @@ class APIRequestorRequestTests(StripeAPIRequestorTestCase):
         self.requestor.request('get', self.valid_path, {}, {'foo': 'bar'})
         self.check_call('get', headers=APIHeaderMatcher(extra={'foo': 'bar'}))
 
+    def test_header_template_is_reused(self):
+        with patch('platform.platform', return_value='plat') as platform:
+            stripe.api_requestor._client_user_agents.clear()
+            first = self.requestor.request_headers('sk_test', 'get')
+            first['foo'] = 'bar'
+            second = self.requestor.request_headers('sk_test', 'post')
+
+        self.assertEqual(1, platform.call_count)
+        self.assertNotIn('foo', second)
+        self.assertEqual(
+            'application/x-www-form-urlencoded', second['Content-Type'])
+        stripe.api_requestor._client_user_agents.clear()
+
+    def test_header_template_follows_settings(self):
+        self.requestor.request_headers('sk_test', 'get')
+        stripe.api_version = 'fooversion'
+
+        headers = self.requestor.request_headers('sk_other', 'get')
+
+        self.assertEqual('fooversion', headers['Stripe-Version'])
+        self.assertEqual('Bearer sk_other', headers['Authorization'])
+
     def test_uses_instance_key(self):
         key = 'fookey'
         requestor = stripe.api_requestor.APIRequestor(key,
@@ -380,6 +403,115 @@ class APIRequestorRequestTests(StripeAPIRequestorTestCase):
                           self.requestor.request,
                           'foo', 'bar')
 
+    def test_object_hook(self):
+        hooks = []
+        object_hook = Mock(side_effect=lambda values: values.get('object'))
+        requestor = stripe.api_requestor.APIRequestor(
+            'sk_test', client=self.http_client, account='acct_1',
+            object_hook=lambda *args: hooks.append(args) or object_hook)
+
+        self.mock_response('{"object": "charge", "card": {}}', 200)
+        body, _ = requestor.request('get', self.valid_path)
+
+        self.assertEqual('charge', body)
+        self.assertEqual([('sk_test', 'acct_1')], hooks)
+        self.assertEqual(2, object_hook.call_count)
+
+    def test_object_hook_skips_errors(self):
+        object_hook = Mock()
+        requestor = stripe.api_requestor.APIRequestor(
+            'sk_test', client=self.http_client, object_hook=object_hook)
+
+        self.mock_response('{"error": {}}', 404)
+
+        self.assertRaises(stripe.error.InvalidRequestError,
+                          requestor.request, 'get', self.valid_path)
+        self.assertFalse(object_hook.called)
+
+
+class APIRequestorRetryTests(StripeAPIRequestorTestCase):
+
+    def setUp(self):
+        super(APIRequestorRetryTests, self).setUp()
+
+        self.sleep_patcher = patch('stripe.api_requestor.time.sleep')
+        self.sleep = self.sleep_patcher.start()
+
+        self.requestor = stripe.api_requestor.APIRequestor(
+            client=self.http_client,
+            retry_policy=stripe.retry.RetryPolicy(max_retries=2, jitter=0))
+
+    def tearDown(self):
+        super(APIRequestorRetryTests, self).tearDown()
+
+        self.sleep_patcher.stop()
+
+    def mock_responses(self, *responses):
+        self.http_client.request = Mock(side_effect=list(responses))
+
+    def test_retries_server_errors(self):
+        self.mock_responses(('{"error": {}}', 500, {}),
+                            ('{"error": {}}', 429, {}),
+                            ('{"foo": "bar"}', 200, {}))
+
+        body, key = self.requestor.request('get', '/foo')
+
+        self.assertEqual({'foo': 'bar'}, body)
+        self.assertEqual(3, self.http_client.request.call_count)
+        self.assertEqual([((0.5,), {}), ((1.0,), {})],
+                         self.sleep.call_args_list)
+
+    def test_retries_connection_errors(self):
+        self.mock_responses(stripe.error.APIConnectionError('reset'),
+                            ('{}', 200, {}))
+
+        self.requestor.request('get', '/foo')
+
+        self.assertEqual(2, self.http_client.request.call_count)
+
+    def test_gives_up_after_max_retries(self):
+        self.mock_responses(*[('{"error": {}}', 503, {})] * 3)
+
+        self.assertRaises(stripe.error.APIError,
+                          self.requestor.request, 'get', '/foo')
+        self.assertEqual(3, self.http_client.request.call_count)
+
+    def test_does_not_retry_client_errors(self):
+        self.mock_responses(('{"error": {}}', 400, {}))
+
+        self.assertRaises(stripe.error.InvalidRequestError,
+                          self.requestor.request, 'get', '/foo')
+        self.assertEqual(1, self.http_client.request.call_count)
+
+    def test_posts_get_one_idempotency_key(self):
+        self.mock_responses(('{"error": {}}', 500, {}), ('{}', 200, {}))
+
+        self.requestor.request('post', '/foo', {'amount': 100})
+
+        first, second = self.http_client.request.call_args_list
+        key = first[0][2]['Idempotency-Key']
+        self.assertTrue(key)
+        self.assertEqual(key, second[0][2]['Idempotency-Key'])
+
+    def test_keeps_supplied_idempotency_key(self):
+        self.mock_responses(('{}', 200, {}))
+
+        self.requestor.request('post', '/foo', {},
+                               {'Idempotency-Key': 'mykey'})
+
+        headers = self.http_client.request.call_args[0][2]
+        self.assertEqual('mykey', headers['Idempotency-Key'])
+
+    def test_no_retries_by_default(self):
+        self.requestor = stripe.api_requestor.APIRequestor(
+            client=self.http_client)
+        self.mock_responses(('{"error": {}}', 500, {}))
+
+        self.assertRaises(stripe.error.APIError,
+                          self.requestor.request, 'post', '/foo')
+        headers = self.http_client.request.call_args[0][2]
+        self.assertNotIn('Idempotency-Key', headers)
+
 
 class OAuthRequestorRequestTests(StripeOAuthRequestorTestCase):
     def test_oauth_error(self):
@@ -413,5 +545,71 @@ class DefaultClientTests(unittest2.TestCase):
         stripe.default_http_client = None
 
 
+class RequestorRegistryTests(unittest2.TestCase):
+
+    def setUp(self):
+        self.registry = stripe.resource.RequestorRegistry()
+        self.http_client = Mock(stripe.http_client.HTTPClient)
+        self.http_client._verify_ssl_certs = True
+        self.http_client.name = 'mockclient'
+        stripe.default_http_client = self.http_client
+
+    def tearDown(self):
+        stripe.default_http_client = None
+
+    def test_requestors_are_reused(self):
+        first = self.registry.get('sk_test', account='acct_1')
+
+        self.assertIs(first, self.registry.get('sk_test', account='acct_1'))
+        self.assertIsNot(first, self.registry.get('sk_test'))
+        self.assertIsNot(
+            first, self.registry.get('sk_test', 'https://uploads.stripe.com',
+                                     account='acct_1'))
+        self.assertEqual('acct_1', first.stripe_account)
+        self.assertIs(self.http_client, first._client)
+
+    def test_shared_http_client(self):
+        stripe.default_http_client = None
+        with patch('stripe.http_client.new_default_http_client') as new:
+            first = self.registry.get('sk_test')
+            second = self.registry.get('sk_other')
+
+        new.assert_called_once_with(verify_ssl_certs=True, proxy=None)
+        self.assertIs(first._client, second._client)
+
+    def test_resources_use_registry(self):
+        self.http_client.request = Mock(return_value=('{}', 200, {}))
+        stripe.resource.requestors.clear()
+
+        stripe.Charge.list(api_key='sk_test')
+        stripe.Customer.list(api_key='sk_test')
+
+        self.assertEqual(1, len(stripe.resource.requestors._requestors))
+        stripe.resource.requestors.clear()
+
+    def test_resources_decode_in_one_pass(self):
+        self.http_client.request = Mock(return_value=(
+            '{"object": "customer", "id": "cus_1", '
+            '"sources": {"object": "list", "data": '
+            '[{"object": "card", "id": "card_1"}]}}', 200, {}))
+        stripe.resource.requestors.clear()
+
+        with patch('stripe.resource.convert_to_stripe_object',
+                   side_effect=stripe.resource.convert_to_stripe_object) \
+                as convert:
+            customer = stripe.Customer.retrieve(
+                'cus_1', api_key='sk_test', stripe_account='acct_1')
+
+        self.assertTrue(isinstance(customer, stripe.Customer))
+        card = customer.sources.data[0]
+        self.assertTrue(isinstance(card, stripe.Card))
+        self.assertEqual('sk_test', card.api_key)
+        self.assertEqual('acct_1', card.stripe_account)
+        # No plain dicts are left over to convert after decoding
+        for args, _ in convert.call_args_list:
+            self.assertFalse(type(args[0]) is dict)
+        stripe.resource.requestors.clear()
+
+
 if __name__ == '__main__':
     unittest2.main()
@@ -4,6 +4,8 @@ from stripe import (  # noqa
     api_key, api_base, upload_api_base,
     api_version, verify_ssl_certs)
 
+from txstripe import scheduling
+
 # Configuration variables
 
 api_key = api_key
@@ -12,15 +14,80 @@ upload_api_base = upload_api_base
 api_version = api_version
 verify_ssl_certs = verify_ssl_certs
 
+# Connection pool settings, see txstripe.pool
+
+connection_pool = None
+max_persistent_per_host = 10
+cached_connection_timeout = 240
+retry_automatically = True
+
+# Share concurrent identical GET requests, see txstripe.coalesce
+
+coalesce_requests = True
+
+# Retry failed requests, see stripe.retry.RetryPolicy
+
+max_network_retries = 0
+
+# Optional txstripe.ratelimit.RateLimiter queueing requests per key/account
+
+rate_limiter = None
+
+# Optional txstripe.scheduling.Scheduler capping requests in flight, and the
+# priority lane requests go in unless their client says otherwise
+
+scheduler = None
+priority = scheduling.DEFAULT
+
+# Seconds allowed to connect, and for the whole request including retries
+# (None waits forever)
+
+connect_timeout = None
+timeout = None
+
+# Optional txstripe.hedging.Hedger duplicating slow GETs
+
+hedger = None
+
+# Optional stripe.circuit.CircuitBreakers failing fast per unhealthy api_base
+
+circuit_breakers = None
+
+# Optional txstripe.cache.ObjectCache used by retrieve and refresh
+
+object_cache = None
+
+# Convert nested objects in responses only when they are first accessed
+
+lazy_conversion = False
+
+# Have retrieve and all return plain dicts (True) or compact records
+# ('records', see stripe.record) instead of StripeObjects
+
+raw = False
+
+# Have retrieve, refresh and all return frozen objects (see
+# StripeObject.freeze), so cached and coalesced responses are decoded once
+# and shared between callers instead of being decoded for each of them
+
+frozen = False
+
+# Optional stripe.identity.IdentityMap sharing one object per type and id
+# between responses, ignored while frozen is on
+
+identity_map = None
+
 from txstripe.resource import (  # noqa
     Account,
     ApplicationFee,
     Balance,
+    BalanceTransaction,
     BankAccount,
     BitcoinReceiver,
     BitcoinTransaction,
     Card,
     Charge,
+    CountrySpec,
     Coupon,
     Customer,
     Dispute,
@@ -29,16 +96,22 @@ from txstripe.resource import (  # noqa
     Invoice,
     InvoiceItem,
     Plan,
+    Product,
     Recipient,
     Refund,
+    SKU,
     Subscription,
     Token,
     Transfer)
 
+from txstripe.client import Client  # noqa
+
 from txstripe.error import (  # noqa
     APIConnectionError,
     APIError,
     AuthenticationError,
     CardError,
     InvalidRequestError,
+    PermissionError,
+    RateLimitError,
     StripeError)
@@ -0,0 +1,127 @@
+"""Read-through cache for retrieved Stripe objects."""
+
+import time
+from collections import OrderedDict
+
+
+class ObjectCache(object):
+
+    """
+    LRU cache of response bodies with per class time-to-live.
+
+    Only classes with a TTL are cached, e.g.::
+
+        txstripe.object_cache = ObjectCache(
+            ttls={'plan': 600, 'coupon': 600, 'country_spec': 86400})
+
+    ``ttls`` is keyed by ``class_name()``; ``default_ttl`` applies to every
+    other class.  Bodies are cached per API key, account and API version,
+    and converted afresh for every hit, so each caller still gets its own
+    objects, unless ``txstripe.frozen`` is on and one frozen object is
+    shared by every hit instead.
+    """
+
+    def __init__(self, max_entries=1000, ttls=None, default_ttl=None,
+                 clock=time.time):
+        self.max_entries = max_entries
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+        self.clock = clock
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict()
+        self._keys_by_url = {}
+
+        # Bumped for a URL by every write to it, so responses to reads sent
+        # before the write can be told apart
+        self._invalidations = 0
+        self._generations = {}
+        self._oldest_generation = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def ttl_for(self, class_name):
+        """Return the TTL for ``class_name`` or None if it isn't cached."""
+        return self.ttls.get(class_name, self.default_ttl)
+
+    def get(self, key):
+        """Return the body cached under ``key`` or None."""
+        try:
+            expires, body = self._entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+
+        if expires <= self.clock():
+            self._forget(key)
+            self.misses += 1
+            return None
+
+        self._entries[key] = (expires, body)
+        self.hits += 1
+        return body
+
+    def generation(self, url):
+        """Return the generation of ``url``, to pass to ``set`` later."""
+        return self._generations.get(url, self._oldest_generation)
+
+    def set(self, key, body, ttl, generation=None):
+        """
+        Cache ``body`` under ``key`` for ``ttl`` seconds, unless its URL
+        was invalidated since ``generation`` was taken.
+        """
+        if generation is not None and generation != self.generation(key[0]):
+            return
+
+        if key in self._entries:
+            del self._entries[key]
+        self._entries[key] = (self.clock() + ttl, body)
+        self._keys_by_url.setdefault(key[0], set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            old_key, _ = self._entries.popitem(last=False)
+            self._forget(old_key)
+            self.evictions += 1
+
+    def invalidate(self, url):
+        """
+        Drop everything cached for ``url`` and the URLs above it.
+
+        Writing to ``/v1/charges/ch_1/refund`` also drops ``/v1/charges/ch_1``.
+        """
+        self._invalidations += 1
+        if len(self._generations) >= self.max_entries:
+            # Every URL is newer than the reads already sent
+            self._generations.clear()
+            self._oldest_generation = self._invalidations
+
+        while url:
+            self._generations[url] = self._invalidations
+            for key in self._keys_by_url.pop(url, ()):
+                self._entries.pop(key, None)
+            url = url.rpartition('/')[0]
+
+    def clear(self):
+        self._entries.clear()
+        self._keys_by_url.clear()
+
+    def stats(self):
+        """Return a dict of counters for monitoring."""
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def _forget(self, key):
+        self._entries.pop(key, None)
+        keys = self._keys_by_url.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_url[key[0]]
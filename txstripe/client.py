@@ -0,0 +1,84 @@
+"""Per-tenant Stripe configuration."""
+
+
+class Client(object):
+
+    """
+    Stripe settings for one API key or connected account.
+
+    Resources are available as attributes and behave exactly like the
+    module level ones, except every request they make (including those of
+    the objects they return) uses this client's settings::
+
+        client = txstripe.Client(api_key='sk_test_123',
+                                 stripe_account='acct_123')
+        d = client.Customer.retrieve('cus_123')
+
+    Settings left as ``None`` fall back to the module level configuration,
+    so many clients can share one reactor without touching globals.
+    """
+
+    def __init__(self, api_key=None, stripe_account=None, api_base=None,
+                 api_version=None, pool=None, coalesce_requests=None,
+                 object_cache=None, retry_policy=None, rate_limiter=None,
+                 scheduler=None, priority=None, circuit_breakers=None,
+                 timeout=None, connect_timeout=None, hedger=None,
+                 lazy_conversion=None, raw=None, frozen=None,
+                 identity_map=None, reactor=None):
+        self.api_key = api_key
+        self.stripe_account = stripe_account
+        self.api_base = api_base
+        self.api_version = api_version
+        self.pool = pool
+        self.coalesce_requests = coalesce_requests
+        self.object_cache = object_cache
+        self.retry_policy = retry_policy
+        self.rate_limiter = rate_limiter
+        self.scheduler = scheduler
+        self.priority = priority
+        self.circuit_breakers = circuit_breakers
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.hedger = hedger
+        self.lazy_conversion = lazy_conversion
+        self.raw = raw
+        self.frozen = frozen
+        self.identity_map = identity_map
+        self.reactor = reactor
+
+        self._bound = {}
+        self._header_templates = {}
+
+    def bind(self, klass):
+        """Return a subclass of ``klass`` whose requests use this client."""
+        try:
+            return self._bound[klass]
+        except KeyError:
+            pass
+
+        if klass._client is self:
+            return klass
+
+        bound = type(klass.__name__, (klass,), {'_client': self})
+        self._bound[klass] = bound
+        return bound
+
+    def __getattr__(self, name):
+        if name[0] == '_':
+            raise AttributeError(name)
+
+        from txstripe import resource
+
+        klass = getattr(resource, name, None)
+        if not (isinstance(klass, type) and
+                issubclass(klass, resource.StripeObject)):
+            raise AttributeError(name)
+
+        return self.bind(klass)
+
+    def __repr__(self):
+        return '<%s stripe_account=%r at %s>' % (
+            type(self).__name__, self.stripe_account, hex(id(self)))
+
+
+default_client = Client()
@@ -0,0 +1,71 @@
+"""Share identical in-flight requests between concurrent callers."""
+
+from twisted.internet import defer
+from twisted.python.failure import Failure
+
+
+class _Flight(object):
+
+    """One in-flight call and the Deferreds waiting on it."""
+
+    def __init__(self, flights, key):
+        self.flights = flights
+        self.key = key
+        self.waiters = []
+        self.deferred = None
+
+    def wait(self):
+        d = defer.Deferred(self._cancel)
+        self.waiters.append(d)
+        return d
+
+    def land(self, result):
+        if self.flights.get(self.key) is self:
+            del self.flights[self.key]
+
+        waiters, self.waiters = self.waiters, []
+        for d in waiters:
+            if isinstance(result, Failure):
+                d.errback(result)
+            else:
+                d.callback(result)
+
+    def _cancel(self, d):
+        self.waiters.remove(d)
+        if self.waiters or self.deferred.called:
+            return
+
+        # Nobody is interested any more, give up on the call itself.
+        if self.flights.get(self.key) is self:
+            del self.flights[self.key]
+        self.deferred.cancel()
+
+
+class SingleFlight(object):
+
+    """
+    Run at most one call per key at a time.
+
+    Callers asking for a key that is already in flight get their own
+    Deferred which fires with the same result (or failure) as the first
+    call.  Cancelling one caller's Deferred only cancels the underlying
+    call once every caller has lost interest.
+    """
+
+    def __init__(self):
+        self._flights = {}
+
+    def __len__(self):
+        return len(self._flights)
+
+    def call(self, key, f, *args, **kwargs):
+        """Return a Deferred for ``f(*args, **kwargs)`` shared on ``key``."""
+        flight = self._flights.get(key)
+        if flight is not None:
+            return flight.wait()
+
+        flight = self._flights[key] = _Flight(self._flights, key)
+        d = flight.wait()
+        flight.deferred = defer.maybeDeferred(f, *args, **kwargs)
+        flight.deferred.addBoth(flight.land)
+        return d
@@ -3,6 +3,9 @@ from stripe.error import (  # noqa
     APIError,
     AuthenticationError,
     CardError,
+    CircuitOpenError,
     InvalidRequestError,
+    PermissionError,
+    RateLimitError,
     StripeError
 )
@@ -0,0 +1,193 @@
+"""Incremental sync of Stripe events with a persisted cursor."""
+
+import json
+import sqlite3
+from collections import deque
+
+from twisted.internet import defer
+from twisted.python import failure
+
+from stripe import record
+
+from txstripe import jsonfile, resource
+
+
+class FileCursorStore(object):
+
+    """Keep the state of a sync in a JSON file, replaced whole each save."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        return jsonfile.load(self.path)
+
+    def save(self, state):
+        jsonfile.save(self.path, state)
+
+
+class SQLiteCursorStore(object):
+
+    """Keep the state of the sync called ``name`` in a SQLite database."""
+
+    def __init__(self, path, name='events'):
+        self.name = name
+        self._db = sqlite3.connect(path)
+        with self._db:
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS txstripe_sync '
+                '(name TEXT PRIMARY KEY, state TEXT NOT NULL)')
+
+    def load(self):
+        row = self._db.execute(
+            'SELECT state FROM txstripe_sync WHERE name = ?',
+            (self.name,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def save(self, state):
+        with self._db:
+            self._db.execute(
+                'INSERT OR REPLACE INTO txstripe_sync (name, state) '
+                'VALUES (?, ?)', (self.name, json.dumps(state)))
+
+    def close(self):
+        self._db.close()
+
+
+class EventSync(object):
+
+    """
+    Catch up on the events created since the last run.
+
+    Every ``run`` lists the events after the saved cursor with
+    ``ending_before``, oldest first, and hands each one to the handlers
+    registered for its type (or ``'*'``), at most ``workers`` at a time::
+
+        sync = EventSync(FileCursorStore('events.json'))
+        sync.on('charge.succeeded', record_payment)
+        d = sync.run()
+
+    The cursor only moves past a page once every event in it has been
+    handled, and the ids of the last ``window`` events handled are saved
+    with it, so events are handled again after a failure but never twice.
+    Webhook receivers can share the deduplication through ``dispatch``.
+
+    The first run only saves the newest event as the cursor, so handlers
+    see the events created after it.  ``events`` is the ``Event`` class to
+    list with, e.g. ``client.Event``.
+    """
+
+    def __init__(self, store, events=resource.Event, workers=4, limit=100,
+                 window=1000):
+        self.store = store
+        self.events = events
+        self.limit = limit
+
+        self._handlers = {}
+        self._handling = {}
+        self._pool = defer.DeferredSemaphore(workers)
+
+        state = store.load() or {}
+        self.cursor = state.get('cursor')
+        self._seen = deque(state.get('seen', ()), maxlen=window)
+        self._seen_ids = set(self._seen)
+
+    def on(self, type, handler):
+        """
+        Call ``handler`` with every event of ``type``, or every event for
+        ``'*'``.  Handlers may return Deferreds.
+        """
+        self._handlers.setdefault(type, []).append(handler)
+
+    def dispatch(self, event):
+        """
+        Hand ``event`` to its handlers unless it was handled before, and
+        return a Deferred firing with whether this call handled it.  While
+        another call is handling it, wait for that one and fail with it.
+        """
+        event_id = record.field(event, 'id')
+        if event_id in self._seen_ids:
+            return defer.succeed(False)
+        if event_id in self._handling:
+            waiting = defer.Deferred()
+            self._handling[event_id].append(waiting)
+            return waiting
+        self._handling[event_id] = []
+
+        handlers = (self._handlers.get(record.field(event, 'type'), []) +
+                    self._handlers.get('*', []))
+        d = defer.gatherResults(
+            [defer.maybeDeferred(handler, event) for handler in handlers],
+            consumeErrors=True)
+        d.addErrback(lambda err: err.value.subFailure)
+        d.addCallback(lambda _: self._handled(event_id))
+
+        def done(result):
+            for waiting in self._handling.pop(event_id):
+                if isinstance(result, failure.Failure):
+                    waiting.errback(result)
+                else:
+                    waiting.callback(False)
+            return result
+
+        return d.addBoth(done)
+
+    @defer.inlineCallbacks
+    def run(self):
+        """
+        Handle every event created since the last run and return a
+        Deferred firing with the number handled.
+        """
+        if self.cursor is None:
+            page = yield self.events.all(limit=1)
+            newest = record.field(page, 'data', ())
+            if newest:
+                self.cursor = record.field(newest[0], 'id')
+                self.save()
+            defer.returnValue(0)
+
+        count = 0
+        fetching = self._fetch(self.cursor)
+        while fetching is not None:
+            page = yield fetching
+            events = list(reversed(record.field(page, 'data', ())))
+            if not events:
+                break
+
+            # The newest event is the next cursor, read on meanwhile
+            fetching = None
+            if record.field(page, 'has_more'):
+                fetching = self._fetch(record.field(events[-1], 'id'))
+
+            results = yield defer.DeferredList(
+                [self._pool.run(self.dispatch, event) for event in events],
+                consumeErrors=True)
+            failures = [result for ok, result in results if not ok]
+            if failures:
+                if fetching is not None:
+                    fetching.addErrback(lambda _: None)
+                    fetching.cancel()
+                self.save()
+                failures[0].raiseException()
+
+            count += sum(1 for _, handled in results if handled)
+            self.cursor = record.field(events[-1], 'id')
+            self.save()
+
+        defer.returnValue(count)
+
+    def save(self):
+        """Save the cursor and the ids of the last events handled."""
+        self.store.save({'cursor': self.cursor, 'seen': list(self._seen)})
+
+    def _fetch(self, cursor):
+        return self.events.all(ending_before=cursor, limit=self.limit)
+
+    def _handled(self, event_id):
+        if self._seen and len(self._seen) == self._seen.maxlen:
+            self._seen_ids.discard(self._seen[0])
+        self._seen.append(event_id)
+        self._seen_ids.add(event_id)
+        return True
@@ -0,0 +1,349 @@
+"""
+Export a list resource to JSON lines or CSV files.
+
+    python -m txstripe.export customers customers.jsonl.gz \\
+        --api-key sk_live_... --created-gte 1420070400 --shards 8 \\
+        --checkpoint customers.checkpoint
+
+Objects are read as raw dicts by one ``Pager`` per ``created`` shard, so
+memory stays bounded by the page size and prefetch depth however large
+the account is.  Each shard goes to its own file (``customers-000.jsonl.gz``
+and so on) a page at a time, and with ``--checkpoint`` the progress of
+every shard is saved after each page.  Running the same command again
+resumes where it stopped, without duplicating or losing objects.
+"""
+
+import argparse
+import copy
+import csv
+import gzip
+import json
+import os
+import sys
+import time
+from cStringIO import StringIO
+
+from twisted.internet import defer, task, threads
+
+from stripe import record
+
+from txstripe import jsonfile, paging, resource
+from txstripe.client import Client
+
+RESOURCES = {
+    'accounts': resource.Account,
+    'application_fees': resource.ApplicationFee,
+    'balance_transactions': resource.BalanceTransaction,
+    'charges': resource.Charge,
+    'coupons': resource.Coupon,
+    'customers': resource.Customer,
+    'disputes': resource.Dispute,
+    'events': resource.Event,
+    'invoiceitems': resource.InvoiceItem,
+    'invoices': resource.Invoice,
+    'plans': resource.Plan,
+    'products': resource.Product,
+    'recipients': resource.Recipient,
+    'refunds': resource.Refund,
+    'skus': resource.SKU,
+    'transfers': resource.Transfer,
+}
+
+FORMATS = ('jsonl', 'csv')
+
+
+def shard_path(path, index, shards):
+    """Return the file shard ``index`` of ``shards`` is written to."""
+    if shards == 1:
+        return path
+    head, tail = os.path.split(path)
+    name, dot, extension = tail.partition('.')
+    return os.path.join(head, '%s-%03d%s%s' % (name, index, dot, extension))
+
+
+class Writer(object):
+
+    """
+    Append pages of objects to a file as JSON lines or CSV rows.
+
+    Every page is written and synced in one go, as a gzip member of its
+    own when ``compress`` is set, and ``offset`` is where the file ends
+    afterwards.  Opening a file at an earlier ``offset`` drops whatever
+    was written after it.  ``encode`` and ``append`` split ``write`` in
+    two, so the disk can be left to a thread.
+
+    CSV files have one column per name in ``columns``.  An empty list is
+    filled with the fields of the first object written, so writers
+    sharing it agree.  Nested values are written as JSON.
+    """
+
+    def __init__(self, path, format='jsonl', compress=False, columns=None,
+                 offset=0):
+        self.format = format
+        self.compress = compress
+        self.columns = [] if columns is None else columns
+        self.offset = offset
+
+        self._file = open(path, 'r+b' if offset else 'wb')
+        self._file.seek(offset)
+        self._file.truncate()
+
+    def write(self, objects):
+        """Write a page of ``objects`` and return the new offset."""
+        return self.append(self.encode(objects))
+
+    def encode(self, objects):
+        """Return a page of ``objects`` as it will be written."""
+        buf = StringIO()
+        if self.format == 'csv':
+            self._write_csv(buf, objects)
+        else:
+            for obj in objects:
+                buf.write(json.dumps(obj, sort_keys=True))
+                buf.write('\n')
+
+        data = buf.getvalue()
+        if self.compress:
+            data = _gzip(data)
+        return data
+
+    def append(self, data):
+        """Write and sync an encoded page and return the new offset."""
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.offset += len(data)
+        return self.offset
+
+    def close(self):
+        self._file.close()
+
+    def _write_csv(self, buf, objects):
+        if not self.columns:
+            self.columns.extend(sorted(objects[0]))
+
+        writer = csv.writer(buf)
+        if not self.offset:
+            writer.writerow([_cell(column) for column in self.columns])
+        for obj in objects:
+            writer.writerow([_cell(obj.get(column))
+                             for column in self.columns])
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    elif isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True)
+    elif isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
+
+
+def _gzip(data):
+    buf = StringIO()
+    member = gzip.GzipFile(fileobj=buf, mode='wb', mtime=0)
+    member.write(data)
+    member.close()
+    return buf.getvalue()
+
+
+def new_state(klass, path, format='jsonl', compress=False, columns=None,
+              shards=1, start=None, end=None):
+    """
+    Return the initial state of an export of ``klass`` to ``path``.
+
+    Sharding splits ``created`` from ``start`` up to ``end`` (Unix
+    timestamps, ``end`` defaulting to now), so it needs a ``start``.
+    """
+    if start is None:
+        if shards > 1:
+            raise ValueError('Sharding an export needs a start time')
+        ranges = [(None, end)]
+    else:
+        if end is None:
+            end = int(time.time()) + 1
+        ranges = paging.partition(start, end, shards)
+
+    state = {
+        'resource': klass.class_url(),
+        'format': format,
+        'compress': compress,
+        'columns': list(columns or ()),
+        'shards': [],
+    }
+    for index, (gte, lt) in enumerate(ranges):
+        created = {}
+        if gte is not None:
+            created['gte'] = gte
+        if lt is not None:
+            created['lt'] = lt
+        state['shards'].append({
+            'path': shard_path(path, index, len(ranges)),
+            'created': created,
+            'offset': 0,
+            'starting_after': None,
+            'count': 0,
+            'done': False,
+        })
+    return state
+
+
+def export(klass, path, format='jsonl', compress=False, columns=None,
+           shards=1, start=None, end=None, checkpoint=None, limit=100,
+           prefetch=1, **params):
+    """
+    Export every object of the listable ``klass`` to ``path``, see
+    ``new_state``, and return a Deferred firing with the number exported.
+
+    Shards are exported concurrently, and a failing shard stops the
+    others.  Files are written and synced in threads.  When the
+    ``checkpoint`` file exists the export resumes from it and the layout
+    it saved (format, columns and shards) wins over the arguments.
+    """
+    state = None
+    if checkpoint is not None:
+        state = jsonfile.load(checkpoint)
+    if state is None:
+        state = new_state(klass, path, format, compress, columns, shards,
+                          start, end)
+    elif state['resource'] != klass.class_url():
+        raise ValueError(
+            '%s is a checkpoint of %s' % (checkpoint, state['resource']))
+
+    saving = defer.DeferredLock()
+
+    def save():
+        if checkpoint is None:
+            return defer.succeed(None)
+        # Shards carry on while the copy is saved, one save at a time
+        return saving.run(threads.deferToThread, jsonfile.save, checkpoint,
+                          copy.deepcopy(state))
+
+    pagers = []
+    stopped = []
+
+    def stop(failure):
+        stopped.append(failure)
+        for pager in pagers:
+            pager.stop()
+        return failure
+
+    params['limit'] = limit
+    d = defer.DeferredList([
+        _export_shard(klass, shard, state, save, prefetch, params,
+                      pagers, stopped).addErrback(stop)
+        for shard in state['shards'] if not shard['done']],
+        consumeErrors=True)
+
+    def done(_):
+        if stopped:
+            return stopped[0]
+        return sum(shard['count'] for shard in state['shards'])
+
+    return d.addCallback(done)
+
+
+@defer.inlineCallbacks
+def _export_shard(klass, shard, state, save, prefetch, params, pagers,
+                  stopped):
+    writer = Writer(shard['path'], state['format'], state['compress'],
+                    state['columns'], shard['offset'])
+    try:
+        params = dict(params)
+        if shard['created']:
+            params['created'] = shard['created']
+        if shard['starting_after']:
+            params['starting_after'] = shard['starting_after']
+
+        pager = klass.auto_paging_iter(raw=True, prefetch=prefetch, **params)
+        pagers.append(pager)
+        while not stopped:
+            page = yield pager.next_page()
+            if page is None:
+                break
+
+            objects = record.field(page, 'data', ())
+            if objects:
+                shard['offset'] = yield threads.deferToThread(
+                    writer.append, writer.encode(objects))
+                shard['starting_after'] = objects[-1]['id']
+                shard['count'] += len(objects)
+                yield save()
+
+        if stopped:
+            # Another shard failed, this one is not done
+            pager.stop()
+            return
+        shard['done'] = True
+        yield save()
+    finally:
+        writer.close()
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='python -m txstripe.export',
+        description='Export a Stripe list resource to JSON lines or CSV.')
+    parser.add_argument('resource', choices=sorted(RESOURCES))
+    parser.add_argument(
+        'output', help='file to write, sharded exports insert the shard '
+        'number before the extension')
+    parser.add_argument(
+        '--format', choices=FORMATS,
+        help='defaults to csv for .csv files and jsonl otherwise')
+    parser.add_argument(
+        '--gzip', action='store_true',
+        help='gzip the output, the default for .gz files')
+    parser.add_argument(
+        '--fields', help='comma separated CSV columns, defaults to the '
+        'fields of the first object')
+    parser.add_argument(
+        '--shards', type=int, default=1,
+        help='split the created range into this many concurrent shards')
+    parser.add_argument(
+        '--created-gte', type=int, help='only objects created from then')
+    parser.add_argument(
+        '--created-lt', type=int, help='only objects created before then')
+    parser.add_argument(
+        '--checkpoint', help='save progress to this file and resume from it')
+    parser.add_argument('--limit', type=int, default=100,
+                        help='objects per page')
+    parser.add_argument('--prefetch', type=int, default=1,
+                        help='pages fetched ahead per shard')
+    parser.add_argument(
+        '--api-key', default=os.environ.get('STRIPE_API_KEY'),
+        help='defaults to $STRIPE_API_KEY')
+    parser.add_argument('--stripe-account')
+
+    args = parser.parse_args(argv)
+    if args.format is None:
+        args.format = 'csv' if '.csv' in args.output else 'jsonl'
+    args.gzip = args.gzip or args.output.endswith('.gz')
+    if args.shards > 1 and args.created_gte is None:
+        parser.error('--shards needs --created-gte')
+    return args
+
+
+def run(reactor, args):
+    """Run the export described by parsed ``args``."""
+    client = Client(api_key=args.api_key, stripe_account=args.stripe_account,
+                    reactor=reactor)
+    columns = args.fields.split(',') if args.fields else None
+
+    d = export(
+        client.bind(RESOURCES[args.resource]), args.output,
+        format=args.format, compress=args.gzip, columns=columns,
+        shards=args.shards, start=args.created_gte, end=args.created_lt,
+        checkpoint=args.checkpoint, limit=args.limit, prefetch=args.prefetch)
+    d.addCallback(
+        lambda count: sys.stderr.write('Exported %d objects\n' % count))
+    return d
+
+
+def main(argv=None):
+    task.react(run, [parse_args(argv)])
+
+
+if __name__ == '__main__':
+    main()
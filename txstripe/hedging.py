@@ -0,0 +1,130 @@
+"""Hedged requests, trading a little extra load for lower tail latency."""
+
+from collections import deque
+
+from twisted.internet import defer
+from twisted.python import failure
+
+
+class Hedger(object):
+
+    """
+    Decide when to send a duplicate of a slow idempotent request.
+
+    Once ``min_samples`` latencies have been recorded, a request still
+    waiting after the ``percentile`` of the last ``window`` latencies gets
+    a second copy.  Every request earns ``budget`` hedges (so ``0.05``
+    allows at most 5% extra requests), saved up to ``max_credit``.
+    """
+
+    def __init__(self, percentile=95, window=200, min_samples=20,
+                 budget=0.05, max_credit=10.0):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.budget = budget
+        self.max_credit = max_credit
+
+        self.credit = 0.0
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.skipped = 0
+
+        self._latencies = deque(maxlen=window)
+
+    def delay(self):
+        """Return how long to wait before hedging a new request, or None."""
+        self.requests += 1
+        self.credit = min(self.max_credit, self.credit + self.budget)
+        if len(self._latencies) < self.min_samples or self.credit < 1:
+            return None
+
+        ordered = sorted(self._latencies)
+        index = int(len(ordered) * self.percentile / 100.0)
+        return ordered[min(index, len(ordered) - 1)]
+
+    def record(self, latency):
+        self._latencies.append(latency)
+
+    def stats(self):
+        """Return counters for monitoring."""
+        return {
+            'requests': self.requests,
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'skipped': self.skipped,
+            'credit': self.credit,
+        }
+
+
+def hedged(send, hedger, clock, hedge=None, retry=None):
+    """
+    Call ``send()`` and, if it is slow, call ``hedge()`` (``send`` by
+    default) for a second attempt.
+
+    Return a Deferred firing with the first successful result; the other
+    attempt is cancelled.  A failure is only passed on once no attempt is
+    left running, and a request that fails before the hedge is due is not
+    hedged at all, leaving that to the retry policy.  ``hedge`` may return
+    None when the duplicate cannot be sent right now, which costs no
+    credit and is counted as ``skipped``.
+
+    An attempt firing with ``retry``, if given, loses like a failure.  It
+    is passed on instead of the failure when no attempt succeeded.
+    """
+    start = clock.seconds()
+    attempts = []
+    losses = []
+    timer = []
+
+    def cancel(_):
+        while timer:
+            timer.pop().cancel()
+        for d in list(attempts):
+            d.cancel()
+
+    result = defer.Deferred(cancel)
+
+    def finished(outcome, d, is_hedge):
+        attempts.remove(d)
+        if result.called:
+            # The loser of the race, cancelled below
+            return None
+
+        if isinstance(outcome, failure.Failure) or \
+                (retry is not None and outcome is retry):
+            losses.append(outcome)
+            if attempts:
+                return None
+            cancel(None)
+            if any(loss is retry for loss in losses):
+                result.callback(retry)
+            else:
+                result.errback(outcome)
+            return None
+
+        hedger.record(clock.seconds() - start)
+        if is_hedge:
+            hedger.hedge_wins += 1
+        result.callback(outcome)
+        cancel(None)
+
+    def launch(is_hedge=False):
+        if is_hedge:
+            timer.pop()
+            d = (hedge or send)()
+            if d is None:
+                hedger.skipped += 1
+                return
+            hedger.credit -= 1
+            hedger.hedges += 1
+        else:
+            d = send()
+        attempts.append(d)
+        d.addBoth(finished, d, is_hedge)
+
+    delay = hedger.delay()
+    launch()
+    if delay is not None and not result.called:
+        timer.append(clock.callLater(delay, launch, True))
+    return result
@@ -0,0 +1,26 @@
+"""Keep state in JSON files that are replaced whole on every save."""
+
+import json
+import os
+
+
+def load(path):
+    """Return the state saved at ``path`` or None."""
+    try:
+        with open(path, 'rb') as f:
+            return json.load(f)
+    except IOError:
+        return None
+
+
+def save(path, state):
+    """
+    Save ``state`` to ``path`` through a temporary file renamed over it,
+    so a crash leaves either the last state or the new one.
+    """
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        json.dump(state, f, sort_keys=True, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.rename(tmp, path)
@@ -0,0 +1,345 @@
+"""Page through list resources without blocking the reactor."""
+
+from collections import deque
+
+from twisted.internet import defer
+from twisted.internet.interfaces import IPushProducer
+from twisted.internet.task import TaskStopped
+from zope.interface import implementer
+
+from stripe import record
+
+
+class _Pages(object):
+
+    @defer.inlineCallbacks
+    def each(self, f):
+        """
+        Call ``f`` with every item of every page and return a Deferred
+        firing once they have all been handled.
+
+        When ``f`` returns a Deferred the next item waits for it, while the
+        next pages are still fetched up to the prefetch depth.
+        """
+        while True:
+            page = yield self.next_page()
+            if page is None:
+                break
+            for item in record.field(page, 'data', ()):
+                yield f(item)
+
+    def produce(self, consumer):
+        """
+        Write every item to ``consumer`` through an ``ItemProducer`` and
+        return a Deferred firing once they have all been written.
+        """
+        return ItemProducer(self).startProducing(consumer)
+
+
+class Pager(_Pages):
+
+    """
+    Read every page of a list, fetching ahead while pages are consumed.
+
+    Each page is requested with ``starting_after`` set to the last item of
+    the one before, as soon as that one arrives, until ``prefetch`` pages
+    are waiting to be read::
+
+        pager = txstripe.Customer.auto_paging_iter(limit=100, prefetch=2)
+        d = pager.each(handle_customer)
+
+    ``fetch`` is called with the list parameters and returns a Deferred
+    firing with a page: a ``ListObject``, or a dict or record for raw
+    lists.  ``first`` is a page that has already been fetched, if any.
+    """
+
+    def __init__(self, fetch, params=None, first=None, prefetch=1):
+        self.fetch = fetch
+        self.params = dict(params or ())
+        self.prefetch = prefetch
+
+        self._pages = deque()
+        self._waiters = deque()
+        self._fetching = None
+        self._failure = None
+        self._done = False
+        self._cursor = None
+
+        if first is None:
+            self._fill(force=True)
+        else:
+            self._landed(first)
+
+    def next_page(self):
+        """
+        Return a Deferred firing with the next page, or None once every
+        page has been read.
+        """
+        if self._pages:
+            page = self._pages.popleft()
+            self._fill()
+            return defer.succeed(page)
+
+        if self._failure is not None:
+            failure, self._failure = self._failure, None
+            return defer.fail(failure)
+
+        if self._fetching is None and self._done:
+            return defer.succeed(None)
+
+        d = defer.Deferred()
+        self._waiters.append(d)
+        self._fill(force=True)
+        return d
+
+    def stop(self):
+        """Stop paging, cancelling the page being fetched."""
+        self._done = True
+        self._pages.clear()
+        if self._fetching is not None:
+            self._fetching.cancel()
+        while self._waiters:
+            self._waiters.popleft().callback(None)
+
+    def _fill(self, force=False):
+        if self._done or self._fetching is not None:
+            return
+        if not force and len(self._pages) >= self.prefetch:
+            return
+
+        params = dict(self.params)
+        if self._cursor is not None:
+            params['starting_after'] = self._cursor
+
+        self._fetching = d = defer.maybeDeferred(self.fetch, params)
+        d.addCallbacks(self._fetched, self._failed)
+
+    def _fetched(self, page):
+        self._fetching = None
+        if self._done:
+            return
+        self._landed(page)
+
+    def _landed(self, page):
+        items = record.field(page, 'data', ())
+        if items and record.field(page, 'has_more'):
+            self._cursor = record.field(items[-1], 'id')
+        else:
+            self._cursor = None
+        self._done = self._cursor is None
+
+        if self._waiters:
+            self._waiters.popleft().callback(page)
+        else:
+            self._pages.append(page)
+        self._fill(force=bool(self._waiters))
+
+    def _failed(self, failure):
+        self._fetching = None
+        if self._done:
+            return
+        self._done = True
+
+        if not self._waiters:
+            self._failure = failure
+        while self._waiters:
+            self._waiters.popleft().errback(failure)
+
+
+def partition(start, end, shards):
+    """
+    Split the ``created`` range from ``start`` up to ``end`` into at most
+    ``shards`` ranges of whole seconds, newest first like Stripe's lists.
+    """
+    start, end = int(start), int(end)
+    shards = min(shards, end - start)
+    if shards < 1:
+        return []
+
+    step = float(end - start) / shards
+    bounds = [start + int(round(step * i)) for i in range(shards)] + [end]
+    return [(bounds[i], bounds[i + 1]) for i in reversed(range(shards))]
+
+
+class Sweep(_Pages):
+
+    """
+    Read a list in ``created`` shards paged concurrently, see
+    ``ListableAPIResource.sweep``.
+
+    ``pagers`` are the ``Pager`` of each shard, newest first.  Pages are
+    returned as they arrive from any shard, or with ``ordered`` shard by
+    shard, newest first, while the later shards fetch up to their prefetch
+    depth.  Requests still go through the client's scheduler and rate
+    limiter, which bound how many run at once.
+    """
+
+    def __init__(self, pagers, ordered=False):
+        self.pagers = list(pagers)
+        self.ordered = ordered
+
+        self._shards = deque(self.pagers)
+        self._ready = deque()
+        self._waiters = deque()
+        self._pulling = 0
+        self._failure = None
+
+        if not ordered:
+            for pager in self.pagers:
+                self._pull(pager)
+
+    def next_page(self):
+        """
+        Return a Deferred firing with the next page of any shard, or None
+        once every shard has been read.
+        """
+        if self.ordered:
+            return self._next_ordered()
+
+        if self._ready:
+            pager, page = self._ready.popleft()
+            self._pull(pager)
+            return defer.succeed(page)
+
+        if self._failure is not None:
+            failure, self._failure = self._failure, None
+            return defer.fail(failure)
+
+        if not self._pulling:
+            return defer.succeed(None)
+
+        d = defer.Deferred()
+        self._waiters.append(d)
+        return d
+
+    def stop(self):
+        """Stop every shard."""
+        for pager in self.pagers:
+            pager.stop()
+        self._shards.clear()
+        self._ready.clear()
+
+    @defer.inlineCallbacks
+    def _next_ordered(self):
+        while self._shards:
+            shard = self._shards[0]
+            page = yield shard.next_page()
+            if page is not None:
+                defer.returnValue(page)
+            if self._shards and self._shards[0] is shard:
+                self._shards.popleft()
+
+    def _pull(self, pager):
+        self._pulling += 1
+        pager.next_page().addCallbacks(
+            self._arrived, self._failed, callbackArgs=(pager,))
+
+    def _arrived(self, page, pager):
+        self._pulling -= 1
+        if page is None:
+            if not self._pulling and not self._ready:
+                while self._waiters:
+                    self._waiters.popleft().callback(None)
+        elif self._waiters:
+            # Taken straight away, so the shard can go on
+            self._pull(pager)
+            self._waiters.popleft().callback(page)
+        else:
+            self._ready.append((pager, page))
+
+    def _failed(self, failure):
+        self._pulling -= 1
+
+        waiters, self._waiters = self._waiters, deque()
+        if not waiters:
+            self._failure = failure
+        for d in waiters:
+            d.errback(failure)
+
+        self.stop()
+
+
+@implementer(IPushProducer)
+class ItemProducer(object):
+
+    """
+    Push the items of a ``Pager`` or ``Sweep`` to an ``IConsumer``.
+
+    The consumer is registered as a streaming consumer and ``write`` is
+    called with each item.  While it has paused the producer no more pages
+    are taken, so the pager stops fetching once its prefetch depth is
+    reached and memory stays flat however long the list is.
+    """
+
+    def __init__(self, pages):
+        self.pages = pages
+
+        self._consumer = None
+        self._deferred = None
+        self._items = iter(())
+        self._paused = False
+        self._reading = False
+        self._producing = False
+
+    def startProducing(self, consumer):
+        """Start writing to ``consumer``, see ``produce``."""
+        self._consumer = consumer
+        self._deferred = defer.Deferred()
+        consumer.registerProducer(self, True)
+        self._produce()
+        return self._deferred
+
+    def pauseProducing(self):
+        self._paused = True
+
+    def resumeProducing(self):
+        self._paused = False
+        self._produce()
+
+    def stopProducing(self):
+        if self._consumer is not None:
+            self._finish(TaskStopped())
+            self.pages.stop()
+
+    def _produce(self):
+        # Pages that are already there arrive while this loop runs
+        if self._producing:
+            return
+        self._producing = True
+        try:
+            while not (self._paused or self._reading or
+                       self._consumer is None):
+                try:
+                    item = next(self._items)
+                except StopIteration:
+                    self._reading = True
+                    self.pages.next_page().addCallbacks(
+                        self._page, self._failed)
+                    continue
+                self._consumer.write(item)
+        finally:
+            self._producing = False
+
+    def _page(self, page):
+        self._reading = False
+        if page is None:
+            self._finish(None)
+        else:
+            self._items = iter(record.field(page, 'data', ()))
+            self._produce()
+
+    def _failed(self, failure):
+        self._reading = False
+        self._finish(failure)
+
+    def _finish(self, result):
+        consumer, self._consumer = self._consumer, None
+        if consumer is None:
+            return
+        consumer.unregisterProducer()
+
+        d, self._deferred = self._deferred, None
+        if result is None:
+            d.callback(None)
+        else:
+            d.errback(result)
@@ -0,0 +1,94 @@
+"""Persistent HTTP connection pool for talking to Stripe."""
+
+from twisted.internet import defer
+from twisted.web.client import Agent, HTTPConnectionPool
+
+import txstripe
+
+
+class ConnectionPool(HTTPConnectionPool):
+
+    """Tunable persistent connection pool that keeps a few counters."""
+
+    def __init__(self, reactor, max_persistent_per_host=None,
+                 cached_connection_timeout=None, retry_automatically=None):
+        super(ConnectionPool, self).__init__(reactor, persistent=True)
+
+        if max_persistent_per_host is None:
+            max_persistent_per_host = txstripe.max_persistent_per_host
+        if cached_connection_timeout is None:
+            cached_connection_timeout = txstripe.cached_connection_timeout
+        if retry_automatically is None:
+            retry_automatically = txstripe.retry_automatically
+
+        self.maxPersistentPerHost = max_persistent_per_host
+        self.cachedConnectionTimeout = cached_connection_timeout
+        self.retryAutomatically = retry_automatically
+
+        self.connections_made = 0
+
+    def _newConnection(self, key, endpoint):
+        self.connections_made += 1
+        return super(ConnectionPool, self)._newConnection(key, endpoint)
+
+    def stats(self):
+        """Return a dict describing the state of the pool."""
+        idle = sum(len(conns) for conns in self._connections.values())
+        return {
+            'max_persistent_per_host': self.maxPersistentPerHost,
+            'cached_connection_timeout': self.cachedConnectionTimeout,
+            'connections_made': self.connections_made,
+            'idle_connections': idle,
+        }
+
+
+_default_pool = [None]
+
+_agents = {}
+
+_AGENTS_MAX = 64
+
+
+def get_pool(reactor=None):
+    """
+    Return the pool used for Stripe requests.
+
+    ``txstripe.connection_pool`` wins if set, otherwise a single
+    ``ConnectionPool`` is created from the module settings and reused.
+    """
+    if txstripe.connection_pool is not None:
+        return txstripe.connection_pool
+
+    if _default_pool[0] is None:
+        if reactor is None:
+            from twisted.internet import reactor
+        _default_pool[0] = ConnectionPool(reactor)
+
+    return _default_pool[0]
+
+
+def get_agent(reactor, pool, connect_timeout):
+    """
+    Return an ``Agent`` connecting through ``pool`` within
+    ``connect_timeout`` seconds, created once for each pool and timeout.
+    """
+    key = (reactor, pool, connect_timeout)
+    try:
+        return _agents[key]
+    except KeyError:
+        pass
+
+    if len(_agents) >= _AGENTS_MAX:
+        _agents.clear()
+    agent = _agents[key] = Agent(
+        reactor, pool=pool, connectTimeout=connect_timeout)
+    return agent
+
+
+def reset_pool():
+    """Close idle connections and forget the default pool."""
+    _agents.clear()
+    pool, _default_pool[0] = _default_pool[0], None
+    if pool is None:
+        return defer.succeed(None)
+    return pool.closeCachedConnections()
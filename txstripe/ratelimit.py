@@ -0,0 +1,184 @@
+"""Client side rate limiting that adapts to Stripe's 429 responses."""
+
+import email.utils
+import hashlib
+import time
+from collections import deque
+
+from twisted.internet import defer
+
+
+class TokenBucket(object):
+
+    """
+    Token bucket whose rate backs off on 429s and recovers on success.
+
+    ``acquire`` returns a Deferred that fires once a token is available;
+    callers queue in order instead of sending requests that would be
+    rejected.  Every 429 divides the rate by ``decrease_factor`` (down to
+    ``min_rate``) and pauses the bucket for the ``Retry-After`` delay, every
+    successful response adds ``increase`` requests per second back until
+    ``max_rate`` is reached again.
+    """
+
+    def __init__(self, reactor, max_rate, burst=None, min_rate=1.0,
+                 decrease_factor=2.0, increase=1.0):
+        self.reactor = reactor
+        self.max_rate = float(max_rate)
+        self.rate = self.max_rate
+        self.burst = burst or max(1, int(max_rate))
+        self.min_rate = min_rate
+        self.decrease_factor = decrease_factor
+        self.increase = increase
+
+        self.tokens = float(self.burst)
+        self.paused_until = 0
+        self.rejections = 0
+
+        self._updated = reactor.seconds()
+        self._waiting = deque()
+        self._wakeup = None
+
+    def __len__(self):
+        """Return the number of callers waiting for a token."""
+        return len(self._waiting)
+
+    def acquire(self):
+        """Return a Deferred that fires when the caller may send."""
+        if not self._waiting and self._take():
+            return defer.succeed(None)
+
+        d = defer.Deferred(self._waiting.remove)
+        self._waiting.append(d)
+        self._schedule()
+        return d
+
+    def try_acquire(self):
+        """Take a token if one is free now, returning whether it was."""
+        return not self._waiting and self._take()
+
+    def rate_limited(self, retry_after=None):
+        """Back off after a 429, pausing for ``retry_after`` seconds."""
+        self.rejections += 1
+        self.rate = max(self.min_rate, self.rate / self.decrease_factor)
+        self.tokens = 0.0
+        self._updated = self.reactor.seconds()
+        if retry_after:
+            self.paused_until = max(
+                self.paused_until, self._updated + retry_after)
+        self._schedule(reschedule=True)
+
+    def succeeded(self):
+        """Creep back towards ``max_rate`` after a successful response."""
+        self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def _refill(self):
+        now = self.reactor.seconds()
+        # No tokens accumulate while paused
+        start = max(self._updated, self.paused_until)
+        if now > start:
+            self.tokens = min(
+                float(self.burst), self.tokens + (now - start) * self.rate)
+            self._updated = now
+        return now
+
+    def _take(self):
+        now = self._refill()
+        if now < self.paused_until or self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def _schedule(self, reschedule=False):
+        if self._wakeup is not None:
+            if not reschedule:
+                return
+            self._wakeup.cancel()
+            self._wakeup = None
+
+        if not self._waiting:
+            return
+
+        now = self._refill()
+        delay = max(self.paused_until - now, 0) + \
+            max((1 - self.tokens) / self.rate, 0)
+        self._wakeup = self.reactor.callLater(delay, self._release)
+
+    def _release(self):
+        self._wakeup = None
+        while self._waiting and self._take():
+            self._waiting.popleft().callback(None)
+        self._schedule()
+
+
+class RateLimiter(object):
+
+    """
+    One ``TokenBucket`` per API key and connected account.
+
+    Every bucket is created with the keyword arguments given here, e.g.
+    ``RateLimiter(max_rate=90)`` for Stripe's live mode limit of 100
+    requests per second with a little headroom.
+    """
+
+    def __init__(self, reactor=None, **bucket_kwargs):
+        if reactor is None:
+            from twisted.internet import reactor
+        self.reactor = reactor
+        self.bucket_kwargs = bucket_kwargs
+        self._buckets = {}
+
+    def bucket(self, key):
+        """Return the bucket for ``key``, creating it on first use."""
+        try:
+            return self._buckets[key]
+        except KeyError:
+            bucket = TokenBucket(self.reactor, **self.bucket_kwargs)
+            self._buckets[key] = bucket
+            return bucket
+
+    def acquire(self, key):
+        return self.bucket(key).acquire()
+
+    def try_acquire(self, key):
+        return self.bucket(key).try_acquire()
+
+    def observe(self, key, code, retry_after=None):
+        """Feed the response status (and ``Retry-After``) back in."""
+        if code == 429:
+            self.bucket(key).rate_limited(retry_after)
+        elif code < 400:
+            self.bucket(key).succeeded()
+
+    def stats(self):
+        """
+        Return the current rate and queue length of every bucket, keyed by
+        ``(fingerprint(api_key), stripe_account)`` so they are safe to log.
+        """
+        return dict(
+            ((fingerprint(api_key), stripe_account),
+             {'rate': bucket.rate, 'waiting': len(bucket),
+              'rejections': bucket.rejections})
+            for (api_key, stripe_account), bucket in self._buckets.items())
+
+
+def fingerprint(api_key):
+    """Return a short hash identifying ``api_key`` without revealing it."""
+    if api_key is None:
+        return None
+    return hashlib.sha256(api_key).hexdigest()[:12]
+
+
+def parse_retry_after(value, now=time.time):
+    """Return the delay in seconds from a ``Retry-After`` header value."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    parsed = email.utils.parsedate_tz(value)
+    if parsed is None:
+        return None
+    return max(0.0, email.utils.mktime_tz(parsed) - now())
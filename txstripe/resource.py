@@ -1,63 +1,171 @@
 """Override all the things."""
 
+import uuid
 import warnings
 
-from twisted.internet import defer
+from twisted.internet import defer, task
+from twisted.python import failure
+from twisted.web.iweb import IBodyProducer
+from zope.interface import implementer
 import treq
 import stripe
 from stripe.resource import (
     Reversal as StripeReversal,
     ApplicationFeeRefund as StripeApplicationFeeRefund,
-    populate_headers
+    populate_headers,
+    _freeze
 )
-from stripe.api_requestor import _api_encode
+from stripe import circuit, record
+from stripe.api_requestor import _api_encode, _api_urlencode, _build_api_url
+from stripe.retry import RetryPolicy
 
 import txstripe
 
-from txstripe import util, api_key, error
+from txstripe import (
+    util, api_key, error, pool, coalesce, ratelimit, hedging, paging)
+from txstripe.client import default_client
 
 
-def convert_to_stripe_object(resp, api_key, account):
-    types = {'account': Account, 'charge': Charge, 'customer': Customer,
-             'invoice': Invoice, 'invoiceitem': InvoiceItem,
-             'plan': Plan, 'coupon': Coupon, 'token': Token, 'event': Event,
-             'transfer': Transfer, 'list': ListObject, 'recipient': Recipient,
-             'bank_account': BankAccount,
-             'card': Card, 'application_fee': ApplicationFee,
-             'subscription': Subscription, 'refund': Refund,
-             'file_upload': FileUpload,
-             'fee_refund': ApplicationFeeRefund,
-             'bitcoin_receiver': BitcoinReceiver,
-             'bitcoin_transaction': BitcoinTransaction,
-             'transfer_reversal': Reversal}
+_object_classes = None
 
+
+def _object_class(klass_name, client):
+    global _object_classes
+
+    if _object_classes is None:
+        _object_classes = {
+            'account': Account, 'charge': Charge, 'customer': Customer,
+            'invoice': Invoice, 'invoiceitem': InvoiceItem,
+            'plan': Plan, 'coupon': Coupon, 'token': Token, 'event': Event,
+            'transfer': Transfer, 'list': ListObject, 'recipient': Recipient,
+            'bank_account': BankAccount,
+            'card': Card, 'application_fee': ApplicationFee,
+            'subscription': Subscription, 'refund': Refund,
+            'file_upload': FileUpload,
+            'fee_refund': ApplicationFeeRefund,
+            'bitcoin_receiver': BitcoinReceiver,
+            'bitcoin_transaction': BitcoinTransaction,
+            'transfer_reversal': Reversal,
+            'country_spec': CountrySpec, 'product': Product, 'sku': SKU}
+
+    if isinstance(klass_name, basestring):
+        klass = _object_classes.get(klass_name, StripeObject)
+    else:
+        klass = StripeObject
+    if client is not None:
+        klass = client.bind(klass)
+    return klass
+
+
+def _identity_map(client):
+    config = client or default_client
+
+    # Frozen reads share whole trees, which must not freeze mapped objects
+    frozen = config.frozen
+    if frozen is None:
+        frozen = txstripe.frozen
+    if frozen:
+        return None
+
+    identity_map = config.identity_map
+    if identity_map is None:
+        identity_map = txstripe.identity_map
+    return identity_map
+
+
+def convert_to_stripe_object(resp, api_key, account, client=None):
     if isinstance(resp, list):
-        return [convert_to_stripe_object(i, api_key, account) for i in resp]
+        return [convert_to_stripe_object(i, api_key, account, client)
+                for i in resp]
     elif isinstance(resp, dict) and not isinstance(resp, StripeObject):
-        resp = resp.copy()
-        klass_name = resp.get('object')
-        if isinstance(klass_name, basestring):
-            klass = types.get(klass_name, StripeObject)
-        else:
-            klass = StripeObject
-        return klass.construct_from(resp, api_key, stripe_account=account)
+        def construct(values):
+            klass = _object_class(values.get('object'), client)
+            return klass.construct_from(
+                values.copy(), api_key, stripe_account=account)
+
+        identity_map = _identity_map(client)
+        if identity_map is not None:
+            return identity_map.load(
+                resp, construct, (api_key, account, client))
+        return construct(resp)
     else:
         return resp
 
 
+def stripe_object_hook(api_key, account, client=None):
+    """
+    Return a JSON ``object_hook`` building StripeObjects while parsing.
+
+    None is returned when lazy conversion is on, which wants plain dicts.
+    Objects already in the client's identity map are reused.
+    """
+    lazy = (client or default_client).lazy_conversion
+    if lazy is None:
+        lazy = txstripe.lazy_conversion
+    if lazy:
+        return None
+
+    def object_hook(values):
+        klass = _object_class(values.get('object'), client)
+        return klass._construct_decoded(
+            values, api_key, stripe_account=account)
+
+    identity_map = _identity_map(client)
+    if identity_map is not None:
+        # Objects are bound to their client's classes, key and account
+        scope = (api_key, account, client)
+        return lambda values: identity_map.load(values, object_hook, scope)
+    return object_hook
+
+
 stripe.resource.convert_to_stripe_object = convert_to_stripe_object
 
 
 @defer.inlineCallbacks
 def make_request(
-    ins, method, url, stripe_account=None, params=None, headers=None, **kwargs
+    ins, method, url, stripe_account=None, params=None, headers=None,
+    api_key=None, cacheable=False, priority=None, timeout=None,
+    deadline=None, raw=False, **kwargs
 ):
     """
     Return a deferred or handle error.
 
     For overriding in various classes.
+
+    Settings are taken from the explicit arguments first, then the object
+    the request is made for, then its ``txstripe.Client`` and finally the
+    module level configuration.
+
+    ``cacheable`` GETs are served from the configured ``ObjectCache``; any
+    other request invalidates what is cached for its URL.
+
+    With a ``Scheduler`` configured, requests wait in the ``priority`` lane
+    (see ``txstripe.scheduling``) until a slot for their account is free.
+    While the circuit breaker for the API base is open they fail fast with
+    ``CircuitOpenError``.
+
+    The request, including retries, fails with ``APIConnectionError`` after
+    ``timeout`` seconds or at the absolute ``deadline`` on the client's
+    reactor clock, whichever is given.  Cancelling the returned Deferred
+    aborts the HTTP connection.
+
+    GETs that are slower than usual are sent a second time when a
+    ``Hedger`` is configured, and whichever response arrives first is used.
+
+    With ``frozen`` on, GETs return frozen objects which are cached and
+    handed to every coalesced caller as they are.
     """
-    if txstripe.api_key is None:
+    client = ins._client
+    config = client or default_client
+
+    api_key = (
+        api_key or getattr(ins, 'api_key', None) or config.api_key or
+        txstripe.api_key)
+    stripe_account = stripe_account or config.stripe_account
+    api_base = config.api_base or txstripe.api_base
+    api_version = config.api_version or txstripe.api_version
+
+    if api_key is None:
         raise error.AuthenticationError(
             'No API key provided. (HINT: set your API key using '
             '"stripe.api_key = <API-KEY>"). You can generate API keys '
@@ -65,63 +173,512 @@ def make_request(
             'for details, or email support@stripe.com if you have any '
             'questions.')
 
-    abs_url = '{}{}'.format(txstripe.api_base, url)
+    abs_url = '{}{}'.format(api_base, url)
 
-    ua = {
-        'lang': 'python',
-        'publisher': 'lextoumbourou',
-        'httplib': 'Twisted',
-    }
+    request_headers = dict(headers or ())
+    request_headers.update(
+        _header_template(config, api_key, stripe_account, api_version))
+    headers = request_headers
 
-    headers = headers or {}
-    headers.update({
-        'X-Stripe-Client-User-Agent': util.json.dumps(ua),
-        'User-Agent': 'txstripe',
-        'Authorization': 'Bearer %s' % (txstripe.api_key,)
-    })
+    retry_policy = config.retry_policy or \
+        RetryPolicy(max_retries=txstripe.max_network_retries)
 
-    if stripe_account:
-        headers['Stripe-Account'] = stripe_account
-
-    if txstripe.api_version is not None:
-        headers['Stripe-Version'] = txstripe.api_version
+    # Retried POSTs must not be applied twice
+    if method == 'post' and retry_policy.max_retries > 0 and \
+            'Idempotency-Key' not in headers:
+        headers.update(populate_headers(str(uuid.uuid4())))
 
     if method == 'get' or method == 'delete':
+        request_url = abs_url
+        if params:
+            request_url = _build_api_url(abs_url, _api_urlencode(params))
         data = None
     elif method == 'post':
-        data = {k: v for (k, v) in _api_encode(params)}
-        params = None
+        request_url = abs_url
+        data = _BytesProducer(_api_urlencode(params or {}))
+        headers['Content-Type'] = 'application/x-www-form-urlencoded'
     else:
         raise error.APIConnectionError(
             'Unrecognized HTTP method %r.  This may indicate a bug in the '
             'Stripe bindings.' % (method,))
 
-    resp = yield treq.request(
-        method, abs_url, params=params, data=data, headers=headers, **kwargs)
+    clock = _clock(config)
+
+    if deadline is None:
+        if timeout is None:
+            timeout = config.timeout
+        if timeout is None:
+            timeout = txstripe.timeout
+        if timeout is not None:
+            deadline = clock.seconds() + timeout
+
+    connect_timeout = config.connect_timeout
+    if connect_timeout is None:
+        connect_timeout = txstripe.connect_timeout
+
+    kwargs.setdefault('pool', config.pool or pool.get_pool(clock))
+
+    object_cache = config.object_cache
+    if object_cache is None:
+        object_cache = txstripe.object_cache
+    ttl = None
+    if object_cache is not None and method == 'get' and cacheable:
+        ttl = object_cache.ttl_for(ins.class_name())
+
+    share = config.coalesce_requests
+    if share is None:
+        share = txstripe.coalesce_requests
+
+    frozen = config.frozen
+    if frozen is None:
+        frozen = txstripe.frozen
+    frozen = frozen and method == 'get' and not raw
+
+    if ttl is not None or (method == 'get' and share):
+        query = tuple(sorted(_api_encode(params or {})))
+        # Responses differ in shape between API versions
+        cache_key = (abs_url, query, api_key, stripe_account, api_version)
+        if frozen:
+            # Frozen objects are bound to their client's classes
+            cache_key += (client,)
+
+    rate_limiter = config.rate_limiter
+    if rate_limiter is None:
+        rate_limiter = txstripe.rate_limiter
+
+    scheduler = config.scheduler
+    if scheduler is None:
+        scheduler = txstripe.scheduler
+    if priority is None:
+        priority = config.priority
+    if priority is None:
+        priority = txstripe.priority
+
+    circuit_breakers = config.circuit_breakers
+    if circuit_breakers is None:
+        circuit_breakers = txstripe.circuit_breakers
+    breaker = None
+    if circuit_breakers is not None:
+        breaker = circuit_breakers.get(api_base)
+
+    hedger = None
+    if method == 'get':
+        hedger = config.hedger
+        if hedger is None:
+            hedger = txstripe.hedger
+
+    request = _Request(
+        method, request_url, data, headers, kwargs, clock,
+        retry_policy=retry_policy, rate_limiter=rate_limiter,
+        limiter_key=(api_key, stripe_account), scheduler=scheduler,
+        priority=priority, breaker=breaker, connect_timeout=connect_timeout,
+        hedger=hedger, deadline=deadline)
+
+    def decode(body):
+        resp = util.json.loads(
+            body,
+            object_hook=stripe_object_hook(api_key, stripe_account, client))
+        return convert_to_stripe_object(resp, api_key, stripe_account, client)
+
+    def store(body, generation):
+        object_cache.set(cache_key, body, ttl, generation)
+        return body
+
+    def fetch():
+        if ttl is not None:
+            # A write while the read is in flight may make its body stale
+            generation = object_cache.generation(abs_url)
+        d = _request_body(request)
+        if frozen:
+            d.addCallback(lambda body: _freeze(decode(body)))
+        if ttl is not None:
+            d.addCallback(store, generation)
+        return d
+
+    body = None
+    if ttl is not None:
+        body = object_cache.get(cache_key)
+
+    if body is None:
+        if method == 'get' and share:
+            d = _in_flight.call((method,) + cache_key, fetch)
+        else:
+            d = fetch()
 
-    if resp.code >= 400:
-        yield util.handle_api_error(resp)
+        if deadline is not None:
+            d = _with_deadline(d, deadline, clock)
+
+        try:
+            body = yield d
+        finally:
+            if method != 'get' and object_cache is not None:
+                object_cache.invalidate(abs_url)
+
+    if frozen:
+        defer.returnValue(body)
+
+    if raw:
+        defer.returnValue(
+            util.json.loads(body, object_hook=record.raw_object_hook(raw)))
+
+    # The body is shared as bytes by coalesced requests and the cache, so
+    # each caller decodes it straight into its own StripeObjects
+    defer.returnValue(decode(body))
+
+
+_in_flight = coalesce.SingleFlight()
+
+_CLIENT_USER_AGENT = util.json.dumps({
+    'lang': 'python',
+    'publisher': 'lextoumbourou',
+    'httplib': 'Twisted',
+})
+
+_HEADER_TEMPLATES_MAX = 256
+
+
+def _header_template(config, api_key, stripe_account, api_version):
+    """
+    Return the headers shared by every request ``config`` makes with these
+    settings, built once and kept on the client.  Do not modify it.
+    """
+    templates = config._header_templates
+    key = (api_key, stripe_account, api_version)
+    try:
+        return templates[key]
+    except KeyError:
+        pass
+
+    template = {
+        'X-Stripe-Client-User-Agent': _CLIENT_USER_AGENT,
+        'User-Agent': 'txstripe',
+        'Authorization': 'Bearer %s' % (api_key,)
+    }
+
+    if stripe_account:
+        template['Stripe-Account'] = stripe_account
+
+    if api_version is not None:
+        template['Stripe-Version'] = api_version
+
+    if len(templates) >= _HEADER_TEMPLATES_MAX:
+        templates.clear()
+    templates[key] = template
+    return template
+
+
+def _clock(config):
+    """Return the reactor requests made with ``config`` are timed with."""
+    if config.reactor is not None:
+        return config.reactor
+    from twisted.internet import reactor
+    return reactor
+
+
+def _with_deadline(d, deadline, clock):
+    """Cancel ``d`` at ``deadline``, failing it with APIConnectionError."""
+    timed_out = []
+
+    def expire():
+        timed_out.append(True)
+        d.cancel()
+
+    call = clock.callLater(max(deadline - clock.seconds(), 0), expire)
+
+    def done(result):
+        if call.active():
+            call.cancel()
+        if timed_out and isinstance(result, failure.Failure) and \
+                result.check(defer.CancelledError):
+            raise error.APIConnectionError(
+                'Request to Stripe timed out.')
+        return result
+
+    return d.addBoth(done)
+
+
+def _read(resp, read):
+    """
+    Return ``read()`` for the body of ``resp``, closing the connection if
+    the returned Deferred is cancelled instead of reading on regardless.
+    """
+    d = defer.Deferred(lambda _: _abort(resp))
+
+    def done(result):
+        # A cancelled read fails later on, once the connection is closed
+        if not d.called:
+            if isinstance(result, failure.Failure):
+                d.errback(result)
+            else:
+                d.callback(result)
+
+    defer.maybeDeferred(read).addBoth(done)
+    return d
+
+
+def _abort(resp):
+    """Close the connection the body of ``resp`` is read from, if open."""
+    # treq wraps the Agent's Response, buffered or not
+    while not hasattr(resp, '_transport'):
+        resp = getattr(resp, 'original', None)
+        if resp is None:
+            return
+
+    # Bodies are delivered through a TransportProxyProducer, which lets go
+    # of the connection once the body is complete
+    transport = getattr(resp._transport, '_producer', resp._transport)
+    if transport is None:
         return
+    abort = getattr(transport, 'abortConnection', None)
+    if abort is None:
+        abort = transport.stopProducing
+    abort()
+
+
+@implementer(IBodyProducer)
+class _BytesProducer(object):
+
+    """Write an already encoded request body in one go."""
+
+    def __init__(self, body):
+        self.body = body
+        self.length = len(body)
+
+    def startProducing(self, consumer):
+        consumer.write(self.body)
+        return defer.succeed(None)
+
+    def pauseProducing(self):
+        pass
+
+    def resumeProducing(self):
+        pass
+
+    def stopProducing(self):
+        pass
+
+
+class _Request(object):
+
+    """A fully resolved request and the policies for sending it."""
+
+    def __init__(self, method, url, data, headers, kwargs, clock,
+                 retry_policy, rate_limiter=None, limiter_key=None,
+                 scheduler=None, priority=None, breaker=None,
+                 connect_timeout=None, hedger=None, deadline=None):
+        self.method = method
+        self.url = url
+        self.data = data
+        self.headers = headers
+        self.kwargs = kwargs
+        self.clock = clock
+        self.retry_policy = retry_policy
+        self.rate_limiter = rate_limiter
+        self.limiter_key = limiter_key
+        self.scheduler = scheduler
+        self.priority = priority
+        self.breaker = breaker
+        self.connect_timeout = connect_timeout
+        self.hedger = hedger
+        self.deadline = deadline
+
+    def timed_out(self):
+        """Return whether the request has run past its deadline."""
+        return (self.deadline is not None and
+                self.clock.seconds() >= self.deadline)
+
+    def attempt(self, retries):
+        """
+        Return a Deferred firing with the body of one attempt, or ``_RETRY``
+        when the retry policy wants another.  Slow attempts are hedged.
+        """
+        if self.hedger is None:
+            return self._attempt(retries)
+        return hedging.hedged(
+            lambda: self._attempt(retries), self.hedger, self.clock,
+            hedge=lambda: self._hedge(retries), retry=_RETRY)
+
+    @defer.inlineCallbacks
+    def _attempt(self, retries):
+        if self.rate_limiter is not None:
+            yield self.rate_limiter.acquire(self.limiter_key)
+
+        slot = None
+        if self.scheduler is not None:
+            slot = yield self.scheduler.acquire(
+                self.limiter_key[1], self.priority)
+
+        body = yield self._exchange(retries, slot)
+        defer.returnValue(body)
+
+    def _hedge(self, retries):
+        # A hedge never waits: it needs a slot and a token that are free
+        # now, and a closed circuit, or it is not sent at all
+        if self.breaker is not None and self.breaker.state != circuit.CLOSED:
+            return None
+
+        slot = None
+        if self.scheduler is not None:
+            slot = self.scheduler.try_acquire(self.limiter_key[1])
+            if slot is None:
+                return None
+
+        if self.rate_limiter is not None and \
+                not self.rate_limiter.try_acquire(self.limiter_key):
+            if slot is not None:
+                slot.release()
+            return None
+
+        return self._exchange(retries, slot)
+
+    @defer.inlineCallbacks
+    def _exchange(self, retries, slot):
+        retry_policy = self.retry_policy
+        rate_limiter = self.rate_limiter
+        breaker = self.breaker
+
+        try:
+            if breaker is not None and not breaker.allow():
+                raise error.CircuitOpenError(
+                    'Requests to Stripe are failing, not sending more until '
+                    'it recovers.')
+
+            start = self.clock.seconds()
+            try:
+                resp = yield self._send()
+
+                if rate_limiter is not None:
+                    retry_after = resp.headers.getRawHeaders('Retry-After')
+                    rate_limiter.observe(
+                        self.limiter_key, resp.code,
+                        ratelimit.parse_retry_after(
+                            retry_after[0] if retry_after else None))
+
+                retry = retry_policy.should_retry(retries, resp.code)
+                if retry or resp.code < 400:
+                    # Retried bodies are drained so the connection can go
+                    # back to the pool
+                    body = yield _read(resp, resp.content)
+            except defer.CancelledError:
+                if breaker is not None:
+                    if self.timed_out():
+                        # A hung connection, the very thing to fail fast on
+                        breaker.record(True)
+                    else:
+                        breaker.release()
+                raise
+            except Exception as e:
+                if breaker is not None:
+                    breaker.record(True)
+                if not retry_policy.should_retry(
+                        retries, connection_error=True):
+                    raise error.APIConnectionError(
+                        'Unexpected error communicating with Stripe.\n\n'
+                        '(Network error: %s: %s)' % (type(e).__name__, e))
+            else:
+                if breaker is not None:
+                    breaker.record(
+                        resp.code >= 500, self.clock.seconds() - start)
+
+                if not retry:
+                    if resp.code >= 400:
+                        yield util.handle_api_error(resp)
+                        return
+                    defer.returnValue(body)
+        finally:
+            # The slot is held until the body has been read
+            if slot is not None:
+                slot.release()
+
+        defer.returnValue(_RETRY)
+
+    def _send(self):
+        if self.connect_timeout is None:
+            return treq.request(
+                self.method, self.url, data=self.data,
+                headers=self.headers, **self.kwargs)
+
+        agent = pool.get_agent(
+            self.clock, self.kwargs.get('pool'), self.connect_timeout)
+        return treq.client.HTTPClient(agent).request(
+            self.method, self.url, data=self.data,
+            headers=self.headers, **self.kwargs)
+
+
+_RETRY = object()
 
-    body = yield resp.json()
 
-    defer.returnValue(
-        convert_to_stripe_object(
-            body, txstripe.api_key, stripe_account))
+@defer.inlineCallbacks
+def _request_body(request):
+    """Perform the HTTP request, retrying if allowed, and return its body."""
+    num_retries = 0
+    while True:
+        body = yield request.attempt(num_retries)
+        if body is not _RETRY:
+            defer.returnValue(body)
+
+        sleep_time = request.retry_policy.sleep_time(num_retries)
+        num_retries += 1
+        util.log_info('Retrying Stripe api request', path=request.url,
+                      num_retries=num_retries, sleep_time=sleep_time)
+        yield task.deferLater(request.clock, sleep_time, lambda: None)
 
 
 class StripeObject(stripe.StripeObject):
 
     """Override blocking method."""
 
-    def request(self, method, url, params=None, headers=None):
+    _client = None
+
+    @classmethod
+    def _resource(cls, klass):
+        """Return ``klass`` bound to the same client as this class."""
+        if cls._client is None:
+            return klass
+        return cls._client.bind(klass)
+
+    @classmethod
+    def _raw(cls, raw):
+        """Return the raw response mode for a call given ``raw``."""
+        if raw is None:
+            raw = (cls._client or default_client).raw
+        if raw is None:
+            raw = txstripe.raw
+        return raw
+
+    @classmethod
+    def _deadline(cls, timeout):
+        """Return the deadline ``timeout`` seconds from now, if given."""
+        if timeout is None:
+            return None
+        return _clock(cls._client or default_client).seconds() + timeout
+
+    @classmethod
+    def _convert_lazily(cls):
+        lazy = (cls._client or default_client).lazy_conversion
+        if lazy is None:
+            lazy = txstripe.lazy_conversion
+        return lazy
+
+    @classmethod
+    def _frozen_reads(cls):
+        frozen = (cls._client or default_client).frozen
+        if frozen is None:
+            frozen = txstripe.frozen
+        return frozen
+
+    def _convert_value(self, value, api_key, stripe_account):
+        return convert_to_stripe_object(
+            value, api_key, stripe_account, self._client)
+
+    def request(self, method, url, params=None, headers=None, timeout=None):
         """Return a deferred."""
         if params is None:
             params = self._retrieve_params
 
         return make_request(
             self, method, url, stripe_account=self.stripe_account,
-            params=params, headers=headers)
+            params=params, headers=headers, timeout=timeout)
 
 
 class APIResource(StripeObject, stripe.APIResource):
@@ -129,16 +686,40 @@ class APIResource(StripeObject, stripe.APIResource):
     """Override blocking methods."""
 
     @classmethod
-    def retrieve(cls, id, api_key=None, **params):
+    def retrieve(cls, id, api_key=None, timeout=None, raw=None,
+                 priority=None, **params):
         """Return a deferred."""
         instance = cls(id, api_key, **params)
-        d = instance.refresh()
+        raw = cls._raw(raw)
+        if raw:
+            return instance._fetch(
+                cls._deadline(timeout), raw=raw, priority=priority)
+        d = instance.refresh(
+            deadline=cls._deadline(timeout), priority=priority)
         return d.addCallback(lambda _: instance)
 
-    def refresh(self):
-        """Return a deferred."""
-        d = self.request('get', self.instance_url())
-        return d.addCallback(self.refresh_from).addCallback(lambda _: self)
+    def refresh(self, timeout=None, deadline=None, priority=None):
+        """
+        Return a deferred firing with this object once updated, or with a
+        new frozen object for a frozen one, which is left as it is.
+        """
+        if self._frozen:
+            d = self._empty_copy().refresh(timeout, deadline, priority)
+            return d.addCallback(lambda fresh: fresh.freeze())
+
+        d = self._fetch(deadline, timeout=timeout, priority=priority)
+        d.addCallback(self.refresh_from)
+        if self._frozen_reads():
+            # Only this object is new, everything in it is shared
+            d.addCallback(lambda _: self.freeze())
+        return d.addCallback(lambda _: self)
+
+    def _fetch(self, deadline, raw=False, timeout=None, priority=None):
+        return make_request(
+            self, 'get', self.instance_url(),
+            stripe_account=self.stripe_account,
+            params=self._retrieve_params, cacheable=True, timeout=timeout,
+            deadline=deadline, raw=raw, priority=priority)
 
     @classmethod
     def class_name(cls):
@@ -159,7 +740,11 @@ class ListObject(StripeObject, stripe.ListObject):
 
     """Mixin overrides request."""
 
-    pass
+    def auto_paging_iter(self, prefetch=1):
+        """Return a ``Pager`` over this page and the ones after it."""
+        return paging.Pager(
+            lambda params: self.list(**params), self._retrieve_params,
+            first=self, prefetch=prefetch)
 
 
 class SingletonAPIResource(APIResource):
@@ -185,11 +770,59 @@ class ListableAPIResource(APIResource):
 
     @classmethod
     def all(cls, api_key=None, idempotency_key=None,
-            stripe_account=None, **params):
+            stripe_account=None, timeout=None, raw=None, priority=None,
+            **params):
         """Return a deferred."""
         url = cls.class_url()
-        return make_request(
-            cls, 'get', url, stripe_acconut=None, params=params)
+        raw = cls._raw(raw)
+        d = make_request(
+            cls, 'get', url, stripe_account=stripe_account, params=params,
+            api_key=api_key, timeout=timeout, raw=raw, priority=priority)
+        if raw:
+            return d
+
+        def set_retrieve_params(list_object):
+            list_object._retrieve_params = params
+            return list_object
+
+        return d.addCallback(set_retrieve_params)
+
+    @classmethod
+    def auto_paging_iter(cls, api_key=None, stripe_account=None,
+                         timeout=None, raw=None, prefetch=1, priority=None,
+                         **params):
+        """
+        Return a ``Pager`` over every page of the list, see
+        ``txstripe.paging``.
+        """
+        def fetch(params):
+            return cls.all(
+                api_key=api_key, stripe_account=stripe_account,
+                timeout=timeout, raw=raw, priority=priority, **params)
+
+        return paging.Pager(fetch, params, prefetch=prefetch)
+
+    @classmethod
+    def sweep(cls, start, end, shards=8, ordered=False, api_key=None,
+              stripe_account=None, timeout=None, raw=None, prefetch=1,
+              priority=None, **params):
+        """
+        Return a ``Sweep`` reading everything created from ``start`` up to
+        ``end`` (Unix timestamps) in ``shards`` ranges paged concurrently.
+
+        Pass ``priority=scheduling.BULK`` to keep a large sweep from
+        holding up interactive requests sharing the scheduler.
+        """
+        def fetch(params):
+            return cls.all(
+                api_key=api_key, stripe_account=stripe_account,
+                timeout=timeout, raw=raw, priority=priority, **params)
+
+        pagers = []
+        for gte, lt in paging.partition(start, end, shards):
+            shard = dict(params, created={'gte': gte, 'lt': lt})
+            pagers.append(paging.Pager(fetch, shard, prefetch=prefetch))
+        return paging.Sweep(pagers, ordered=ordered)
 
 
 class CreateableAPIResource(APIResource):
@@ -198,21 +831,22 @@ class CreateableAPIResource(APIResource):
 
     @classmethod
     def create(
-        cls, api_key=None, idempotency_key=None, stripe_account=None, **params
+        cls, api_key=None, idempotency_key=None, stripe_account=None,
+        timeout=None, **params
     ):
         """Return a deferred."""
         url = cls.class_url()
         headers = populate_headers(idempotency_key)
         return make_request(
             cls, 'post', url, stripe_account=stripe_account,
-            headers=headers, params=params)
+            headers=headers, params=params, timeout=timeout)
 
 
 class UpdateableAPIResource(APIResource):
 
     """Override blocking methods."""
 
-    def save(self, idempotency_key=None):
+    def save(self, idempotency_key=None, timeout=None):
         """Return a deferred."""
         updated_params = self.serialize(None)
         headers = populate_headers(idempotency_key)
@@ -221,7 +855,8 @@ class UpdateableAPIResource(APIResource):
             util.logger.debug("Trying to save already saved object %r", self)
             return defer.succeed(self)
 
-        d = self.request('post', self.instance_url(), updated_params, headers)
+        d = self.request(
+            'post', self.instance_url(), updated_params, headers, timeout)
         return d.addCallback(self.refresh_from).addCallback(lambda _: self)
 
 
@@ -229,9 +864,10 @@ class DeletableAPIResource(APIResource):
 
     """Override blocking methods."""
 
-    def delete(self, **params):
+    def delete(self, timeout=None, **params):
         """Return a deferred."""
-        d = self.request('delete', self.instance_url(), params)
+        d = self.request('delete', self.instance_url(), params,
+                         timeout=timeout)
         return d.addCallback(self.refresh_from).addCallback(lambda _: self)
 
 
@@ -241,11 +877,12 @@ class Account(CreateableAPIResource, ListableAPIResource,
     """Override blocking methods."""
 
     @classmethod
-    def retrieve(cls, id=None, api_key=None, **params):
+    def retrieve(cls, id=None, api_key=None, timeout=None, raw=None,
+                 priority=None, **params):
         """Return a deferred."""
-        instance = cls(id, api_key, **params)
-        d = instance.refresh()
-        return d.addCallback(lambda _: instance)
+        return super(Account, cls).retrieve(
+            id, api_key=api_key, timeout=timeout, raw=raw,
+            priority=priority, **params)
 
     def instance_url(self):
         return super(Account, self).instance_url()
@@ -258,6 +895,15 @@ class Balance(SingletonAPIResource):
     pass
 
 
+class BalanceTransaction(ListableAPIResource):
+
+    """Override blocking methods."""
+
+    @classmethod
+    def class_url(cls):
+        return '/v1/balance/history'
+
+
 class Card(UpdateableAPIResource, DeletableAPIResource, stripe.Card):
 
     """Override blocking methods."""
@@ -363,23 +1009,23 @@ class Customer(CreateableAPIResource, UpdateableAPIResource,
     def add_invoice_item(self, idempotency_key=None, **params):
         """Return a deferred."""
         params['customer'] = self.id
-        return InvoiceItem.create(
+        return self._resource(InvoiceItem).create(
             self.api_key, idempotency_key=idempotency_key, **params)
 
     def invoices(self, **params):
         """Return a deferred."""
         params['customer'] = self.id
-        return Invoice.all(self.api_key, **params)
+        return self._resource(Invoice).all(self.api_key, **params)
 
     def invoice_items(self, **params):
         """Return a deferred."""
         params['customer'] = self.id
-        return InvoiceItem.all(self.api_key, **params)
+        return self._resource(InvoiceItem).all(self.api_key, **params)
 
     def charges(self, **params):
         """Return a deferred."""
         params['customer'] = self.id
-        return Charge.all(self.api_key, **params)
+        return self._resource(Charge).all(self.api_key, **params)
 
     def update_subscription(self, idempotency_key=None, **params):
         """Return a deferred."""
@@ -548,7 +1194,7 @@ class Recipient(
     def transfers(self, **params):
         """Return a deferred."""
         params['recipient'] = self.id
-        return Transfer.all(self.api_key, **params)
+        return self._resource(Transfer).all(self.api_key, **params)
 
 
 class FileUpload(ListableAPIResource, stripe.FileUpload):
@@ -622,3 +1268,33 @@ class BitcoinTransaction(StripeObject):
     """Override blocking methods."""
 
     pass
+
+
+class CountrySpec(ListableAPIResource, stripe.CountrySpec):
+
+    """Override blocking methods."""
+
+    @classmethod
+    def class_name(cls):
+        """Return parent method."""
+        return super(CountrySpec, cls).class_name()
+
+
+class Product(
+    CreateableAPIResource, UpdateableAPIResource,
+    ListableAPIResource, DeletableAPIResource
+):
+
+    """Override blocking methods."""
+
+    pass
+
+
+class SKU(
+    CreateableAPIResource, UpdateableAPIResource,
+    ListableAPIResource, DeletableAPIResource
+):
+
+    """Override blocking methods."""
+
+    pass
@@ -0,0 +1,171 @@
+"""Concurrency limits and fair queuing for requests to Stripe."""
+
+from collections import deque
+
+from twisted.internet import defer
+
+
+INTERACTIVE = 0
+DEFAULT = 1
+BULK = 2
+
+
+class _Slot(object):
+
+    """Permission to have one request in flight, released exactly once."""
+
+    def __init__(self, scheduler, account):
+        self.scheduler = scheduler
+        self.account = account
+        self.released = False
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.scheduler._release(self.account)
+
+
+class _Lane(object):
+
+    """Per account queues of one priority, served by deficit round robin."""
+
+    def __init__(self):
+        self.queues = {}
+        self.ring = deque()
+        self.credit = {}
+
+    def __len__(self):
+        return sum(len(q) for q in self.queues.values())
+
+    def push(self, account, d):
+        queue = self.queues.get(account)
+        if queue is None:
+            queue = self.queues[account] = deque()
+            self.ring.append(account)
+        queue.append(d)
+
+    def remove(self, account, d):
+        queue = self.queues[account]
+        queue.remove(d)
+        if not queue:
+            self._drop(account)
+
+    def pop(self, weight, has_capacity):
+        """Return the next (account, Deferred) allowed to run, or None."""
+        for _ in range(len(self.ring)):
+            account = self.ring[0]
+            if has_capacity(account):
+                credit = self.credit.get(account)
+                if credit is None:
+                    credit = weight(account)
+                queue = self.queues[account]
+                d = queue.popleft()
+                credit -= 1
+                if not queue:
+                    self._drop(account)
+                elif credit < 1:
+                    self.credit.pop(account, None)
+                    self.ring.rotate(-1)
+                else:
+                    self.credit[account] = credit
+                return account, d
+            self.ring.rotate(-1)
+        return None
+
+    def _drop(self, account):
+        del self.queues[account]
+        self.ring.remove(account)
+        self.credit.pop(account, None)
+
+
+class Scheduler(object):
+
+    """
+    Cap requests in flight, globally and per connected account.
+
+    Waiting requests are served strictly by priority (``INTERACTIVE``
+    before ``DEFAULT`` before ``BULK``).  Within a priority, connected
+    accounts take turns, each getting ``weights.get(account, 1)`` requests
+    per turn, so one account with a huge backlog cannot starve the rest.
+    """
+
+    def __init__(self, max_in_flight=50, max_in_flight_per_account=None,
+                 weights=None):
+        self.max_in_flight = max_in_flight
+        self.max_in_flight_per_account = max_in_flight_per_account
+        self.weights = dict(weights or {})
+
+        self.in_flight = 0
+        self._in_flight_by_account = {}
+        self._lanes = {}
+
+    def acquire(self, account=None, priority=DEFAULT):
+        """
+        Return a Deferred firing with a slot once the request may be sent.
+
+        Call ``release()`` on the slot when the request is done.
+        """
+        lane = self._lanes.get(priority)
+        if lane is None:
+            lane = self._lanes[priority] = _Lane()
+
+        d = defer.Deferred(lambda d: lane.remove(account, d))
+        lane.push(account, d)
+        self._dispatch()
+        return d
+
+    def try_acquire(self, account=None):
+        """
+        Return a slot if one is free now and nothing is waiting for it,
+        otherwise None.
+        """
+        if any(self._lanes.values()) or not self._has_capacity(account):
+            return None
+        return self._take(account)
+
+    def stats(self):
+        """Return counters for monitoring."""
+        return {
+            'in_flight': self.in_flight,
+            'in_flight_by_account': dict(self._in_flight_by_account),
+            'waiting': dict(
+                (priority, len(lane))
+                for priority, lane in self._lanes.items()),
+        }
+
+    def _has_capacity(self, account):
+        if self.in_flight >= self.max_in_flight:
+            return False
+        limit = self.max_in_flight_per_account
+        return (limit is None or
+                self._in_flight_by_account.get(account, 0) < limit)
+
+    def _weight(self, account):
+        return self.weights.get(account, 1)
+
+    def _take(self, account):
+        self.in_flight += 1
+        self._in_flight_by_account[account] = \
+            self._in_flight_by_account.get(account, 0) + 1
+        return _Slot(self, account)
+
+    def _release(self, account):
+        self.in_flight -= 1
+        count = self._in_flight_by_account[account] - 1
+        if count:
+            self._in_flight_by_account[account] = count
+        else:
+            del self._in_flight_by_account[account]
+        self._dispatch()
+
+    def _dispatch(self):
+        for priority in sorted(self._lanes):
+            lane = self._lanes[priority]
+            while self.in_flight < self.max_in_flight:
+                popped = lane.pop(self._weight, self._has_capacity)
+                if popped is None:
+                    break
+                account, d = popped
+                d.callback(self._take(account))
+            if self.in_flight >= self.max_in_flight:
+                return
@@ -1,11 +1,37 @@
 """Test txstripe."""
 
+import json
+
 from mock import patch, Mock
 
 from twisted.trial.unittest import TestCase
 from twisted.internet import defer
 
 
+def page(*ids, **kwargs):
+    """
+    Return a list response holding an object for each of ``ids``.
+
+    ``object`` (``'customer'``) and ``has_more`` (True) describe the list.
+    Any other keyword is a field of every object, or a function returning
+    it given the object's id.
+    """
+    object_type = kwargs.pop('object', 'customer')
+    has_more = kwargs.pop('has_more', True)
+
+    data = []
+    for id in ids:
+        item = {'object': object_type, 'id': id}
+        for name, value in kwargs.items():
+            item[name] = value(id) if callable(value) else value
+        data.append(item)
+
+    return {
+        'object': 'list', 'url': '/v1/%ss' % object_type,
+        'has_more': has_more, 'data': data,
+    }
+
+
 class BaseTest(TestCase):
 
     """Default settings for all tests."""
@@ -13,14 +39,27 @@ class BaseTest(TestCase):
     def _json_mock(self):
         return self.mocked_resp
 
+    def _content_mock(self):
+        return json.dumps(self.mocked_resp)
+
     def _request_mock(self, *args, **kwargs):
         return defer.succeed(self.resp_mock)
 
+    def respond(self, *bodies):
+        """Answer the next requests with ``bodies``, one each."""
+        self.resp_mock.content = Mock(side_effect=[
+            defer.succeed(json.dumps(body)) for body in bodies])
+
+    def urls(self):
+        """Return the URLs requested so far."""
+        return [args[0][1] for args in self.treq_mock.request.call_args_list]
+
     def setUp(self):
         self._mocked_resp = {}
 
         self.resp_mock = Mock()
         self.resp_mock.json = self._json_mock
+        self.resp_mock.content = self._content_mock
 
         treq_patch = patch('txstripe.resource.treq')
         self.treq_mock = treq_patch.start()
@@ -29,3 +68,6 @@ class BaseTest(TestCase):
         import txstripe
         txstripe.api_key = 'ABC123'
         self.txstripe = txstripe
+
+        from txstripe import coalesce, resource
+        self.patch(resource, '_in_flight', coalesce.SingleFlight())
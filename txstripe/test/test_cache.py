@@ -0,0 +1,180 @@
+"""Test the retrieve cache."""
+
+from twisted.internet import defer
+from twisted.internet.task import Clock
+
+from txstripe.cache import ObjectCache
+from txstripe.test import BaseTest, mocks
+
+
+class ObjectCacheTest(BaseTest):
+
+    """Test txstripe.cache.ObjectCache."""
+
+    def setUp(self):
+        super(ObjectCacheTest, self).setUp()
+        self.clock = Clock()
+        self.cache = ObjectCache(
+            max_entries=2, ttls={'plan': 60}, clock=self.clock.seconds)
+
+    def test_ttl_for(self):
+        """Only configured classes are cached by default."""
+        self.assertEquals(self.cache.ttl_for('plan'), 60)
+        self.assertIs(self.cache.ttl_for('customer'), None)
+
+    def test_expiry(self):
+        """Entries disappear once their TTL has passed."""
+        self.cache.set(('/v1/plans/gold', ()), {'id': 'gold'}, 60)
+        self.assertEquals(
+            self.cache.get(('/v1/plans/gold', ())), {'id': 'gold'})
+
+        self.clock.advance(60)
+        self.assertIs(self.cache.get(('/v1/plans/gold', ())), None)
+        self.assertEquals(self.cache.stats()['hits'], 1)
+        self.assertEquals(self.cache.stats()['misses'], 1)
+        self.assertEquals(len(self.cache), 0)
+
+    def test_lru_eviction(self):
+        """The least recently used entry is evicted first."""
+        self.cache.set(('/a',), 'a', 60)
+        self.cache.set(('/b',), 'b', 60)
+        self.cache.get(('/a',))
+        self.cache.set(('/c',), 'c', 60)
+
+        self.assertEquals(self.cache.get(('/a',)), 'a')
+        self.assertIs(self.cache.get(('/b',)), None)
+        self.assertEquals(self.cache.stats()['evictions'], 1)
+
+    def test_stale_generation(self):
+        """Bodies read before an invalidation are not cached."""
+        generation = self.cache.generation('/v1/plans/gold')
+        self.cache.invalidate('/v1/plans/gold')
+        self.cache.set(('/v1/plans/gold',), 'old', 60, generation)
+        self.assertIs(self.cache.get(('/v1/plans/gold',)), None)
+
+        generation = self.cache.generation('/v1/plans/gold')
+        self.cache.set(('/v1/plans/gold',), 'new', 60, generation)
+        self.assertEquals(self.cache.get(('/v1/plans/gold',)), 'new')
+
+    def test_invalidate_parents(self):
+        """Writes to a sub resource drop the parent object too."""
+        self.cache.set(('/v1/charges/ch_1', ()), 'charge', 60)
+        self.cache.set(('/v1/charges/ch_1', (('expand[]', 'x'),)), 'c', 60)
+        self.cache.invalidate('/v1/charges/ch_1/refund')
+
+        self.assertEquals(len(self.cache), 0)
+
+
+class CachedRetrieveTest(BaseTest):
+
+    """Test retrieve going through the cache."""
+
+    def setUp(self):
+        super(CachedRetrieveTest, self).setUp()
+        self.cache = ObjectCache(ttls={'plan': 60})
+        self.patch(self.txstripe, 'object_cache', self.cache)
+        self.mocked_resp = mocks.Plan.retrieve_success
+        self.resp_mock.code = 200
+
+    @defer.inlineCallbacks
+    def test_retrieve_is_cached(self):
+        """The second retrieve does not hit the network."""
+        first = yield self.txstripe.Plan.retrieve('gold')
+        second = yield self.txstripe.Plan.retrieve('gold')
+
+        self.assertEquals(self.treq_mock.request.call_count, 1)
+        self.assertEquals(first, second)
+        self.assertIsNot(first, second)
+        self.assertIsInstance(second, self.txstripe.Plan)
+        self.assertEquals(self.cache.hits, 1)
+
+    @defer.inlineCallbacks
+    def test_uncached_classes(self):
+        """Classes without a TTL always hit the network."""
+        self.mocked_resp = mocks.Customer.retrieve_success
+        yield self.txstripe.Customer.retrieve('cus_1234')
+        yield self.txstripe.Customer.retrieve('cus_1234')
+
+        self.assertEquals(self.treq_mock.request.call_count, 2)
+
+    @defer.inlineCallbacks
+    def test_save_invalidates(self):
+        """Saving an object drops it from the cache."""
+        plan = yield self.txstripe.Plan.retrieve('gold')
+        plan.name = 'Platinum'
+        yield plan.save()
+        yield self.txstripe.Plan.retrieve('gold')
+
+        self.assertEquals(self.treq_mock.request.call_count, 3)
+
+    def test_save_during_retrieve(self):
+        """A body read before a save is not cached once it arrives."""
+        reading = defer.Deferred()
+        self.treq_mock.request.side_effect = lambda *a, **kw: reading
+        d = self.txstripe.Plan.retrieve('gold')
+
+        self.treq_mock.request.side_effect = self._request_mock
+        plan = self.txstripe.Plan.construct_from({'id': 'gold'}, 'ABC123')
+        plan.name = 'Platinum'
+        self.successResultOf(plan.save())
+        reading.callback(self.resp_mock)
+        self.successResultOf(d)
+
+        self.successResultOf(self.txstripe.Plan.retrieve('gold'))
+        self.assertEquals(self.treq_mock.request.call_count, 3)
+        self.assertEquals(self.cache.hits, 0)
+
+    @defer.inlineCallbacks
+    def test_delete_invalidates(self):
+        """Deleting an object drops it from the cache."""
+        plan = yield self.txstripe.Plan.retrieve('gold')
+        yield plan.delete()
+        yield self.txstripe.Plan.retrieve('gold')
+
+        self.assertEquals(self.treq_mock.request.call_count, 3)
+
+    @defer.inlineCallbacks
+    def test_client_cache(self):
+        """Clients can bring their own cache."""
+        cache = ObjectCache(default_ttl=60)
+        client = self.txstripe.Client(object_cache=cache)
+        yield client.Plan.retrieve('gold')
+        yield client.Plan.retrieve('gold')
+
+        self.assertEquals(cache.hits, 1)
+        self.assertEquals(self.cache.hits, 0)
+
+    @defer.inlineCallbacks
+    def test_api_versions_are_cached_apart(self):
+        """Bodies are not served to clients on another API version."""
+        old = self.txstripe.Client(api_version='2015-10-16')
+        new = self.txstripe.Client(api_version='2016-03-07')
+        yield old.Plan.retrieve('gold')
+        yield new.Plan.retrieve('gold')
+        yield new.Plan.retrieve('gold')
+
+        self.assertEquals(self.treq_mock.request.call_count, 2)
+        self.assertEquals(self.cache.hits, 1)
+
+    @defer.inlineCallbacks
+    def test_frozen_objects_are_shared(self):
+        """Frozen hits share one decoded object tree."""
+        self.mocked_resp = mocks.Customer.retrieve_success
+        cache = ObjectCache(default_ttl=60)
+        client = self.txstripe.Client(object_cache=cache, frozen=True)
+        first = yield client.Customer.retrieve('cus_1234')
+        second = yield client.Customer.retrieve('cus_1234')
+
+        self.assertEquals(self.treq_mock.request.call_count, 1)
+        self.assertIsNot(first, second)
+        self.assertIs(first.sources, second.sources)
+        self.assertIsInstance(second, client.Customer)
+        self.assertRaises(TypeError, setattr, first, 'email', 'a@b.com')
+        self.assertRaises(TypeError, first.refresh_from, {}, 'sk_test')
+
+        customer = first.thaw()
+        customer.email = 'a@b.com'
+        customer.sources.data[0].exp_year = 2030
+        self.assertIsInstance(customer, client.Customer)
+        self.assertIsNot(customer.sources, first.sources)
+        self.assertEquals(second.sources.data[0].exp_year, 2017)
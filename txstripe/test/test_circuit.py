@@ -0,0 +1,98 @@
+"""Test failing fast with a circuit breaker."""
+
+from mock import Mock
+from twisted.internet import defer
+from twisted.internet.task import Clock
+
+from stripe.circuit import CircuitBreakers
+
+from txstripe import error
+from txstripe.test import BaseTest, mocks
+
+
+class CircuitBreakerTest(BaseTest):
+
+    """Test circuit breakers in make_request."""
+
+    def setUp(self):
+        super(CircuitBreakerTest, self).setUp()
+        self.clock = Clock()
+        self.breakers = CircuitBreakers(
+            minimum_calls=2, reset_timeout=10, clock=self.clock.seconds)
+        self.client = self.txstripe.Client(
+            circuit_breakers=self.breakers, coalesce_requests=False,
+            reactor=self.clock)
+        self.breaker = self.breakers.get(self.txstripe.api_base)
+
+    def _fail(self):
+        self.treq_mock.request.side_effect = \
+            lambda *a, **kw: defer.fail(Exception('boom'))
+        d = self.client.Customer.retrieve('cus_1234')
+        self.failureResultOf(d, error.APIConnectionError)
+
+    def test_fails_fast_when_open(self):
+        """Once open, requests are refused without being sent."""
+        self._fail()
+        self._fail()
+        self.assertEquals(self.breaker.state, 'open')
+
+        d = self.client.Customer.retrieve('cus_1234')
+
+        self.failureResultOf(d, error.CircuitOpenError)
+        self.assertEquals(self.treq_mock.request.call_count, 2)
+
+    def test_half_open_probe_closes(self):
+        """A successful probe closes the circuit again."""
+        self._fail()
+        self._fail()
+        self.clock.advance(10)
+        self.treq_mock.request.side_effect = None
+        self.treq_mock.request.return_value = defer.succeed(self.resp_mock)
+        self.resp_mock.code = 200
+        self.mocked_resp = mocks.Customer.retrieve_success
+
+        d = self.client.Customer.retrieve('cus_1234')
+
+        self.successResultOf(d)
+        self.assertEquals(self.breaker.state, 'closed')
+
+    def test_server_errors_count(self):
+        """5xx responses count as failures, 4xx do not."""
+        self.resp_mock.code = 404
+        self.resp_mock.headers = Mock()
+        self.mocked_resp = {'error': {'message': 'No such customer'}}
+        d = self.client.Customer.retrieve('cus_1234')
+        self.failureResultOf(d, error.InvalidRequestError)
+
+        self.assertEquals(self.breaker.stats()['failure_rate'], 0)
+
+    def test_cancel_releases_probe(self):
+        """Cancelled probes let the next request through."""
+        self._fail()
+        self._fail()
+        self.clock.advance(10)
+        self.treq_mock.request.side_effect = None
+        self.treq_mock.request.return_value = defer.Deferred()
+
+        d = self.client.Customer.retrieve('cus_1234')
+        d.cancel()
+
+        self.failureResultOf(d, defer.CancelledError)
+        self.assertTrue(self.breaker.allow())
+
+    def test_timeouts_count(self):
+        """Requests that time out are failures, hung connections open it."""
+        self.treq_mock.request.side_effect = \
+            lambda *a, **kw: defer.Deferred()
+        client = self.txstripe.Client(
+            circuit_breakers=self.breakers, coalesce_requests=False,
+            reactor=self.clock, timeout=5)
+
+        for _ in range(2):
+            d = client.Customer.retrieve('cus_1234')
+            self.clock.advance(5)
+            self.failureResultOf(d, error.APIConnectionError)
+
+        self.assertEquals(self.breaker.state, 'open')
+        d = client.Customer.retrieve('cus_1234')
+        self.failureResultOf(d, error.CircuitOpenError)
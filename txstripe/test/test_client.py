@@ -0,0 +1,98 @@
+"""Test txstripe.Client."""
+
+from twisted.internet import defer
+
+from txstripe.test import BaseTest, mocks
+
+
+class ClientTest(BaseTest):
+
+    """Test txstripe.Client class."""
+
+    def _sent_headers(self):
+        return self.treq_mock.request.call_args[1]['headers']
+
+    @defer.inlineCallbacks
+    def test_client_settings_are_sent(self):
+        """Requests use the client's key, account and version."""
+        self.mocked_resp = mocks.Customer.retrieve_success
+        self.resp_mock.code = 200
+
+        client = self.txstripe.Client(
+            api_key='sk_tenant', stripe_account='acct_1',
+            api_base='https://example.com', api_version='2017-01-27')
+        customer = yield client.Customer.retrieve('cus_1234')
+
+        self.assertIsInstance(customer, self.txstripe.Customer)
+        headers = self._sent_headers()
+        self.assertEquals(headers['Authorization'], 'Bearer sk_tenant')
+        self.assertEquals(headers['Stripe-Account'], 'acct_1')
+        self.assertEquals(headers['Stripe-Version'], '2017-01-27')
+        self.assertTrue(
+            self.treq_mock.request.call_args[0][1].startswith(
+                'https://example.com/v1/customers/'))
+
+    @defer.inlineCallbacks
+    def test_nested_objects_keep_client(self):
+        """Objects returned by a client make requests with that client."""
+        self.mocked_resp = mocks.Customer.retrieve_success
+        self.resp_mock.code = 200
+
+        client = self.txstripe.Client(
+            api_key='sk_tenant', stripe_account='acct_1')
+        customer = yield client.Customer.retrieve('cus_1234')
+        card = customer.sources.data[0]
+        self.assertIs(card._client, client)
+
+        self.mocked_resp = mocks.Card.retrieve_success
+        yield card.save()
+        headers = self._sent_headers()
+        self.assertEquals(headers['Authorization'], 'Bearer sk_tenant')
+        self.assertEquals(headers['Stripe-Account'], 'acct_1')
+
+    @defer.inlineCallbacks
+    def test_clients_do_not_share_settings(self):
+        """Module level resources keep using the global settings."""
+        self.mocked_resp = mocks.Customer.retrieve_success
+        self.resp_mock.code = 200
+
+        client = self.txstripe.Client(api_key='sk_tenant')
+        yield client.Customer.retrieve('cus_1234')
+        yield self.txstripe.Customer.retrieve('cus_1234')
+
+        self.assertEquals(
+            self._sent_headers()['Authorization'], 'Bearer ABC123')
+
+    @defer.inlineCallbacks
+    def test_all_passes_key_and_account(self):
+        """List calls honour the key and account they are given."""
+        self.mocked_resp = mocks.Account.all_success
+        self.resp_mock.code = 200
+
+        accounts = yield self.txstripe.Account.all(
+            api_key='sk_other', stripe_account='acct_2', limit=3)
+
+        headers = self._sent_headers()
+        self.assertEquals(headers['Authorization'], 'Bearer sk_other')
+        self.assertEquals(headers['Stripe-Account'], 'acct_2')
+        self.assertEquals(accounts._retrieve_params, {'limit': 3})
+
+    def test_header_template_is_shared(self):
+        """Constant headers are built once and not changed by requests."""
+        self.mocked_resp = mocks.Charge.retrieve_success
+        self.resp_mock.code = 200
+        client = self.txstripe.Client(api_key='sk_tenant')
+
+        client.Charge.create(amount=100, idempotency_key='once')
+        client.Charge.create(amount=100)
+
+        self.assertEquals(len(client._header_templates), 1)
+        self.assertNotIn('Idempotency-Key', self._sent_headers())
+        self.assertEquals(
+            self._sent_headers()['Authorization'], 'Bearer sk_tenant')
+
+    def test_unknown_resource(self):
+        """Only StripeObject subclasses are exposed."""
+        client = self.txstripe.Client()
+        self.assertRaises(AttributeError, getattr, client, 'make_request')
+        self.assertIs(client.Plan, client.Plan)
@@ -0,0 +1,132 @@
+"""Test coalescing of identical in-flight requests."""
+
+from twisted.internet import defer
+
+from txstripe import error
+from txstripe.coalesce import SingleFlight
+from txstripe.test import BaseTest, mocks
+
+
+class SingleFlightTest(BaseTest):
+
+    """Test txstripe.coalesce.SingleFlight."""
+
+    def test_concurrent_calls_share_result(self):
+        """Only the first caller runs the function."""
+        flights = SingleFlight()
+        pending = defer.Deferred()
+        calls = []
+
+        def f():
+            calls.append(1)
+            return pending
+
+        first = flights.call('key', f)
+        second = flights.call('key', f)
+        self.assertEquals(len(flights), 1)
+
+        pending.callback('result')
+        self.assertEquals(len(calls), 1)
+        self.assertEquals(self.successResultOf(first), 'result')
+        self.assertEquals(self.successResultOf(second), 'result')
+        self.assertEquals(len(flights), 0)
+
+    def test_failures_reach_every_caller(self):
+        """Errors fan out to all waiting callers."""
+        flights = SingleFlight()
+        pending = defer.Deferred()
+
+        first = flights.call('key', lambda: pending)
+        second = flights.call('key', lambda: pending)
+        pending.errback(error.APIError('boom'))
+
+        self.failureResultOf(first, error.APIError)
+        self.failureResultOf(second, error.APIError)
+
+    def test_cancel_one_caller(self):
+        """The call keeps going while someone is still waiting."""
+        flights = SingleFlight()
+        cancelled = []
+        pending = defer.Deferred(cancelled.append)
+
+        first = flights.call('key', lambda: pending)
+        second = flights.call('key', lambda: pending)
+        first.cancel()
+
+        self.failureResultOf(first, defer.CancelledError)
+        self.assertEquals(cancelled, [])
+
+        second.cancel()
+        self.failureResultOf(second, defer.CancelledError)
+        self.assertEquals(cancelled, [pending])
+        self.assertEquals(len(flights), 0)
+
+
+class CoalescedRequestTest(BaseTest):
+
+    """Test coalescing through make_request."""
+
+    def setUp(self):
+        super(CoalescedRequestTest, self).setUp()
+        self.pending = []
+        self.treq_mock.request.side_effect = self._pending_request
+
+    def _pending_request(self, *args, **kwargs):
+        d = defer.Deferred()
+        self.pending.append(d)
+        return d
+
+    def _respond(self, body):
+        self.mocked_resp = body
+        self.resp_mock.code = 200
+        for d in self.pending:
+            d.callback(self.resp_mock)
+
+    def test_identical_gets_share_one_request(self):
+        """Each caller gets its own object from a single request."""
+        first = self.txstripe.Customer.retrieve('cus_1234')
+        second = self.txstripe.Customer.retrieve('cus_1234')
+        self.assertEquals(self.treq_mock.request.call_count, 1)
+
+        self._respond(mocks.Customer.retrieve_success)
+        one = self.successResultOf(first)
+        two = self.successResultOf(second)
+
+        self.assertEquals(one, two)
+        self.assertIsNot(one, two)
+        self.assertIsNot(one.sources, two.sources)
+
+        one.sources.data[0].name = 'Changed'
+        self.assertNotEquals(two.sources.data[0].get('name'), 'Changed')
+
+    def test_different_keys_are_not_shared(self):
+        """Requests for other tenants go out separately."""
+        client = self.txstripe.Client(api_key='sk_other')
+        self.txstripe.Customer.retrieve('cus_1234')
+        client.Customer.retrieve('cus_1234')
+        self.txstripe.Customer.retrieve('cus_5678')
+
+        self.assertEquals(self.treq_mock.request.call_count, 3)
+
+    def test_api_versions_are_not_shared(self):
+        """Clients pinned to other API versions get their own response."""
+        client = self.txstripe.Client(api_version='2015-10-16')
+        self.txstripe.Customer.retrieve('cus_1234')
+        client.Customer.retrieve('cus_1234')
+
+        self.assertEquals(self.treq_mock.request.call_count, 2)
+
+    def test_posts_are_not_shared(self):
+        """Only GET requests are coalesced."""
+        self.txstripe.Customer.create(description='a')
+        self.txstripe.Customer.create(description='a')
+
+        self.assertEquals(self.treq_mock.request.call_count, 2)
+
+    def test_coalescing_can_be_disabled(self):
+        """Clients can opt out."""
+        client = self.txstripe.Client(coalesce_requests=False)
+        client.Customer.retrieve('cus_1234')
+        client.Customer.retrieve('cus_1234')
+
+        self.assertEquals(self.treq_mock.request.call_count, 2)
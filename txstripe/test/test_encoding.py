@@ -0,0 +1,54 @@
+"""Test how request parameters are sent."""
+
+from mock import Mock
+
+from txstripe.test import BaseTest, mocks
+
+
+class EncodingTest(BaseTest):
+
+    """Test request bodies and query strings built by make_request."""
+
+    def setUp(self):
+        super(EncodingTest, self).setUp()
+        self.resp_mock.code = 200
+        self.mocked_resp = mocks.Customer.retrieve_success
+
+    def _sent(self):
+        return self.treq_mock.request.call_args
+
+    def _body(self):
+        producer = self._sent()[1]['data']
+        consumer = Mock()
+        self.successResultOf(producer.startProducing(consumer))
+        body = consumer.write.call_args[0][0]
+        self.assertEquals(producer.length, len(body))
+        return body
+
+    def test_post_body_is_encoded_once(self):
+        """POSTs are sent as a urlencoded body with a known length."""
+        self.txstripe.Customer.create(
+            email='jenny@example.com', metadata={'order': '6735'})
+
+        self.assertEquals(
+            self._sent()[1]['headers']['Content-Type'],
+            'application/x-www-form-urlencoded')
+        self.assertEquals(
+            sorted(self._body().split('&')),
+            ['email=jenny%40example.com', 'metadata%5Border%5D=6735'])
+
+    def test_repeated_keys_are_kept(self):
+        """List parameters keep every value."""
+        self.txstripe.Customer.create(expand=['default_source', 'discount'])
+
+        self.assertEquals(
+            self._body(),
+            'expand%5B%5D=default_source&expand%5B%5D=discount')
+
+    def test_get_query_is_encoded(self):
+        """Nested GET parameters are encoded like the sync library does."""
+        self.txstripe.Customer.all(created={'gt': 5})
+
+        url = self._sent()[0][1]
+        self.assertTrue(url.endswith('/v1/customers?created%5Bgt%5D=5'))
+        self.assertIs(self._sent()[1]['data'], None)
@@ -0,0 +1,139 @@
+"""Test incremental event sync."""
+
+import os
+from functools import partial
+
+from twisted.internet import defer
+
+from txstripe.events import EventSync, FileCursorStore, SQLiteCursorStore
+from txstripe.test import BaseTest, page
+
+
+events = partial(page, object='event', has_more=False,
+                 type='charge.succeeded', data={'object': {}})
+
+
+class EventSyncTest(BaseTest):
+
+    """Test txstripe.events.EventSync."""
+
+    def setUp(self):
+        super(EventSyncTest, self).setUp()
+        self.resp_mock.code = 200
+        self.dir = self.mktemp()
+        os.mkdir(self.dir)
+        self.store = FileCursorStore(os.path.join(self.dir, 'events.json'))
+        self.handled = []
+
+    def sync(self, cursor='evt_1', seen=(), **kwargs):
+        if cursor is not None:
+            self.store.save({'cursor': cursor, 'seen': list(seen)})
+        sync = EventSync(self.store, self.txstripe.Event, **kwargs)
+        sync.on('charge.succeeded', lambda event: self.handled.append(
+            event.id))
+        return sync
+
+    @defer.inlineCallbacks
+    def test_first_run_saves_newest(self):
+        """The first run starts the cursor at the newest event."""
+        self.respond(events('evt_9', has_more=True))
+        count = yield self.sync(cursor=None).run()
+
+        self.assertEquals(count, 0)
+        self.assertEquals(self.handled, [])
+        self.assertEquals(self.store.load()['cursor'], 'evt_9')
+        self.assertIn('limit=1', self.urls()[0])
+
+    @defer.inlineCallbacks
+    def test_catch_up(self):
+        """New events are handled oldest first and the cursor saved."""
+        self.respond(events('evt_3', 'evt_2', has_more=True), events('evt_4'))
+        count = yield self.sync(workers=1).run()
+
+        self.assertEquals(count, 3)
+        self.assertEquals(self.handled, ['evt_2', 'evt_3', 'evt_4'])
+        self.assertEquals(self.store.load(), {
+            'cursor': 'evt_4', 'seen': ['evt_2', 'evt_3', 'evt_4']})
+        self.assertIn('ending_before=evt_1', self.urls()[0])
+        self.assertIn('ending_before=evt_3', self.urls()[1])
+
+    @defer.inlineCallbacks
+    def test_dedupe(self):
+        """Events handled before, e.g. by webhooks, are skipped."""
+        self.respond(events('evt_3', 'evt_2'))
+        sync = self.sync(seen=['evt_2'])
+        handled = yield sync.dispatch({'id': 'evt_3', 'type': 'other'})
+        self.assertTrue(handled)
+
+        waiting = defer.Deferred()
+        sync.on('slow', lambda event: waiting)
+        first = sync.dispatch({'id': 'evt_5', 'type': 'slow'})
+        second = sync.dispatch({'id': 'evt_5', 'type': 'slow'})
+        self.assertNoResult(second)
+        waiting.callback(None)
+        self.assertTrue(self.successResultOf(first))
+        self.assertFalse(self.successResultOf(second))
+
+        count = yield sync.run()
+        self.assertEquals(count, 0)
+        self.assertEquals(self.handled, [])
+
+    @defer.inlineCallbacks
+    def test_failure_keeps_cursor(self):
+        """A failed handler fails the run without moving the cursor."""
+        self.respond(events('evt_3', 'evt_2'))
+        sync = self.sync()
+
+        def fail(event):
+            if event.id == 'evt_3':
+                raise ValueError()
+        sync.on('*', fail)
+
+        yield self.assertFailure(sync.run(), ValueError)
+        self.assertEquals(self.store.load(),
+                          {'cursor': 'evt_1', 'seen': ['evt_2']})
+
+    def test_concurrent_failure_keeps_cursor(self):
+        """Events being handled elsewhere are waited for, failures too."""
+        self.respond(events('evt_3', 'evt_2'))
+        sync = self.sync()
+        waiting = defer.Deferred()
+        sync.on('slow', lambda event: waiting)
+        webhook = sync.dispatch({'id': 'evt_3', 'type': 'slow'})
+
+        d = sync.run()
+        self.assertNoResult(d)
+        waiting.errback(ValueError())
+
+        self.failureResultOf(webhook, ValueError)
+        self.failureResultOf(d, ValueError)
+        self.assertEquals(self.store.load(),
+                          {'cursor': 'evt_1', 'seen': ['evt_2']})
+
+    def test_worker_pool(self):
+        """At most ``workers`` events are handled at once."""
+        self.respond(events('evt_4', 'evt_3', 'evt_2'))
+        sync = self.sync(workers=2)
+        waiting = []
+        sync.on('*', lambda event: waiting.append(defer.Deferred()) or
+                waiting[-1])
+
+        d = sync.run()
+        self.assertEquals(len(waiting), 2)
+        waiting[0].callback(None)
+        self.assertEquals(len(waiting), 3)
+        for w in waiting[1:]:
+            w.callback(None)
+        self.assertEquals(self.successResultOf(d), 3)
+
+    def test_sqlite_store(self):
+        """SQLite stores keep the state of each sync by name."""
+        path = os.path.join(self.dir, 'sync.db')
+        store = SQLiteCursorStore(path)
+        self.assertIs(store.load(), None)
+        store.save({'cursor': 'evt_1', 'seen': ['evt_1']})
+        store.close()
+
+        self.assertEquals(SQLiteCursorStore(path).load(),
+                          {'cursor': 'evt_1', 'seen': ['evt_1']})
+        self.assertIs(SQLiteCursorStore(path, name='other').load(), None)
@@ -0,0 +1,159 @@
+"""Test the export command."""
+
+import gzip
+import json
+import os
+import threading
+from functools import partial
+
+from twisted.internet import defer
+
+from txstripe import error, export, jsonfile
+from txstripe.test import BaseTest, page
+
+
+customers = partial(page, email=None, metadata=lambda id: {'n': id})
+
+
+class ExportTest(BaseTest):
+
+    """Test txstripe.export."""
+
+    def setUp(self):
+        super(ExportTest, self).setUp()
+        self.resp_mock.code = 200
+        self.respond(customers('cus_1', 'cus_2'),
+                     customers('cus_3', has_more=False))
+
+        self.dir = self.mktemp()
+        os.mkdir(self.dir)
+
+    def path(self, name):
+        return os.path.join(self.dir, name)
+
+    def test_shard_path(self):
+        """Shard numbers go before the extension."""
+        self.assertEquals(
+            export.shard_path('out/customers.jsonl.gz', 2, 8),
+            'out/customers-002.jsonl.gz')
+        self.assertEquals(export.shard_path('customers.csv', 0, 1),
+                          'customers.csv')
+
+    @defer.inlineCallbacks
+    def test_jsonl_gzip(self):
+        """Every object is written as a line of gzipped JSON."""
+        path = self.path('customers.jsonl.gz')
+        count = yield export.export(
+            self.txstripe.Customer, path, compress=True, limit=2)
+
+        self.assertEquals(count, 3)
+        lines = gzip.open(path).read().splitlines()
+        self.assertEquals([json.loads(line)['id'] for line in lines],
+                          ['cus_1', 'cus_2', 'cus_3'])
+        self.assertIn('limit=2', self.urls()[1])
+
+    @defer.inlineCallbacks
+    def test_csv(self):
+        """CSV columns default to the fields of the first object."""
+        path = self.path('customers.csv')
+        yield export.export(self.txstripe.Customer, path, format='csv')
+
+        self.assertEquals(open(path).read().splitlines(), [
+            'email,id,metadata,object',
+            ',cus_1,"{""n"": ""cus_1""}",customer',
+            ',cus_2,"{""n"": ""cus_2""}",customer',
+            ',cus_3,"{""n"": ""cus_3""}",customer',
+        ])
+
+    @defer.inlineCallbacks
+    def test_shards(self):
+        """Shards of the created range go to files of their own."""
+        self.respond(customers('cus_1', 'cus_2', has_more=False),
+                     customers('cus_3', has_more=False))
+        count = yield export.export(
+            self.txstripe.Customer, self.path('customers.jsonl'),
+            shards=2, start=0, end=100)
+
+        self.assertEquals(count, 3)
+        self.assertEquals(
+            len(open(self.path('customers-000.jsonl')).readlines()), 2)
+        self.assertEquals(
+            len(open(self.path('customers-001.jsonl')).readlines()), 1)
+        self.assertIn('created%5Bgte%5D=50', self.urls()[0])
+        self.assertIn('created%5Blt%5D=50', self.urls()[1])
+
+    def test_sharding_needs_a_start(self):
+        """The created range must be bounded to be sharded."""
+        self.assertRaises(ValueError, export.new_state,
+                          self.txstripe.Customer, 'out.jsonl', shards=2)
+
+    @defer.inlineCallbacks
+    def test_resume(self):
+        """A checkpointed export picks up after the last saved page."""
+        path = self.path('customers.jsonl')
+        checkpoint = self.path('customers.checkpoint')
+        state = export.new_state(self.txstripe.Customer, path)
+        with open(path, 'wb') as f:
+            f.write('{"id": "cus_1"}\n')
+            state['shards'][0].update(
+                offset=f.tell(), starting_after='cus_1', count=1)
+            f.write('{"id": "cus_2", "unsaved": tru')
+        jsonfile.save(checkpoint, state)
+
+        saved_in = []
+
+        def save(path, state, save=jsonfile.save):
+            saved_in.append(threading.current_thread())
+            save(path, state)
+        self.patch(jsonfile, 'save', save)
+
+        self.respond(customers('cus_2', 'cus_3', has_more=False))
+        count = yield export.export(
+            self.txstripe.Customer, path, checkpoint=checkpoint)
+
+        self.assertEquals(count, 3)
+        self.assertEquals(
+            [json.loads(line)['id'] for line in open(path)],
+            ['cus_1', 'cus_2', 'cus_3'])
+        self.assertIn('starting_after=cus_1', self.urls()[0])
+        self.assertTrue(
+            jsonfile.load(checkpoint)['shards'][0]['done'])
+        self.assertNotIn(threading.current_thread(), saved_in)
+
+    @defer.inlineCallbacks
+    def test_failed_shard_stops_the_others(self):
+        """A failing shard stops the rest before the export fails."""
+        checkpoint = self.path('customers.checkpoint')
+        cancelled = []
+        requests = [defer.Deferred(), defer.Deferred(cancelled.append)]
+        self.treq_mock.request.side_effect = \
+            lambda *args, **kwargs: requests[
+                self.treq_mock.request.call_count - 1]
+        d = export.export(
+            self.txstripe.Customer, self.path('customers.jsonl'),
+            shards=2, start=0, end=100, checkpoint=checkpoint)
+
+        requests[0].errback(Exception('boom'))
+        yield self.assertFailure(d, error.APIConnectionError)
+
+        self.assertEquals(cancelled, [requests[1]])
+        self.assertEquals(self.treq_mock.request.call_count, 2)
+        self.assertFalse(os.path.exists(checkpoint))
+
+    def test_wrong_checkpoint(self):
+        """Checkpoints of other resources are refused."""
+        checkpoint = self.path('charges.checkpoint')
+        jsonfile.save(checkpoint, export.new_state(
+            self.txstripe.Charge, self.path('charges.jsonl')))
+
+        self.assertRaises(
+            ValueError, export.export, self.txstripe.Customer,
+            self.path('customers.jsonl'), checkpoint=checkpoint)
+
+    def test_parse_args(self):
+        """Formats and compression follow the output file name."""
+        args = export.parse_args(['charges', 'charges.csv.gz'])
+        self.assertEquals((args.format, args.gzip), ('csv', True))
+
+        args = export.parse_args(['events', 'events.jsonl'])
+        self.assertEquals((args.format, args.gzip), ('jsonl', False))
@@ -0,0 +1,230 @@
+"""Test hedged requests."""
+
+from mock import Mock
+from twisted.internet import defer
+from twisted.internet.task import Clock
+from twisted.web.http_headers import Headers
+
+from stripe.circuit import CircuitBreakers
+from stripe.retry import RetryPolicy
+
+from txstripe.hedging import Hedger, hedged
+from txstripe.ratelimit import RateLimiter
+from txstripe.scheduling import Scheduler
+from txstripe.test import BaseTest, mocks
+
+
+class HedgerTest(BaseTest):
+
+    """Test txstripe.hedging.Hedger and hedged."""
+
+    def setUp(self):
+        super(HedgerTest, self).setUp()
+        self.clock = Clock()
+        self.hedger = Hedger(min_samples=4, budget=1)
+        for latency in (1, 1, 1, 2):
+            self.hedger.record(latency)
+        self.attempts = []
+        self.cancelled = []
+
+    def _send(self):
+        d = defer.Deferred(lambda d: self.cancelled.append(d))
+        self.attempts.append(d)
+        return d
+
+    def test_delay_is_percentile(self):
+        """The hedge is sent after the recent tail latency."""
+        self.assertEquals(self.hedger.delay(), 2)
+
+    def test_no_hedge_without_samples(self):
+        """Nothing is hedged until enough latencies are known."""
+        self.assertIs(Hedger(min_samples=4, budget=1).delay(), None)
+
+    def test_budget(self):
+        """Hedges are limited to a share of all requests."""
+        hedger = Hedger(min_samples=0, budget=0.5)
+        hedger.record(1)
+
+        self.assertIs(hedger.delay(), None)
+        self.assertEquals(hedger.delay(), 1)
+
+    def test_fast_response_not_hedged(self):
+        """Responses within the delay are used as they are."""
+        d = hedged(self._send, self.hedger, self.clock)
+        self.attempts[0].callback('first')
+
+        self.assertEquals(self.successResultOf(d), 'first')
+        self.clock.advance(5)
+        self.assertEquals(len(self.attempts), 1)
+
+    def test_hedge_wins(self):
+        """A slow request is duplicated and the loser cancelled."""
+        d = hedged(self._send, self.hedger, self.clock)
+        self.clock.advance(2)
+        self.assertEquals(len(self.attempts), 2)
+
+        self.attempts[1].callback('second')
+
+        self.assertEquals(self.successResultOf(d), 'second')
+        self.assertEquals(self.cancelled, [self.attempts[0]])
+        self.assertEquals(self.hedger.stats()['hedge_wins'], 1)
+
+    def test_failure_waits_for_other_attempt(self):
+        """One failed attempt does not fail the request."""
+        d = hedged(self._send, self.hedger, self.clock)
+        self.clock.advance(2)
+        self.attempts[0].errback(Exception('boom'))
+        self.assertNoResult(d)
+
+        self.attempts[1].callback('second')
+        self.assertEquals(self.successResultOf(d), 'second')
+
+    def test_retry_loses(self):
+        """An attempt asking for a retry waits for the other one."""
+        retry = object()
+        d = hedged(self._send, self.hedger, self.clock, retry=retry)
+        self.clock.advance(2)
+        self.attempts[1].callback(retry)
+        self.assertNoResult(d)
+        self.assertEquals(self.cancelled, [])
+
+        self.attempts[0].callback('first')
+        self.assertEquals(self.successResultOf(d), 'first')
+        self.assertEquals(sorted(self.hedger._latencies), [1, 1, 1, 2, 2])
+
+    def test_retry_when_every_attempt_lost(self):
+        """The retry is passed on once no attempt succeeded."""
+        retry = object()
+        d = hedged(self._send, self.hedger, self.clock, retry=retry)
+        self.clock.advance(2)
+        self.attempts[0].callback(retry)
+        self.attempts[1].errback(Exception('boom'))
+
+        self.assertIs(self.successResultOf(d), retry)
+        self.assertEquals(len(self.hedger._latencies), 4)
+
+    def test_cancel(self):
+        """Cancelling cancels every attempt."""
+        d = hedged(self._send, self.hedger, self.clock)
+        self.clock.advance(2)
+        d.cancel()
+
+        self.failureResultOf(d, defer.CancelledError)
+        self.assertEquals(self.cancelled, self.attempts)
+
+
+class HedgedRequestTest(BaseTest):
+
+    """Test hedging in make_request."""
+
+    def setUp(self):
+        super(HedgedRequestTest, self).setUp()
+        self.clock = Clock()
+        self.hedger = Hedger(min_samples=1, budget=1)
+        self.hedger.record(1)
+        self.client = self.txstripe.Client(
+            hedger=self.hedger, reactor=self.clock)
+        self.mocked_resp = mocks.Customer.retrieve_success
+        self.resp_mock.code = 200
+        self.responses = []
+        self.treq_mock.request.side_effect = self._next_response
+
+    def _next_response(self, *args, **kwargs):
+        d = defer.Deferred()
+        self.responses.append(d)
+        return d
+
+    def test_slow_get_is_hedged(self):
+        """A second GET is sent and its response used."""
+        d = self.client.Customer.retrieve('cus_1234')
+        self.clock.advance(1)
+        self.assertEquals(self.treq_mock.request.call_count, 2)
+
+        self.responses[1].callback(self.resp_mock)
+        self.assertEquals(self.successResultOf(d).id, 'cus_1234')
+
+    def test_primary_wins_over_retried_hedge(self):
+        """A hedge answered with a 503 leaves the primary running."""
+        client = self.txstripe.Client(
+            hedger=self.hedger, reactor=self.clock,
+            retry_policy=RetryPolicy(max_retries=2, jitter=0))
+        unavailable = Mock(code=503, headers=Headers({}))
+        unavailable.content.return_value = defer.succeed('{"error": {}}')
+        d = client.Customer.retrieve('cus_1234')
+        self.clock.advance(1)
+
+        self.responses[1].callback(unavailable)
+        self.assertNoResult(d)
+        self.responses[0].callback(self.resp_mock)
+
+        self.assertEquals(self.successResultOf(d).id, 'cus_1234')
+        self.assertEquals(self.treq_mock.request.call_count, 2)
+
+    def test_posts_are_not_hedged(self):
+        """Only idempotent reads are duplicated."""
+        self.client.Charge.create(amount=100)
+        self.clock.advance(5)
+
+        self.assertEquals(self.treq_mock.request.call_count, 1)
+
+    def test_hedge_takes_its_own_slot(self):
+        """Hedges hold a scheduler slot of their own while in flight."""
+        scheduler = Scheduler(max_in_flight=2)
+        client = self.txstripe.Client(
+            hedger=self.hedger, scheduler=scheduler, reactor=self.clock)
+        d = client.Customer.retrieve('cus_1234')
+        self.clock.advance(1)
+
+        self.assertEquals(self.treq_mock.request.call_count, 2)
+        self.assertEquals(scheduler.in_flight, 2)
+
+        self.responses[1].callback(self.resp_mock)
+        self.successResultOf(d)
+        self.assertEquals(scheduler.in_flight, 0)
+
+    def test_no_hedge_without_slot(self):
+        """A hedge is skipped rather than exceed the scheduler's cap."""
+        scheduler = Scheduler(max_in_flight=1)
+        client = self.txstripe.Client(
+            hedger=self.hedger, scheduler=scheduler, reactor=self.clock)
+        d = client.Customer.retrieve('cus_1234')
+        self.clock.advance(1)
+
+        self.assertEquals(self.treq_mock.request.call_count, 1)
+        self.assertEquals(self.hedger.stats()['skipped'], 1)
+        self.assertEquals(self.hedger.stats()['hedges'], 0)
+
+        self.responses[0].callback(self.resp_mock)
+        self.successResultOf(d)
+
+    def test_no_hedge_without_token(self):
+        """A hedge is skipped rather than exceed the rate limit."""
+        self.resp_mock.headers = Headers({})
+        limiter = RateLimiter(self.clock, max_rate=0.5, burst=1)
+        client = self.txstripe.Client(
+            hedger=self.hedger, rate_limiter=limiter, reactor=self.clock)
+        d = client.Customer.retrieve('cus_1234')
+        self.clock.advance(1)
+
+        self.assertEquals(self.treq_mock.request.call_count, 1)
+        self.assertEquals(self.hedger.stats()['skipped'], 1)
+
+        self.responses[0].callback(self.resp_mock)
+        self.successResultOf(d)
+
+    def test_breaker_sees_hedges(self):
+        """The outcome of the hedge is recorded as a call of its own."""
+        breakers = CircuitBreakers(minimum_calls=10)
+        client = self.txstripe.Client(
+            hedger=self.hedger, circuit_breakers=breakers,
+            reactor=self.clock)
+        d = client.Customer.retrieve('cus_1234')
+        self.clock.advance(1)
+
+        self.responses[1].errback(Exception('boom'))
+        self.responses[0].callback(self.resp_mock)
+        self.successResultOf(d)
+
+        stats = breakers.get(self.txstripe.api_base).stats()
+        self.assertEquals(stats['calls'], 2)
+        self.assertEquals(stats['failure_rate'], 0.5)
@@ -0,0 +1,301 @@
+"""Test paging through lists."""
+
+from mock import Mock
+from twisted.internet import defer
+from twisted.internet.task import TaskStopped
+
+from txstripe.paging import ItemProducer, Pager, Sweep, partition
+from txstripe.test import BaseTest, page
+
+
+class FetchTest(BaseTest):
+
+    """Record page fetches for the test to answer."""
+
+    def setUp(self):
+        super(FetchTest, self).setUp()
+        self.fetches = []
+        self.cancel = None
+
+    def fetch(self, params):
+        d = defer.Deferred(self.cancel)
+        self.fetches.append((params, d))
+        return d
+
+
+class PagerTest(FetchTest):
+
+    """Test txstripe.paging.Pager."""
+
+    def test_fetches_ahead(self):
+        """The next page is requested once the consumer takes one."""
+        pager = Pager(self.fetch, {'limit': 1}, first=page('cus_1'))
+        self.assertEquals(self.fetches, [])
+
+        pages = []
+        pager.next_page().addCallback(pages.append)
+        self.assertEquals(pages, [page('cus_1')])
+        self.assertEquals(
+            self.fetches[0][0], {'limit': 1, 'starting_after': 'cus_1'})
+
+        self.fetches[0][1].callback(page('cus_2'))
+        self.assertEquals(len(self.fetches), 1)
+
+        pager.next_page().addCallback(pages.append)
+        self.assertEquals(pages, [page('cus_1'), page('cus_2')])
+        self.assertEquals(
+            self.fetches[1][0], {'limit': 1, 'starting_after': 'cus_2'})
+
+    def test_prefetch_depth(self):
+        """Up to ``prefetch`` pages are read ahead of the consumer."""
+        Pager(self.fetch, prefetch=2)
+        self.fetches[0][1].callback(page('cus_1'))
+        self.fetches[1][1].callback(page('cus_2'))
+
+        self.assertEquals(len(self.fetches), 2)
+        self.assertEquals(self.fetches[1][0], {'starting_after': 'cus_1'})
+
+    def test_no_prefetch(self):
+        """Without prefetching pages are requested when asked for."""
+        pager = Pager(self.fetch, first=page('cus_1'), prefetch=0)
+        self.assertEquals(self.fetches, [])
+
+        pages = []
+        pager.next_page().addCallback(pages.append)
+        pager.next_page().addCallback(pages.append)
+        self.assertEquals(len(self.fetches), 1)
+
+        self.fetches[0][1].callback(page('cus_2', has_more=False))
+        pager.next_page().addCallback(pages.append)
+        self.assertEquals(
+            pages, [page('cus_1'), page('cus_2', has_more=False), None])
+
+    def test_each(self):
+        """Every item is handled in order, waiting for Deferreds."""
+        handled = []
+        waiting = defer.Deferred()
+
+        def handle(item):
+            handled.append(item['id'])
+            if item['id'] == 'cus_2':
+                return waiting
+
+        pager = Pager(self.fetch, first=page('cus_1', 'cus_2'))
+        done = pager.each(handle)
+        self.fetches[0][1].callback(page('cus_3', has_more=False))
+        self.assertEquals(handled, ['cus_1', 'cus_2'])
+
+        waiting.callback(None)
+        self.assertEquals(handled, ['cus_1', 'cus_2', 'cus_3'])
+        self.assertEquals(self.successResultOf(done), None)
+
+    def test_failure(self):
+        """A failed fetch fails the next page and ends paging."""
+        pager = Pager(self.fetch, first=page('cus_1'))
+        self.successResultOf(pager.next_page())
+        self.fetches[0][1].errback(ValueError())
+
+        self.failureResultOf(pager.next_page(), ValueError)
+        self.assertEquals(self.successResultOf(pager.next_page()), None)
+
+    def test_stop(self):
+        """Stopping cancels the page being fetched."""
+        self.cancel = Mock()
+        pager = Pager(self.fetch)
+        d = pager.next_page()
+        pager.stop()
+
+        self.assertEquals(self.successResultOf(d), None)
+        self.cancel.assert_called_once_with(self.fetches[0][1])
+        self.assertEquals(self.successResultOf(pager.next_page()), None)
+
+
+class SweepTest(FetchTest):
+
+    """Test txstripe.paging.Sweep."""
+
+    def sweep(self, ordered):
+        pagers = [Pager(self.fetch, {'created': {'gte': 50}}),
+                  Pager(self.fetch, {'created': {'lt': 50}})]
+        return Sweep(pagers, ordered=ordered)
+
+    def test_partition(self):
+        """Ranges are split into whole seconds, newest first."""
+        self.assertEquals(
+            partition(0, 100, 4), [(75, 100), (50, 75), (25, 50), (0, 25)])
+        self.assertEquals(partition(0, 2, 8), [(1, 2), (0, 1)])
+        self.assertEquals(partition(5, 5, 3), [])
+
+    def test_unordered(self):
+        """Pages come from whichever shard answers first."""
+        sweep = self.sweep(ordered=False)
+        self.assertEquals(len(self.fetches), 2)
+
+        pages = []
+        sweep.next_page().addCallback(pages.append)
+        self.fetches[1][1].callback(page('cus_1', has_more=False))
+        self.assertEquals(pages, [page('cus_1', has_more=False)])
+
+        self.fetches[0][1].callback(page('cus_2', has_more=False))
+        sweep.next_page().addCallback(pages.append)
+        sweep.next_page().addCallback(pages.append)
+        self.assertEquals(pages[1:], [page('cus_2', has_more=False), None])
+
+    def test_ordered(self):
+        """Ordered sweeps read the newest shard first."""
+        sweep = self.sweep(ordered=True)
+        self.assertEquals(len(self.fetches), 2)
+
+        pages = []
+        sweep.next_page().addCallback(pages.append)
+        self.fetches[1][1].callback(page('cus_1', has_more=False))
+        self.assertEquals(pages, [])
+
+        self.fetches[0][1].callback(page('cus_2', has_more=False))
+        sweep.next_page().addCallback(pages.append)
+        sweep.next_page().addCallback(pages.append)
+        self.assertEquals(pages, [
+            page('cus_2', has_more=False), page('cus_1', has_more=False),
+            None])
+
+    def test_failure(self):
+        """A failed shard fails the sweep and stops the others."""
+        self.cancel = Mock()
+        sweep = self.sweep(ordered=False)
+        d = sweep.next_page()
+        self.fetches[0][1].errback(ValueError())
+
+        self.failureResultOf(d, ValueError)
+        self.cancel.assert_called_once_with(self.fetches[1][1])
+        self.assertEquals(self.successResultOf(sweep.next_page()), None)
+
+
+class Consumer(object):
+
+    """Collect items, pausing its producer after ``limit`` of them."""
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.items = []
+        self.producer = None
+
+    def registerProducer(self, producer, streaming):
+        self.producer = producer
+
+    def unregisterProducer(self):
+        self.producer = None
+
+    def write(self, item):
+        self.items.append(item['id'])
+        if len(self.items) == self.limit:
+            self.producer.pauseProducing()
+
+
+class ItemProducerTest(FetchTest):
+
+    """Test txstripe.paging.ItemProducer."""
+
+    def test_writes_every_item(self):
+        """Items are written page by page until the list ends."""
+        consumer = Consumer()
+        pager = Pager(self.fetch, first=page('cus_1', 'cus_2'))
+        d = pager.produce(consumer)
+        self.assertEquals(consumer.items, ['cus_1', 'cus_2'])
+
+        self.fetches[0][1].callback(page('cus_3', has_more=False))
+        self.assertEquals(consumer.items, ['cus_1', 'cus_2', 'cus_3'])
+        self.assertEquals(self.successResultOf(d), None)
+        self.assertIs(consumer.producer, None)
+
+    def test_pause(self):
+        """A paused producer takes no pages, so fetching stops."""
+        consumer = Consumer(limit=1)
+        pager = Pager(self.fetch, first=page('cus_1', 'cus_2'))
+        producer = ItemProducer(pager)
+        d = producer.startProducing(consumer)
+        self.assertEquals(consumer.items, ['cus_1'])
+
+        self.assertEquals(len(self.fetches), 1)
+        self.fetches[0][1].callback(page('cus_3'))
+        self.assertEquals(len(self.fetches), 1)
+
+        consumer.limit = 3
+        producer.resumeProducing()
+        self.assertEquals(consumer.items, ['cus_1', 'cus_2', 'cus_3'])
+        self.assertEquals(len(self.fetches), 2)
+        self.assertNoResult(d)
+
+    def test_stop(self):
+        """Stopping the producer stops the pager."""
+        self.cancel = Mock()
+        consumer = Consumer()
+        d = Pager(self.fetch).produce(consumer)
+        consumer.producer.stopProducing()
+
+        self.failureResultOf(d, TaskStopped)
+        self.cancel.assert_called_once_with(self.fetches[0][1])
+
+    def test_failure(self):
+        """A failed page fails the Deferred."""
+        consumer = Consumer()
+        d = Pager(self.fetch).produce(consumer)
+        self.fetches[0][1].errback(ValueError())
+
+        self.failureResultOf(d, ValueError)
+        self.assertIs(consumer.producer, None)
+
+
+class AutoPagingTest(BaseTest):
+
+    """Test auto_paging_iter on list resources."""
+
+    def setUp(self):
+        super(AutoPagingTest, self).setUp()
+        self.resp_mock.code = 200
+        self.respond(page('cus_1', 'cus_2'), page('cus_3', has_more=False))
+
+    @defer.inlineCallbacks
+    def test_resource_auto_paging_iter(self):
+        """Every customer is read without blocking."""
+        ids = []
+        yield self.txstripe.Customer.auto_paging_iter(limit=2).each(
+            lambda customer: ids.append(customer.id))
+
+        self.assertEquals(ids, ['cus_1', 'cus_2', 'cus_3'])
+        url = self.treq_mock.request.call_args[0][1]
+        self.assertIn('starting_after=cus_2', url)
+
+    @defer.inlineCallbacks
+    def test_list_auto_paging_iter(self):
+        """Lists page on from themselves."""
+        customers = yield self.txstripe.Customer.all(limit=2)
+        ids = []
+        yield customers.auto_paging_iter().each(
+            lambda customer: ids.append(customer.id))
+
+        self.assertEquals(ids, ['cus_1', 'cus_2', 'cus_3'])
+        url = self.treq_mock.request.call_args[0][1]
+        self.assertIn('limit=2', url)
+
+    @defer.inlineCallbacks
+    def test_raw_auto_paging_iter(self):
+        """Raw lists page through records."""
+        ids = []
+        pager = self.txstripe.Customer.auto_paging_iter(raw='records')
+        yield pager.each(lambda customer: ids.append(customer.id))
+
+        self.assertEquals(ids, ['cus_1', 'cus_2', 'cus_3'])
+
+    @defer.inlineCallbacks
+    def test_sweep(self):
+        """Sweeps read every shard of the created range."""
+        self.respond(page('cus_1', 'cus_2', has_more=False),
+                     page('cus_3', has_more=False))
+        ids = []
+        sweep = self.txstripe.Customer.sweep(0, 100, shards=2, ordered=True)
+        yield sweep.each(lambda customer: ids.append(customer.id))
+
+        self.assertEquals(ids, ['cus_1', 'cus_2', 'cus_3'])
+        urls = self.urls()
+        self.assertIn('created%5Bgte%5D=50', urls[0])
+        self.assertIn('created%5Blt%5D=50', urls[1])
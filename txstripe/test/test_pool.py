@@ -0,0 +1,49 @@
+"""Test txstripe connection pooling."""
+
+from twisted.internet import defer
+from twisted.internet.task import Clock
+
+from txstripe import pool
+from txstripe.test import BaseTest, mocks
+
+
+class ConnectionPoolTest(BaseTest):
+
+    """Test txstripe.pool."""
+
+    def setUp(self):
+        super(ConnectionPoolTest, self).setUp()
+        self.addCleanup(pool.reset_pool)
+        self.addCleanup(setattr, self.txstripe, 'connection_pool', None)
+
+    def test_pool_uses_module_settings(self):
+        """New pools pick up the tuning knobs from txstripe."""
+        self.patch(self.txstripe, 'max_persistent_per_host', 50)
+        self.patch(self.txstripe, 'cached_connection_timeout', 30)
+
+        p = pool.ConnectionPool(Clock())
+        self.assertTrue(p.persistent)
+        self.assertEquals(p.maxPersistentPerHost, 50)
+        self.assertEquals(p.cachedConnectionTimeout, 30)
+        self.assertEquals(p.stats()['idle_connections'], 0)
+
+    def test_get_pool_is_reused(self):
+        """The default pool is created once."""
+        self.assertIs(pool.get_pool(Clock()), pool.get_pool())
+
+    def test_connection_pool_override(self):
+        """An explicitly configured pool wins."""
+        custom = pool.ConnectionPool(Clock(), max_persistent_per_host=1)
+        self.txstripe.connection_pool = custom
+        self.assertIs(pool.get_pool(), custom)
+
+    @defer.inlineCallbacks
+    def test_requests_use_pool(self):
+        """Every request goes through the txstripe pool."""
+        self.mocked_resp = mocks.Customer.retrieve_success
+        self.resp_mock.code = 200
+
+        yield self.txstripe.Customer.retrieve('cus_1234')
+
+        self.assertIs(
+            self.treq_mock.request.call_args[1]['pool'], pool.get_pool())
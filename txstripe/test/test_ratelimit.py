@@ -0,0 +1,148 @@
+"""Test client side rate limiting."""
+
+from mock import Mock
+from twisted.internet import defer
+from twisted.internet.task import Clock
+from twisted.web.http_headers import Headers
+
+from txstripe import error
+from txstripe.ratelimit import (
+    RateLimiter, TokenBucket, fingerprint, parse_retry_after)
+from txstripe.test import BaseTest, mocks
+
+
+class TokenBucketTest(BaseTest):
+
+    """Test txstripe.ratelimit.TokenBucket."""
+
+    def setUp(self):
+        super(TokenBucketTest, self).setUp()
+        self.clock = Clock()
+        self.bucket = TokenBucket(self.clock, max_rate=2, burst=2)
+
+    def test_burst_then_queue(self):
+        """Callers beyond the burst wait for tokens in order."""
+        first = self.bucket.acquire()
+        second = self.bucket.acquire()
+        third = self.bucket.acquire()
+        fourth = self.bucket.acquire()
+
+        self.successResultOf(first)
+        self.successResultOf(second)
+        self.assertNoResult(third)
+        self.assertEquals(len(self.bucket), 2)
+
+        self.clock.advance(0.5)
+        self.successResultOf(third)
+        self.assertNoResult(fourth)
+
+        self.clock.advance(0.5)
+        self.successResultOf(fourth)
+
+    def test_rate_limited_backs_off(self):
+        """A 429 halves the rate and honours Retry-After."""
+        self.bucket.rate_limited(retry_after=3)
+        self.assertEquals(self.bucket.rate, 1)
+
+        d = self.bucket.acquire()
+        self.clock.advance(3.5)
+        self.assertNoResult(d)
+        self.clock.advance(0.5)
+        self.successResultOf(d)
+
+    def test_recovers_after_success(self):
+        """The rate climbs back up to its maximum."""
+        self.bucket.rate_limited()
+        self.bucket.rate_limited()
+        self.assertEquals(self.bucket.rate, 1)
+
+        self.bucket.succeeded()
+        self.bucket.succeeded()
+        self.assertEquals(self.bucket.rate, 2)
+
+    def test_cancel_leaves_queue(self):
+        """Cancelled callers give up their place."""
+        self.bucket.acquire()
+        self.bucket.acquire()
+        d = self.bucket.acquire()
+        d.cancel()
+
+        self.failureResultOf(d, defer.CancelledError)
+        self.assertEquals(len(self.bucket), 0)
+        self.clock.advance(1)
+
+    def test_parse_retry_after(self):
+        """Seconds and HTTP dates are both understood."""
+        self.assertEquals(parse_retry_after('2'), 2)
+        self.assertIs(parse_retry_after(None), None)
+        self.assertIs(parse_retry_after('soon'), None)
+        self.assertEquals(
+            parse_retry_after('Thu, 01 Jan 1970 00:00:10 GMT', lambda: 4),
+            6)
+
+
+class RateLimitedRequestTest(BaseTest):
+
+    """Test the limiter in make_request."""
+
+    def setUp(self):
+        super(RateLimitedRequestTest, self).setUp()
+        self.clock = Clock()
+        self.limiter = RateLimiter(self.clock, max_rate=1, burst=1)
+        self.client = self.txstripe.Client(
+            rate_limiter=self.limiter, coalesce_requests=False)
+        self.mocked_resp = mocks.Customer.retrieve_success
+        self.resp_mock.code = 200
+        self.resp_mock.headers = Headers({})
+
+    def test_requests_wait_for_tokens(self):
+        """Requests over the rate are queued, not sent."""
+        first = self.client.Customer.retrieve('cus_1234')
+        second = self.client.Customer.retrieve('cus_1234')
+
+        self.successResultOf(first)
+        self.assertNoResult(second)
+        self.assertEquals(self.treq_mock.request.call_count, 1)
+
+        self.clock.advance(1)
+        self.successResultOf(second)
+        self.assertEquals(self.treq_mock.request.call_count, 2)
+
+    def test_buckets_per_account(self):
+        """Connected accounts do not share a bucket."""
+        self.client.Customer.retrieve('cus_1234', stripe_account='acct_1')
+        d = self.client.Customer.retrieve('cus_1234', stripe_account='acct_2')
+
+        self.successResultOf(d)
+
+    def test_stats_hide_api_keys(self):
+        """Stats identify keys by a fingerprint instead of the secret."""
+        self.client.Customer.retrieve('cus_1234', stripe_account='acct_1')
+
+        stats = self.limiter.stats()
+        self.assertEquals(stats.keys(), [(fingerprint('ABC123'), 'acct_1')])
+        self.assertNotIn('ABC123', repr(stats))
+        self.assertNotEquals(fingerprint('ABC123'), fingerprint('ABC124'))
+
+    def test_429_raises_rate_limit_error(self):
+        """A 429 backs the bucket off and maps to RateLimitError."""
+        self.resp_mock.code = 429
+        self.resp_mock.headers = Headers({'Retry-After': ['5']})
+        self.mocked_resp = {'error': {'message': 'Too many requests'}}
+
+        d = self.client.Customer.retrieve('cus_1234')
+
+        self.failureResultOf(d, error.RateLimitError)
+        bucket = self.limiter.bucket(('ABC123', None))
+        self.assertEquals(bucket.rejections, 1)
+        self.assertEquals(bucket.paused_until, 5)
+
+    def test_403_raises_permission_error(self):
+        """Permission errors are mapped too."""
+        self.resp_mock.code = 403
+        self.mocked_resp = {'error': {'message': 'Nope'}}
+        self.resp_mock.headers = Mock()
+
+        d = self.txstripe.Customer.retrieve('cus_1234')
+
+        self.failureResultOf(d, error.PermissionError)
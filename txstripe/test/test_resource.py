@@ -1,7 +1,10 @@
 """Test txstripe resources."""
 
+from mock import patch
 from twisted.internet import defer
 
+from stripe.identity import IdentityMap
+from txstripe import resource
 from txstripe.test import BaseTest, mocks
 
 
@@ -97,6 +100,76 @@ class CustomerTest(BaseTest):
         self.assertEquals(result.deleted, True)
         self.assertEquals(result.id, mocks.Customer.delete_success['id'])
 
+    @defer.inlineCallbacks
+    def test_customer_lazy_conversion(self):
+        """Nested objects are converted when first read."""
+        self.mocked_resp = mocks.Customer.retrieve_success
+        self.resp_mock.code = 200
+        client = self.txstripe.Client(lazy_conversion=True)
+
+        customer = yield client.Customer.retrieve('something_123')
+        self.assertIn('sources', customer._lazy_keys)
+
+        sources = customer.sources
+        self.assertIsInstance(sources, resource.ListObject)
+        self.assertIs(sources._client, client)
+        self.assertNotIn('sources', customer._lazy_keys)
+
+    @defer.inlineCallbacks
+    def test_customer_decoded_in_one_pass(self):
+        """Responses are decoded straight into bound StripeObjects."""
+        self.mocked_resp = mocks.Customer.retrieve_success
+        self.resp_mock.code = 200
+        client = self.txstripe.Client()
+
+        with patch.object(resource, 'convert_to_stripe_object',
+                          wraps=resource.convert_to_stripe_object) as convert:
+            customer = yield client.Customer.retrieve('something_123')
+
+        for args, _ in convert.call_args_list:
+            self.assertNotEqual(type(args[0]), dict)
+        self.assertIsInstance(customer.sources, resource.ListObject)
+        self.assertIs(customer.sources._client, client)
+
+    @defer.inlineCallbacks
+    def test_customer_refresh_frozen(self):
+        """Refreshing a frozen object fires with a new frozen one."""
+        self.mocked_resp = mocks.Customer.retrieve_success
+        self.resp_mock.code = 200
+        client = self.txstripe.Client(frozen=True)
+        customer = yield client.Customer.retrieve('something_123')
+
+        self.mocked_resp = dict(
+            mocks.Customer.retrieve_success, email='new@example.com')
+        fresh = yield customer.refresh()
+
+        self.assertIsNot(fresh, customer)
+        self.assertIsInstance(fresh, client.Customer)
+        self.assertEquals(fresh.email, 'new@example.com')
+        self.assertNotEquals(customer.email, 'new@example.com')
+        self.assertRaises(TypeError, setattr, fresh, 'email', 'a@b.com')
+
+    @defer.inlineCallbacks
+    def test_customer_raw(self):
+        """Raw calls return plain dicts or records."""
+        self.mocked_resp = mocks.Customer.retrieve_success
+        self.resp_mock.code = 200
+
+        customer = yield self.txstripe.Customer.retrieve(
+            'something_123', raw=True)
+        self.assertIs(type(customer), dict)
+        self.assertEquals(customer, mocks.Customer.retrieve_success)
+
+        client = self.txstripe.Client(raw='records')
+        customer = yield client.Customer.retrieve('something_123')
+        self.assertEquals(customer.id, mocks.Customer.retrieve_success['id'])
+        self.assertEquals(customer.sources.data[0].object, 'card')
+
+        self.mocked_resp = mocks.Account.all_success
+        accounts = yield client.Account.all()
+        self.assertEquals(accounts.object, 'list')
+        self.assertEquals(accounts._asdict(), mocks.Account.all_success)
+
 
 class PlanTest(BaseTest):
 
@@ -211,6 +284,54 @@ class ChargeTest(BaseTest):
             self.treq_mock.request.call_args[1][
                 'headers']['Idempotency-Key'], 'IDEMKEY')
 
+    @defer.inlineCallbacks
+    def test_expanded_customers_are_shared(self):
+        """Charges of one customer share its object through the map."""
+        charge = dict(mocks.Charge.retrieve_success,
+                      customer=mocks.Customer.retrieve_success)
+        self.mocked_resp = {
+            'object': 'list', 'url': '/v1/charges', 'has_more': False,
+            'data': [dict(charge, id='ch_1'), dict(charge, id='ch_2')]}
+        self.resp_mock.code = 200
+        client = self.txstripe.Client(identity_map=IdentityMap())
+
+        charges = yield client.Charge.all(expand=['data.customer'])
+        first, second = charges.data
+        self.assertIs(first.customer, second.customer)
+        self.assertIsInstance(first.customer, client.Customer)
+
+        self.mocked_resp = mocks.Customer.retrieve_success
+        customer = yield client.Customer.retrieve(first.customer.id)
+        self.assertIs(customer.sources, first.customer.sources)
+
+    @defer.inlineCallbacks
+    def test_identity_map_is_scoped(self):
+        """Objects are not shared between clients or kept from edits."""
+        self.mocked_resp = dict(mocks.Charge.retrieve_success,
+                                customer=mocks.Customer.retrieve_success)
+        self.resp_mock.code = 200
+        identity_map = IdentityMap()
+        self.patch(self.txstripe, 'identity_map', identity_map)
+        client_a = self.txstripe.Client(api_key='sk_a', stripe_account='a')
+        client_b = self.txstripe.Client(api_key='sk_b', stripe_account='b')
+
+        charge_a = yield client_a.Charge.retrieve('ch_1')
+        charge_b = yield client_b.Charge.retrieve('ch_1')
+        self.assertIsNot(charge_a.customer, charge_b.customer)
+        self.assertEquals(charge_b.customer.api_key, 'sk_b')
+        self.assertEquals(charge_b.customer.stripe_account, 'b')
+
+        customer = charge_a.customer
+        customer.email = 'edited@example.com'
+        self.mocked_resp = dict(
+            self.mocked_resp, customer=dict(
+                mocks.Customer.retrieve_success, description='changed'))
+        charge = yield client_a.Charge.retrieve('ch_1')
+
+        self.assertIsNot(charge.customer, customer)
+        self.assertEquals(customer.serialize(None)['email'],
+                          'edited@example.com')
+
     @defer.inlineCallbacks
     def test_capture_should_post(self):
         """Method should call post params with idempotency key."""
@@ -0,0 +1,108 @@
+"""Test retrying failed requests."""
+
+import json
+
+from mock import Mock
+from twisted.internet import defer
+from twisted.internet.error import ConnectionLost
+from twisted.internet.task import Clock
+
+from stripe.retry import RetryPolicy
+
+from txstripe import error
+from txstripe.test import BaseTest, mocks
+
+
+class RetryTest(BaseTest):
+
+    """Test retries in make_request."""
+
+    def setUp(self):
+        super(RetryTest, self).setUp()
+        self.clock = Clock()
+        self.client = self.txstripe.Client(
+            reactor=self.clock,
+            retry_policy=RetryPolicy(max_retries=2, jitter=0))
+        self.responses = []
+        self.treq_mock.request.side_effect = self._next_response
+
+    def _next_response(self, *args, **kwargs):
+        result = self.responses.pop(0)
+        if isinstance(result, Exception):
+            return defer.fail(result)
+
+        code, body = result
+        resp = Mock()
+        resp.code = code
+        resp.json.return_value = defer.succeed(body)
+        resp.content.return_value = defer.succeed(json.dumps(body))
+        return defer.succeed(resp)
+
+    def _sent_headers(self):
+        return [c[1]['headers'] for c in self.treq_mock.request.call_args_list]
+
+    def test_retries_with_backoff(self):
+        """Server errors and rate limits are retried after a delay."""
+        self.responses = [(500, {'error': {}}), (429, {'error': {}}),
+                          (200, mocks.Customer.retrieve_success)]
+
+        d = self.client.Customer.retrieve('cus_1234')
+        self.assertEquals(self.treq_mock.request.call_count, 1)
+
+        self.clock.advance(0.5)
+        self.assertEquals(self.treq_mock.request.call_count, 2)
+        self.clock.advance(1)
+
+        customer = self.successResultOf(d)
+        self.assertEquals(customer.id, 'cus_1234')
+
+    def test_connection_errors(self):
+        """Connection errors are retried, then raised as APIConnectionError."""
+        self.responses = [ConnectionLost()] * 3
+
+        d = self.client.Customer.retrieve('cus_1234')
+        self.clock.pump([0.5, 1])
+
+        self.failureResultOf(d, error.APIConnectionError)
+        self.assertEquals(self.treq_mock.request.call_count, 3)
+
+    def test_client_errors_are_not_retried(self):
+        """A 402 is final."""
+        self.responses = [(402, {'error': {'message': 'Declined'}})]
+
+        d = self.client.Charge.create(amount=100)
+
+        self.failureResultOf(d, error.CardError)
+        self.assertEquals(self.treq_mock.request.call_count, 1)
+
+    def test_post_reuses_idempotency_key(self):
+        """A retried POST is sent with the same generated key."""
+        self.responses = [(503, {'error': {}}),
+                          (200, mocks.Charge.retrieve_success)]
+
+        d = self.client.Charge.create(amount=100)
+        self.clock.advance(0.5)
+        self.successResultOf(d)
+
+        first, second = self._sent_headers()
+        self.assertTrue(first['Idempotency-Key'])
+        self.assertEquals(
+            first['Idempotency-Key'], second['Idempotency-Key'])
+
+    def test_supplied_idempotency_key_wins(self):
+        """Callers can still choose their own key."""
+        self.responses = [(200, mocks.Charge.retrieve_success)]
+
+        d = self.client.Charge.create(idempotency_key='mine', amount=100)
+        self.successResultOf(d)
+
+        self.assertEquals(self._sent_headers()[0]['Idempotency-Key'], 'mine')
+
+    def test_disabled_by_default(self):
+        """Without a policy nothing is retried or generated."""
+        self.responses = [(500, {'error': {}})]
+
+        d = self.txstripe.Charge.create(amount=100)
+
+        self.failureResultOf(d, error.APIError)
+        self.assertNotIn('Idempotency-Key', self._sent_headers()[0])
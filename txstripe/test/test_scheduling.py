@@ -0,0 +1,205 @@
+"""Test the request scheduler."""
+
+from twisted.internet import defer
+
+from txstripe import scheduling
+from txstripe.scheduling import Scheduler
+from txstripe.test import BaseTest, mocks
+
+
+class SchedulerTest(BaseTest):
+
+    """Test txstripe.scheduling.Scheduler."""
+
+    def _order(self, scheduler, requests):
+        """Queue ``requests`` and return the accounts in the order run."""
+        order = []
+        for account, priority in requests:
+            d = scheduler.acquire(account, priority)
+            d.addCallback(lambda slot, a=account: order.append(a) or slot)
+            d.addCallback(lambda slot: self.slots.append(slot))
+        return order
+
+    def _release_all(self):
+        while self.slots:
+            self.slots.pop(0).release()
+
+    def setUp(self):
+        super(SchedulerTest, self).setUp()
+        self.slots = []
+
+    def test_global_cap(self):
+        """No more than max_in_flight requests run at once."""
+        scheduler = Scheduler(max_in_flight=2)
+        first = self.successResultOf(scheduler.acquire('acct_1'))
+        self.successResultOf(scheduler.acquire('acct_2'))
+        third = scheduler.acquire('acct_3')
+
+        self.assertNoResult(third)
+        self.assertEquals(
+            scheduler.stats()['waiting'], {scheduling.DEFAULT: 1})
+
+        first.release()
+        first.release()
+        self.successResultOf(third)
+        self.assertEquals(scheduler.in_flight, 2)
+
+    def test_per_account_cap(self):
+        """A busy account waits while others go ahead."""
+        scheduler = Scheduler(max_in_flight=10, max_in_flight_per_account=1)
+        busy = self.successResultOf(scheduler.acquire('acct_1'))
+        waiting = scheduler.acquire('acct_1')
+        other = scheduler.acquire('acct_2')
+
+        self.assertNoResult(waiting)
+        self.successResultOf(other)
+
+        busy.release()
+        self.successResultOf(waiting)
+
+    def test_accounts_take_turns(self):
+        """A large backlog for one account does not starve another."""
+        scheduler = Scheduler(max_in_flight=1)
+        blocker = self.successResultOf(scheduler.acquire('acct_0'))
+        order = self._order(
+            scheduler, [('acct_1', 1)] * 3 + [('acct_2', 1)] * 2)
+
+        blocker.release()
+        for _ in range(5):
+            self._release_all()
+
+        self.assertEquals(
+            order, ['acct_1', 'acct_2', 'acct_1', 'acct_2', 'acct_1'])
+
+    def test_weights(self):
+        """Heavier accounts get more requests per turn."""
+        scheduler = Scheduler(max_in_flight=1, weights={'acct_1': 2})
+        blocker = self.successResultOf(scheduler.acquire('acct_0'))
+        order = self._order(
+            scheduler, [('acct_1', 1)] * 4 + [('acct_2', 1)] * 2)
+
+        blocker.release()
+        for _ in range(6):
+            self._release_all()
+
+        self.assertEquals(
+            order,
+            ['acct_1', 'acct_1', 'acct_2', 'acct_1', 'acct_1', 'acct_2'])
+
+    def test_priority_lanes(self):
+        """Interactive requests jump ahead of bulk ones."""
+        scheduler = Scheduler(max_in_flight=1)
+        blocker = self.successResultOf(scheduler.acquire('acct_0'))
+        order = self._order(scheduler, [
+            ('bulk', scheduling.BULK), ('default', scheduling.DEFAULT),
+            ('checkout', scheduling.INTERACTIVE)])
+
+        blocker.release()
+        for _ in range(3):
+            self._release_all()
+
+        self.assertEquals(order, ['checkout', 'default', 'bulk'])
+
+    def test_cancel_leaves_queue(self):
+        """Cancelled requests give up their place."""
+        scheduler = Scheduler(max_in_flight=1)
+        blocker = self.successResultOf(scheduler.acquire('acct_1'))
+        d = scheduler.acquire('acct_2')
+        d.cancel()
+
+        self.failureResultOf(d, defer.CancelledError)
+        self.assertEquals(
+            scheduler.stats()['waiting'], {scheduling.DEFAULT: 0})
+        blocker.release()
+        self.assertEquals(scheduler.in_flight, 0)
+
+    def test_try_acquire(self):
+        """Slots are only taken without waiting when nobody is queued."""
+        scheduler = Scheduler(max_in_flight=2)
+        slot = scheduler.try_acquire('acct_1')
+        self.assertEquals(scheduler.in_flight, 1)
+
+        blocker = self.successResultOf(scheduler.acquire('acct_1'))
+        self.assertIs(scheduler.try_acquire('acct_1'), None)
+
+        waiting = scheduler.acquire('acct_2')
+        blocker.release()
+        self.assertIs(scheduler.try_acquire('acct_3'), None)
+        self.successResultOf(waiting).release()
+        slot.release()
+        self.assertEquals(scheduler.in_flight, 0)
+
+
+class ScheduledRequestTest(BaseTest):
+
+    """Test the scheduler in make_request."""
+
+    def setUp(self):
+        super(ScheduledRequestTest, self).setUp()
+        self.scheduler = Scheduler(max_in_flight=1)
+        self.mocked_resp = mocks.Customer.retrieve_success
+        self.resp_mock.code = 200
+        self.responses = []
+        self.treq_mock.request.side_effect = self._next_response
+
+    def _next_response(self, *args, **kwargs):
+        d = defer.Deferred()
+        self.responses.append(d)
+        return d
+
+    def test_waits_for_slot(self):
+        """Requests beyond the cap are not sent until a slot frees up."""
+        client = self.txstripe.Client(
+            scheduler=self.scheduler, coalesce_requests=False)
+        first = client.Customer.retrieve('cus_1234')
+        second = client.Customer.retrieve('cus_1234')
+
+        self.assertEquals(self.treq_mock.request.call_count, 1)
+        self.responses[0].callback(self.resp_mock)
+
+        self.successResultOf(first)
+        self.assertEquals(self.treq_mock.request.call_count, 2)
+        self.responses[1].callback(self.resp_mock)
+        self.successResultOf(second)
+        self.assertEquals(self.scheduler.in_flight, 0)
+
+    def test_client_priority(self):
+        """Interactive clients are sent before bulk ones."""
+        bulk = self.txstripe.Client(
+            scheduler=self.scheduler, priority=scheduling.BULK,
+            coalesce_requests=False)
+        checkout = self.txstripe.Client(
+            scheduler=self.scheduler, priority=scheduling.INTERACTIVE,
+            coalesce_requests=False)
+
+        bulk.Customer.retrieve('cus_1')
+        bulk.Customer.retrieve('cus_2')
+        checkout.Customer.retrieve('cus_3')
+
+        self.responses[0].callback(self.resp_mock)
+        urls = self.urls()
+        self.assertTrue(urls[1].endswith('/cus_3'))
+
+    def test_call_priority(self):
+        """A priority given to the call wins over the client's."""
+        client = self.txstripe.Client(
+            scheduler=self.scheduler, coalesce_requests=False)
+
+        client.Customer.retrieve('cus_1')
+        pager = client.Customer.auto_paging_iter(priority=scheduling.BULK)
+        client.Customer.retrieve('cus_2', priority=scheduling.INTERACTIVE)
+
+        self.responses[0].callback(self.resp_mock)
+        urls = self.urls()
+        self.assertTrue(urls[1].endswith('/cus_2'))
+        pager.stop()
+
+    def test_slot_released_on_error(self):
+        """Failed requests give their slot back."""
+        client = self.txstripe.Client(
+            scheduler=self.scheduler, coalesce_requests=False)
+        d = client.Customer.retrieve('cus_1234')
+        self.responses[0].errback(Exception('boom'))
+
+        self.failureResultOf(d, self.txstripe.APIConnectionError)
+        self.assertEquals(self.scheduler.in_flight, 0)
@@ -0,0 +1,133 @@
+"""Test request timeouts and cancellation."""
+
+from mock import patch
+from treq.client import _BufferedResponse
+from treq.response import _Response
+from twisted.internet import defer
+from twisted.internet.error import ConnectionDone
+from twisted.internet.task import Clock
+from twisted.python.failure import Failure
+from twisted.test.proto_helpers import StringTransport
+from twisted.web._newclient import Response, TransportProxyProducer
+from twisted.web.http_headers import Headers
+
+from txstripe import error
+from txstripe.test import BaseTest, mocks
+
+
+class TimeoutTest(BaseTest):
+
+    """Test timeouts and cancellation in make_request."""
+
+    def setUp(self):
+        super(TimeoutTest, self).setUp()
+        self.clock = Clock()
+        self.cancelled = []
+        self.treq_mock.request.side_effect = self._hang
+        self.mocked_resp = mocks.Customer.retrieve_success
+
+    def _hang(self, *args, **kwargs):
+        return defer.Deferred(self.cancelled.append)
+
+    def test_client_timeout(self):
+        """Requests over the client's timeout fail and are aborted."""
+        client = self.txstripe.Client(reactor=self.clock, timeout=5)
+        d = client.Customer.retrieve('cus_1234')
+
+        self.clock.advance(4)
+        self.assertNoResult(d)
+        self.clock.advance(1)
+
+        self.failureResultOf(d, error.APIConnectionError)
+        self.assertEquals(len(self.cancelled), 1)
+
+    def test_per_call_timeout(self):
+        """A timeout given to the call wins."""
+        client = self.txstripe.Client(reactor=self.clock, timeout=5)
+        d = client.Charge.create(amount=100, timeout=1)
+
+        self.clock.advance(1)
+        self.failureResultOf(d, error.APIConnectionError)
+
+    def test_deadline_covers_retries(self):
+        """Backoff sleeps count against the same deadline."""
+        from stripe.retry import RetryPolicy
+
+        self.treq_mock.request.side_effect = \
+            lambda *a, **kw: defer.fail(Exception('boom'))
+        client = self.txstripe.Client(
+            reactor=self.clock, timeout=3,
+            retry_policy=RetryPolicy(max_retries=5, initial_delay=2,
+                                     jitter=0))
+        d = client.Customer.retrieve('cus_1234')
+
+        self.clock.advance(3)
+        self.failureResultOf(d, error.APIConnectionError)
+        self.assertEquals(self.treq_mock.request.call_count, 2)
+
+    def test_retrieve_passes_deadline(self):
+        """retrieve hands its deadline on to refresh."""
+        self.clock.advance(10)
+        customer_class = self.txstripe.Client(reactor=self.clock).Customer
+
+        with patch.object(customer_class, 'refresh') as refresh:
+            refresh.return_value = defer.succeed(None)
+            customer_class.retrieve('cus_1234', timeout=2)
+
+        refresh.assert_called_with(deadline=12, priority=None)
+
+    def test_cancel_aborts_request(self):
+        """Cancelling the result cancels the HTTP request."""
+        d = self.txstripe.Customer.retrieve('cus_1234')
+        d.cancel()
+
+        self.failureResultOf(d, defer.CancelledError)
+        self.assertEquals(len(self.cancelled), 1)
+
+    def _respond_slowly(self):
+        """Answer with a real treq response whose body never arrives."""
+        self.transport = StringTransport()
+        self.response = Response(
+            ('HTTP', 1, 1), 200, 'OK', Headers({}),
+            TransportProxyProducer(self.transport))
+        resp = _Response(_BufferedResponse(self.response), None)
+        self.treq_mock.request.side_effect = \
+            lambda *args, **kwargs: defer.succeed(resp)
+
+    def test_cancel_closes_connection_while_reading(self):
+        """Cancelling during the body read closes the connection."""
+        self._respond_slowly()
+        d = self.txstripe.Customer.retrieve('cus_1234')
+        d.cancel()
+
+        self.failureResultOf(d, defer.CancelledError)
+        self.assertTrue(self.transport.disconnected)
+
+        # The read fails once the connection is gone, which is ignored
+        self.response._bodyDataFinished(Failure(ConnectionDone()))
+
+    def test_timeout_closes_connection_while_reading(self):
+        """A timeout during the body read closes the connection too."""
+        self._respond_slowly()
+        client = self.txstripe.Client(reactor=self.clock, timeout=5)
+        d = client.Customer.retrieve('cus_1234')
+
+        self.clock.advance(5)
+        self.failureResultOf(d, error.APIConnectionError)
+        self.assertTrue(self.transport.disconnected)
+
+    @patch('txstripe.pool.Agent')
+    def test_connect_timeout(self, agent):
+        """A connect timeout sends the request through its own Agent."""
+        self.treq_mock.client.HTTPClient.return_value.request.side_effect = \
+            self._hang
+        client = self.txstripe.Client(reactor=self.clock, connect_timeout=3)
+        client.Customer.retrieve('cus_1234')
+
+        self.assertEquals(agent.call_args[1]['connectTimeout'], 3)
+        self.treq_mock.client.HTTPClient.assert_called_with(
+            agent.return_value)
+        self.assertFalse(self.treq_mock.request.called)
+
+        client.Customer.retrieve('cus_1234')
+        self.assertEquals(agent.call_count, 1)
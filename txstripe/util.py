@@ -22,7 +22,13 @@ def handle_api_error(resp):
             "was %d)" % (content, resp.code),
             resp, resp.code, content, headers)
 
-    if resp.code in [400, 404]:
+    # Rate limits were previously coded as 400's with code 'rate_limit'
+    if resp.code == 429 or (
+            resp.code == 400 and err.get('code') == 'rate_limit'):
+        raise error.RateLimitError(
+            err.get('message'),
+            resp, resp.code, content, headers)
+    elif resp.code in [400, 404]:
         raise error.InvalidRequestError(
             err.get('message'), err.get('param'),
             resp, resp.code, content, headers)
@@ -34,6 +40,10 @@ def handle_api_error(resp):
         raise error.CardError(
             err.get('message'), err.get('param'), err.get('code'),
             content, resp.code, resp, headers)
+    elif resp.code == 403:
+        raise error.PermissionError(
+            err.get('message'),
+            resp, resp.code, content, headers)
     else:
         raise error.APIError(
             err.get('message'), content, resp.code, resp, headers)